@@ -0,0 +1,113 @@
+"""
+Compare requests per second of the async menu listing with the sync
+(threadpool) implementation it replaced.
+
+    python -m benchmarks.async_db --requests 2000 --concurrency 32
+
+Runs against DATABASE_URL, or a throwaway SQLite database seeded with
+synthetic menus when it is not set.
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+
+import httpx
+from fastapi import Depends, FastAPI, Query
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from db import Base, dispose_async_engine, engine, get_db
+from db.models import Comment, Menu, Restaurant, User
+from db.schemas import Menu as MenuSchema
+from routes import menus
+from routes.menus import MENU_LOAD_OPTIONS, calculate_average_ratings
+
+app = FastAPI()
+app.include_router(menus.router)
+
+
+@app.get("/sync/menus", response_model=list[MenuSchema])
+def sync_list_menus(
+        restaurant_id: int | None = None,
+        skip: int = Query(default=0, ge=0),
+        limit: int = Query(default=100, le=100),
+        db: Session = Depends(get_db)
+):
+    query = db.query(Menu).options(*MENU_LOAD_OPTIONS)
+    if restaurant_id:
+        query = query.filter(Menu.restaurant_id == restaurant_id)
+    menus = query.offset(skip).limit(limit).all()
+
+    ratings = calculate_average_ratings(db, [menu.id for menu in menus])
+    for menu in menus:
+        menu.average_rating = ratings.get(menu.id)
+    return menus
+
+
+def seed(restaurants: int = 50, menus_per_restaurant: int = 20, comments_per_menu: int = 5) -> None:
+    Base.metadata.create_all(engine)
+    rng = random.Random(42)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [{
+            "email": "bench@example.com", "first_name": "Bench", "last_name": "User",
+            "phone_number": "0000000000", "password_hash": "x",
+        }])
+        conn.execute(insert(Restaurant), [{
+            "name": f"Restaurant {i}", "address": "Bench street", "phone_number": "0000000000",
+            "latitude": 4.05, "longitude": 9.7,
+        } for i in range(restaurants)])
+        conn.execute(insert(Menu), [{
+            "restaurant_id": r + 1, "name": f"Menu {r}-{m}", "price": 1000 + m,
+            "description": "Bench menu", "preparation_time": rng.randint(5, 45),
+        } for r in range(restaurants) for m in range(menus_per_restaurant)])
+        conn.execute(insert(Comment), [{
+            "menu_id": menu + 1, "client_id": 1, "comment": "ok", "rating": rng.randint(1, 5),
+        } for menu in range(restaurants * menus_per_restaurant) for _ in range(comments_per_menu)])
+
+
+async def run(path: str, total: int, concurrency: int, restaurants: int) -> float:
+    transport = httpx.ASGITransport(app=app)
+    counter = iter(range(total))
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def worker():
+            for i in counter:
+                response = await client.get(path, params={"restaurant_id": i % restaurants + 1})
+                response.raise_for_status()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return total / (time.perf_counter() - started)
+
+
+async def compare(args: argparse.Namespace) -> None:
+    # The async engine pool is bound to the running loop, so every run shares one loop
+    for label, path in (("sync", "/sync/menus"), ("async", "/menus")):
+        await run(path, min(args.requests, 100), args.concurrency, args.restaurants)  # warm up
+        rps = await run(path, args.requests, args.concurrency, args.restaurants)
+        print(f"{label:>5}: {rps:8.1f} req/s")
+    await dispose_async_engine()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--restaurants", type=int, default=50)
+    parser.add_argument("--no-seed", action="store_true", help="use the existing data in DATABASE_URL")
+    args = parser.parse_args()
+
+    if not args.no_seed:
+        seed(restaurants=args.restaurants)
+
+    asyncio.run(compare(args))
+
+
+if __name__ == "__main__":
+    main()
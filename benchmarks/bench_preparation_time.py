@@ -0,0 +1,14 @@
+from types import SimpleNamespace
+
+import pytest
+
+from routes.deliveries import calculate_preparation_time
+
+
+@pytest.mark.parametrize("items", [1, 10, 100])
+def test_calculate_preparation_time(benchmark, items):
+    menu_items = [
+        {"menu": SimpleNamespace(preparation_time=5 + i % 40), "quantity": 1 + i % 4}
+        for i in range(items)
+    ]
+    assert benchmark(calculate_preparation_time, menu_items) > 0
@@ -0,0 +1,25 @@
+from types import SimpleNamespace
+
+import pytest
+
+from routes.orders import calculate_item_price
+
+
+@pytest.mark.parametrize("supplements", [0, 3, 10])
+def test_calculate_item_price(benchmark, supplements):
+    menu = SimpleNamespace(price=3500.0)
+    ordered = [(SimpleNamespace(price=250.0 + i), 1 + i % 2) for i in range(supplements)]
+    assert benchmark(calculate_item_price, menu, 2, ordered) >= 7000
+
+
+def test_order_total(benchmark):
+    """A 20-line order with 2 supplements per line"""
+    lines = [
+        (SimpleNamespace(price=1000.0 + i), 1 + i % 3, [(SimpleNamespace(price=200.0), 1), (SimpleNamespace(price=150.0), 2)])
+        for i in range(20)
+    ]
+
+    def order_total():
+        return sum(calculate_item_price(menu, quantity, supplements) for menu, quantity, supplements in lines)
+
+    assert benchmark(order_total) > 0
@@ -0,0 +1,15 @@
+import pytest
+from sqlalchemy import select
+
+from db.models import Comment
+from routes.menus import calculate_average_ratings
+
+
+@pytest.mark.parametrize("menus", [1, 20, 100])
+def test_calculate_average_ratings(benchmark, seeded_db, menus):
+    # Ids come from the database, which is not the seeded one when DATABASE_URL is set
+    menu_ids = seeded_db.scalars(select(Comment.menu_id).distinct().order_by(Comment.menu_id).limit(menus)).all()
+    if len(menu_ids) < menus:
+        pytest.skip(f"needs {menus} rated menus, the database has {len(menu_ids)}")
+    ratings = benchmark(calculate_average_ratings, seeded_db, menu_ids)
+    assert len(ratings) == menus
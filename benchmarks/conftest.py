@@ -0,0 +1,48 @@
+"""
+Microbenchmarks, collected from bench_*.py so they never run with tests.
+
+    pip install -r benchmarks/requirements.txt
+    python -m pytest benchmarks --benchmark-autosave
+    python -m pytest benchmarks --benchmark-compare
+
+Database-backed benchmarks use a throwaway SQLite database unless
+DATABASE_URL is set; only that throwaway database is ever seeded, an
+existing one is read as it is.
+"""
+import os
+import tempfile
+
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+    SEED_DATABASE = True
+else:
+    SEED_DATABASE = False
+DATABASE_URL = os.environ["DATABASE_URL"]
+
+import pytest
+
+
+def pytest_collect_file(file_path, parent):
+    # Skipped when pytest-benchmark is not installed, so a plain pytest run stays green
+    if not parent.config.pluginmanager.hasplugin("benchmark"):
+        return None
+    if file_path.name.startswith("bench_") and file_path.suffix == ".py":
+        return pytest.Module.from_parent(parent, path=file_path)
+
+
+@pytest.fixture(scope="session")
+def seeded_db():
+    """Session on the benchmark database, seeded with 50 restaurants, 1000 menus and 5000 comments when throwaway"""
+    from config.settings import settings
+    from db import SessionLocal
+    from benchmarks.async_db import seed
+
+    if settings.DATABASE_URL != DATABASE_URL:
+        pytest.skip("the app was configured for another suite, run `python -m pytest benchmarks` on its own")
+    if SEED_DATABASE:
+        seed()
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
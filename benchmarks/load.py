@@ -0,0 +1,290 @@
+"""
+Replay a realistic request mix and record throughput and latency.
+
+    python -m benchmarks.load --mix default --requests 5000 --output baseline.json
+    python -m benchmarks.load --mix default --requests 5000 --compare baseline.json
+
+Scenarios:
+    browse    menu listings, restaurant menus and menu details
+    comment   POST /comments
+    order     POST /orders with one to three menus of a restaurant
+    estimate  POST /delivery-estimate to an address near the restaurant
+
+By default the app runs in-process over httpx's ASGI transport, on
+DATABASE_URL (SQLite or MariaDB) or on a throwaway SQLite database seeded
+with the small db.seed dataset, with routing answered by the distance-based estimate
+instead of OSRM. --url targets a running server instead. Client and
+server share the event loop in-process, so compare runs made the same way.
+
+The JSON report holds requests per second and p50/p95/p99 latency overall
+and per scenario. --compare prints the change against a previous report
+and exits with status 1 when p95 or throughput regress by more than
+--tolerance percent.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+# In-process defaults: no background jobs, no rate limiting, no migration check
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/load.db"
+    SEED_DATABASE = True
+else:
+    SEED_DATABASE = False
+for _name, _value in (("RATE_LIMIT_ENABLED", "false"), ("DISPATCH_ENABLED", "false"),
+                      ("ISOCHRONE_REFRESH_ENABLED", "false"), ("MIGRATIONS_ON_STARTUP", "off"),
+                      ("JOBS_ENABLED", "false"), ("OUTBOX_RELAY_ENABLED", "false")):
+    os.environ.setdefault(_name, _value)
+
+import httpx
+
+MIXES = {
+    "default": {"browse": 80, "comment": 5, "order": 5, "estimate": 10},
+    "browse": {"browse": 1},
+    "write": {"comment": 50, "order": 50},
+    "estimate": {"estimate": 1},
+}
+
+PERCENTILES = (50, 95, 99)
+
+
+class Dataset:
+    """Restaurants and menus the scenarios pick from, loaded through the API"""
+
+    def __init__(self, restaurants: list[dict], menus: dict[int, list[int]], client_id: int):
+        self.restaurants = [restaurant for restaurant in restaurants if menus.get(restaurant["id"])]
+        self.menus = menus
+        self.menu_ids = [menu_id for ids in menus.values() for menu_id in ids]
+        self.client_id = client_id
+
+    @classmethod
+    async def load(cls, client: httpx.AsyncClient, client_id: int, restaurants: int) -> "Dataset":
+        response = await client.get("/restaurants", params={"limit": restaurants})
+        response.raise_for_status()
+        found = response.json()
+        menus = {}
+        for restaurant in found:
+            response = await client.get(f"/restaurants/{restaurant['id']}/menus", params={"limit": 100})
+            response.raise_for_status()
+            menus[restaurant["id"]] = [menu["id"] for menu in response.json()]
+        dataset = cls(found, menus, client_id)
+        if not dataset.restaurants:
+            raise SystemExit("No restaurant with menus found; seed the database first")
+        return dataset
+
+
+async def browse(client: httpx.AsyncClient, rng: random.Random, data: Dataset) -> httpx.Response:
+    roll = rng.random()
+    if roll < 0.5:
+        return await client.get("/menus", params={"restaurant_id": rng.choice(data.restaurants)["id"]})
+    if roll < 0.8:
+        return await client.get(f"/restaurants/{rng.choice(data.restaurants)['id']}/menus")
+    return await client.get(f"/menus/{rng.choice(data.menu_ids)}")
+
+
+async def comment(client: httpx.AsyncClient, rng: random.Random, data: Dataset) -> httpx.Response:
+    return await client.post("/comments", json={
+        "menu_id": rng.choice(data.menu_ids), "client_id": data.client_id,
+        "comment": "Load test comment", "rating": rng.randint(1, 5),
+    })
+
+
+async def order(client: httpx.AsyncClient, rng: random.Random, data: Dataset) -> httpx.Response:
+    menus = data.menus[rng.choice(data.restaurants)["id"]]
+    items = rng.sample(menus, min(len(menus), rng.randint(1, 3)))
+    return await client.post("/orders", json={
+        "client_id": data.client_id,
+        "items": [{"menu_id": menu_id, "quantity": rng.randint(1, 3)} for menu_id in items],
+    })
+
+
+async def estimate(client: httpx.AsyncClient, rng: random.Random, data: Dataset) -> httpx.Response:
+    restaurant = rng.choice(data.restaurants)
+    menus = data.menus[restaurant["id"]]
+    # Within about 1 km of the restaurant, inside even the smallest seeded delivery zone
+    return await client.post("/delivery-estimate", json={
+        "restaurant_id": restaurant["id"],
+        "delivery_location": {
+            "latitude": restaurant["latitude"] + rng.uniform(-0.008, 0.008),
+            "longitude": restaurant["longitude"] + rng.uniform(-0.008, 0.008),
+            "address": "Load test address",
+        },
+        "menu_items": {str(menu_id): rng.randint(1, 2) for menu_id in rng.sample(menus, min(len(menus), 2))},
+    })
+
+
+SCENARIOS = {"browse": browse, "comment": comment, "order": order, "estimate": estimate}
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    """Nearest-rank percentile"""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, max(0, math.ceil(q / 100 * len(sorted_values)) - 1))]
+
+
+def summarize(latencies: list[float], errors: int, elapsed: float) -> dict:
+    latencies = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "latency_ms": {f"p{q}": round(percentile(latencies, q) * 1000, 2) for q in PERCENTILES},
+    }
+
+
+async def run_load(client: httpx.AsyncClient, data: Dataset, mix: dict, total: int, concurrency: int,
+                   seed: int) -> tuple[dict, float]:
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    results = {name: ([], [0]) for name in names}
+    counter = iter(range(total))
+
+    async def worker(index: int) -> None:
+        rng = random.Random(seed * 1000 + index)
+        for _ in counter:
+            name = rng.choices(names, weights)[0]
+            started = time.perf_counter()
+            try:
+                response = await SCENARIOS[name](client, rng, data)
+                failed = response.status_code >= 400
+            except httpx.HTTPError:
+                failed = True
+            latencies, errors = results[name]
+            latencies.append(time.perf_counter() - started)
+            errors[0] += failed
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(index) for index in range(concurrency)))
+    return results, time.perf_counter() - started
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def benchmark(args: argparse.Namespace) -> dict:
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=30)
+        target = args.url
+    else:
+        from main import app
+        from services.routing import estimate_route, routing_client
+
+        # Stub the routing provider so results do not depend on OSRM or the network
+        routing_client.get_route = estimate_route
+        transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+        client = httpx.AsyncClient(transport=transport, base_url="http://load", timeout=30)
+        target = os.environ["DATABASE_URL"].split(":", 1)[0]
+
+    mix = MIXES[args.mix]
+    try:
+        data = await Dataset.load(client, args.client_id, args.restaurants)
+        await run_load(client, data, mix, min(args.requests, args.warmup), args.concurrency, args.seed)
+        results, elapsed = await run_load(client, data, mix, args.requests, args.concurrency, args.seed)
+    finally:
+        await client.aclose()
+        if not args.url:
+            from db import dispose_async_engine
+            await dispose_async_engine()
+
+    all_latencies = [latency for latencies, _ in results.values() for latency in latencies]
+    return {
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "target": target,
+        "mix": args.mix,
+        "concurrency": args.concurrency,
+        "seed": args.seed,
+        "duration_seconds": round(elapsed, 3),
+        **summarize(all_latencies, sum(errors[0] for _, errors in results.values()), elapsed),
+        "scenarios": {
+            name: summarize(latencies, errors[0], elapsed) for name, (latencies, errors) in results.items()
+        },
+    }
+
+
+def compare(baseline: dict, report: dict, tolerance: float) -> bool:
+    """Print the change of each figure and return False when it regressed beyond tolerance"""
+    ok = True
+
+    def line(label: str, before: dict, after: dict) -> None:
+        nonlocal ok
+        figures = [("rps", before["rps"], after["rps"], True)] + [
+            (name, before["latency_ms"][name], after["latency_ms"][name], False) for name in before["latency_ms"]
+        ]
+        cells = []
+        for name, old, new, higher_is_better in figures:
+            change = (new - old) / old * 100 if old else 0.0
+            regressed = (change < -tolerance) if higher_is_better else (change > tolerance)
+            if regressed and name in ("rps", "p95"):
+                ok = False
+            cells.append(f"{name} {old:g} -> {new:g} ({change:+.1f}%{' !' if regressed else ''})")
+        print(f"{label:>9}: " + ", ".join(cells))
+
+    line("overall", baseline, report)
+    for name, after in report["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if before:
+            line(name, before, after)
+    return ok
+
+
+def seed(args: argparse.Namespace) -> None:
+    """Fill the throwaway database with the small synthetic dataset (db.seed), in WAL mode"""
+    from dataclasses import replace
+
+    from db import Base, models  # noqa: F401 - registers the tables
+    from db.seed import SCALES, Seeder, Writer, create_seed_engine
+
+    engine = create_seed_engine(os.environ["DATABASE_URL"], "insert")
+    Base.metadata.create_all(engine)
+    Seeder(Writer(engine, "insert"), replace(SCALES["small"], restaurants=args.restaurants), args.seed).run()
+    engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--mix", choices=sorted(MIXES), default="default")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--warmup", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--seed", type=int, default=42, help="makes the request sequence reproducible")
+    parser.add_argument("--url", help="benchmark a running server instead of the in-process app")
+    parser.add_argument("--restaurants", type=int, default=50, help="restaurants to spread the load over")
+    parser.add_argument("--client-id", type=int, default=1, help="existing user placing orders and comments")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    parser.add_argument("--compare", help="previous JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=10, help="allowed regression in percent")
+    args = parser.parse_args()
+
+    if SEED_DATABASE and not args.url:
+        seed(args)
+
+    report = asyncio.run(benchmark(args))
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        if not compare(baseline, report, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
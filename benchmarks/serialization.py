@@ -0,0 +1,98 @@
+"""
+Compare response bytes encoded per second on one core by FastAPI's
+default response serialization and by the fast path in utils.serialization.
+
+    python -m benchmarks.serialization --menus 100 --seconds 3
+
+Menus are built in memory with their restaurant, categories and
+supplements, so the database does not take part in the measurement.
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from datetime import datetime
+
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+from db.models import Menu, MenuCategory, Restaurant, Supplement
+from db.schemas import Menu as MenuSchema
+from routes.menus import menu_serializer
+
+
+def build_menus(count: int) -> list[Menu]:
+    now = datetime(2024, 1, 1, 12, 0)
+    restaurant = Restaurant(
+        id=1, name="Restaurant", address="Bench street", phone_number="0000000000", description="Bench",
+        latitude=4.05, longitude=9.7, created_at=now, updated_at=now,
+    )
+    categories = [MenuCategory(id=i, name=f"Category {i}", created_at=now, updated_at=now) for i in range(3)]
+    supplements = [
+        Supplement(id=i, name=f"Supplement {i}", price=250.0, description="Extra", preparation_time=2,
+                   created_at=now, updated_at=now)
+        for i in range(4)
+    ]
+    menus = []
+    for i in range(count):
+        menu = Menu(
+            id=i, restaurant_id=1, name=f"Menu {i}", price=1500.0 + i, description="Bench menu with a description",
+            preparation_time=15, image_url=None, created_at=now, updated_at=now,
+        )
+        menu.restaurant = restaurant
+        menu.categories = categories
+        menu.supplements = supplements
+        menu.average_rating = 4.2
+        menus.append(menu)
+    return menus
+
+
+async def default_path(field, menus, response_class) -> bytes:
+    """What FastAPI does with a returned list of ORM rows"""
+    content = await serialize_response(field=field, response_content=menus)
+    return response_class(content).body
+
+
+async def measure(encode, seconds: float) -> float:
+    encoded = 0
+    started = time.perf_counter()
+    deadline = started + seconds
+    while time.perf_counter() < deadline:
+        encoded += len(await encode())
+    return encoded / (time.perf_counter() - started)
+
+
+async def compare(args: argparse.Namespace) -> None:
+    menus = build_menus(args.menus)
+    field = create_model_field(name="response", type_=list[MenuSchema], mode="serialization")
+
+    async def fast_path():
+        return menu_serializer.many(menus).body
+
+    runs = (
+        ("default (json)", lambda: default_path(field, menus, JSONResponse)),
+        ("default (orjson)", lambda: default_path(field, menus, ORJSONResponse)),
+        ("fast path", fast_path),
+    )
+    baseline = None
+    for label, encode in runs:
+        await measure(encode, min(args.seconds, 0.5))  # warm up
+        rate = await measure(encode, args.seconds)
+        baseline = baseline or rate
+        print(f"{label:>16}: {rate / 1e6:8.2f} MB/s per core  ({rate / baseline:4.1f}x)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--menus", type=int, default=100, help="menus per response")
+    parser.add_argument("--seconds", type=float, default=3)
+    asyncio.run(compare(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
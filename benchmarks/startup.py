@@ -0,0 +1,63 @@
+"""
+Measure time to first request: from spawning uvicorn to the first
+successful response.
+
+    python -m benchmarks.startup --runs 5
+    MIGRATIONS_ON_STARTUP=upgrade python -m benchmarks.startup   # previous behaviour
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+PROBE_PATH = "/health/routing"  # served without touching the database
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def time_to_first_request(timeout: float) -> float:
+    port = free_port()
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        env=os.environ.copy(),
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            if process.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with status {process.returncode}")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}{PROBE_PATH}", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.01)
+        raise TimeoutError(f"No response within {timeout}s")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure time to first request")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=60)
+    args = parser.parse_args()
+
+    samples = [time_to_first_request(args.timeout) for _ in range(args.runs)]
+    print(
+        f"time to first request over {args.runs} runs: "
+        f"median {statistics.median(samples):.3f}s, min {min(samples):.3f}s, max {max(samples):.3f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,61 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
 from config.settings import settings
+from db.pool import instrument_engine, pool_options
 
 # Create SQLAlchemy engine and session
-engine = create_engine(settings.DATABASE_URL)
+engine = create_engine(settings.DATABASE_URL, **pool_options(settings.DATABASE_URL, "primary"))
+instrument_engine(engine, "primary")
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
+# Async drivers used for each sync backend when ASYNC_DATABASE_URL is not set
+ASYNC_DRIVERS = {
+    "mariadb": "mysql+aiomysql",
+    "mysql": "mysql+aiomysql",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def to_async_url(database_url: str) -> str:
+    url = make_url(database_url)
+    return url.set(drivername=ASYNC_DRIVERS.get(url.get_backend_name(), url.drivername)).render_as_string(
+        hide_password=False
+    )
+
+
+def get_async_database_url() -> str:
+    if settings.ASYNC_DATABASE_URL:
+        return settings.ASYNC_DATABASE_URL
+    return to_async_url(settings.DATABASE_URL)
+
+
+# Created lazily so the sync path keeps working when the async driver is not installed
+async_engine = None
+AsyncSessionLocal = None
+
+
+def get_async_sessionmaker() -> async_sessionmaker:
+    global async_engine, AsyncSessionLocal
+    if AsyncSessionLocal is None:
+        url = get_async_database_url()
+        async_engine = create_async_engine(url, **pool_options(url, "primary_async", is_async=True))
+        instrument_engine(async_engine.sync_engine, "primary_async")
+        AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    return AsyncSessionLocal
+
+
+async def dispose_async_engine() -> None:
+    global async_engine, AsyncSessionLocal
+    if async_engine is not None:
+        await async_engine.dispose()
+        async_engine = AsyncSessionLocal = None
+
 
 def get_db():
     """
@@ -20,4 +66,13 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+async def get_async_db():
+    """
+    Dependency function to get an async database session.
+    Routes using it run on the event loop instead of the threadpool.
+    """
+    async with get_async_sessionmaker()() as db:
+        yield db
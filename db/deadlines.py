@@ -0,0 +1,46 @@
+"""
+Request deadlines in the database.
+
+A SELECT run during a request with a deadline (see utils.deadline) carries
+the remaining time as a server-side limit, so MariaDB aborts it instead of
+holding a pooled connection past the deadline:
+
+    MariaDB  SET STATEMENT max_statement_time=<seconds> FOR SELECT ...
+    MySQL    SELECT /*+ MAX_EXECUTION_TIME(<ms>) */ ...
+
+The limit is rounded up to STATEMENT_TIMEOUT_STEP so the rewritten
+statements stay few enough for the driver and normalization caches. A
+SELECT that would start after the deadline raises DeadlineExceededError.
+Writes are left alone so a handler never stops between two commits.
+"""
+import math
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+
+from utils.deadline import check_deadline
+
+STATEMENT_TIMEOUT_STEP = 0.1  # seconds
+# MariaDB max_statement_time and MySQL max_execution_time interruptions
+STATEMENT_TIMEOUT_ERRORS = {1969, 3024}
+
+
+def is_statement_timeout(exc: Exception) -> bool:
+    if not isinstance(exc, OperationalError) or not exc.orig.args:
+        return False
+    return exc.orig.args[0] in STATEMENT_TIMEOUT_ERRORS
+
+
+@event.listens_for(Engine, "before_cursor_execute", retval=True)
+def _apply_deadline(conn, cursor, statement, parameters, context, executemany):
+    if executemany or statement[:6].upper() != "SELECT":
+        return statement, parameters
+    remaining = check_deadline("statement")
+    if remaining is None or conn.dialect.name not in ("mysql", "mariadb"):
+        return statement, parameters
+
+    seconds = math.ceil(remaining / STATEMENT_TIMEOUT_STEP) * STATEMENT_TIMEOUT_STEP
+    if conn.dialect.is_mariadb:
+        return f"SET STATEMENT max_statement_time={seconds:.1f} FOR {statement}", parameters
+    return f"SELECT /*+ MAX_EXECUTION_TIME({int(seconds * 1000)}) */{statement[6:]}", parameters
@@ -0,0 +1,118 @@
+"""
+Per-request SQL statement accounting.
+
+Cursor events on every engine (sync, async, replicas) add the statement and
+its duration to the RequestSqlStats of the current request, held in a
+context variable set by SqlInstrumentationMiddleware. Outside a request the
+hooks cost a single context variable lookup.
+"""
+import contextvars
+import functools
+import logging
+import re
+import threading
+import time
+from collections import Counter
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+current_sql_stats: contextvars.ContextVar["RequestSqlStats | None"] = contextvars.ContextVar(
+    "current_sql_stats", default=None
+)
+
+_WHITESPACE = re.compile(r"\s+")
+_PLACEHOLDER_LIST = re.compile(r"\(\s*(?:\?|%s|%\(\w+\)s)(?:\s*,\s*(?:\?|%s|%\(\w+\)s))*\s*\)")
+_NUMBER = re.compile(r"\b\d+\b")
+
+
+@functools.lru_cache(maxsize=4096)
+def normalize_statement(statement: str) -> str:
+    """Collapse whitespace, IN lists of any length and numeric literals"""
+    statement = _WHITESPACE.sub(" ", statement).strip()
+    statement = _PLACEHOLDER_LIST.sub("(?)", statement)
+    return _NUMBER.sub("?", statement)
+
+
+class RequestSqlStats:
+    __slots__ = ("statements", "duration", "by_statement")
+
+    def __init__(self):
+        self.statements = 0
+        self.duration = 0.0
+        self.by_statement: Counter[str] = Counter()
+
+    def record(self, statement: str, duration: float) -> None:
+        self.statements += 1
+        self.duration += duration
+        self.by_statement[statement] += 1
+
+    def repeated(self, threshold: int) -> list[tuple[str, int]]:
+        """Normalized statements run more than `threshold` times"""
+        counts: Counter[str] = Counter()
+        for statement, count in self.by_statement.items():
+            counts[normalize_statement(statement)] += count
+        return [(statement, count) for statement, count in counts.most_common() if count > threshold]
+
+
+class RouteSqlStats:
+    __slots__ = ("requests", "statements", "db_seconds", "max_statements", "n_plus_one")
+
+    def __init__(self):
+        self.requests = 0
+        self.statements = 0
+        self.db_seconds = 0.0
+        self.max_statements = 0
+        self.n_plus_one = 0
+
+    def snapshot(self) -> dict:
+        return {
+            "requests": self.requests,
+            "statements_per_request": round(self.statements / self.requests, 2) if self.requests else 0,
+            "db_ms_per_request": round(self.db_seconds * 1000 / self.requests, 3) if self.requests else 0,
+            "max_statements": self.max_statements,
+            "n_plus_one": self.n_plus_one,
+        }
+
+
+route_sql_stats: dict[str, RouteSqlStats] = {}
+_route_lock = threading.Lock()
+
+
+def finish_request(route: str, stats: RequestSqlStats, n_plus_one_threshold: int) -> None:
+    """Add a finished request to its route aggregate and warn about repeated statements"""
+    repeated = stats.repeated(n_plus_one_threshold) if stats.statements > n_plus_one_threshold else []
+    for statement, count in repeated:
+        logger.warning("Possible N+1 on %s: statement ran %d times: %s", route, count, statement[:500])
+
+    with _route_lock:
+        aggregate = route_sql_stats.get(route)
+        if aggregate is None:
+            aggregate = route_sql_stats[route] = RouteSqlStats()
+        aggregate.requests += 1
+        aggregate.statements += stats.statements
+        aggregate.db_seconds += stats.duration
+        aggregate.max_statements = max(aggregate.max_statements, stats.statements)
+        if repeated:
+            aggregate.n_plus_one += 1
+
+
+def route_sql_snapshot() -> dict:
+    with _route_lock:
+        return {route: aggregate.snapshot() for route, aggregate in sorted(route_sql_stats.items())}
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if current_sql_stats.get() is not None:
+        context._sql_started = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = current_sql_stats.get()
+    started = getattr(context, "_sql_started", None)
+    if stats is not None and started is not None:
+        stats.record(statement, time.perf_counter() - started)
@@ -0,0 +1,136 @@
+"""
+Database migrations.
+
+    python -m db.migrate            # upgrade to head, under an advisory lock
+    python -m db.migrate --check    # exit with status 1 when the database is behind
+
+Run the upgrade once per deploy instead of from every worker. At startup,
+workers only compare the database revision with the head of the migration
+scripts (see MIGRATIONS_ON_STARTUP), which costs one query and a scan of
+the revision ids in migrations/versions, without importing Alembic.
+"""
+import argparse
+import logging
+import os
+import re
+import sys
+import time
+from contextlib import contextmanager
+
+from sqlalchemy import exc, text
+
+from config.settings import settings
+from db import engine
+
+logger = logging.getLogger(__name__)
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ALEMBIC_INI = os.path.join(PROJECT_DIR, "alembic.ini")
+VERSIONS_DIR = os.path.join(PROJECT_DIR, "migrations", "versions")
+MIGRATION_LOCK_NAME = "ndock_migrations"
+
+_REVISION = re.compile(r"^revision\b[^=\n]*=\s*['\"]([^'\"]+)['\"]", re.M)
+_DOWN_REVISION = re.compile(r"^down_revision\b[^=\n]*=(.*)$", re.M)
+_QUOTED = re.compile(r"['\"]([^'\"]+)['\"]")
+
+
+def script_heads() -> set[str]:
+    """Head revisions of the migration scripts, read without importing them"""
+    revisions, parents = set(), set()
+    for name in os.listdir(VERSIONS_DIR):
+        if not name.endswith(".py"):
+            continue
+        with open(os.path.join(VERSIONS_DIR, name), encoding="utf-8") as file:
+            source = file.read()
+        revision = _REVISION.search(source)
+        if revision is None:
+            continue
+        revisions.add(revision.group(1))
+        down_revision = _DOWN_REVISION.search(source)
+        if down_revision is not None:
+            parents.update(_QUOTED.findall(down_revision.group(1)))
+    return revisions - parents
+
+
+def database_heads(connection) -> set[str]:
+    try:
+        return {row[0] for row in connection.execute(text("SELECT version_num FROM alembic_version"))}
+    except (exc.OperationalError, exc.ProgrammingError):
+        # No alembic_version table yet
+        connection.rollback()
+        return set()
+
+
+def check_revision() -> bool:
+    """True when the database is at the scripts' head; logs the mismatch otherwise"""
+    with engine.connect() as connection:
+        current = database_heads(connection)
+    heads = script_heads()
+    if current == heads:
+        logger.info("Database at migration head %s", ", ".join(sorted(heads)))
+        return True
+    logger.error(
+        "Database revision %s does not match migration head %s; run `python -m db.migrate`",
+        ", ".join(sorted(current)) or "(none)", ", ".join(sorted(heads)),
+    )
+    return False
+
+
+@contextmanager
+def migration_lock(connection, timeout: float):
+    """Server-side advisory lock, so concurrent deploys migrate one at a time"""
+    if connection.dialect.name in ("mysql", "mariadb"):
+        acquired = connection.execute(
+            text("SELECT GET_LOCK(:name, :timeout)"), {"name": MIGRATION_LOCK_NAME, "timeout": timeout}
+        ).scalar()
+        if acquired != 1:
+            raise TimeoutError(f"Could not acquire the migration lock within {timeout}s")
+        try:
+            yield
+        finally:
+            connection.execute(text("SELECT RELEASE_LOCK(:name)"), {"name": MIGRATION_LOCK_NAME})
+    elif connection.dialect.name == "postgresql":
+        connection.execute(text("SELECT pg_advisory_lock(hashtext(:name))"), {"name": MIGRATION_LOCK_NAME})
+        try:
+            yield
+        finally:
+            connection.execute(text("SELECT pg_advisory_unlock(hashtext(:name))"), {"name": MIGRATION_LOCK_NAME})
+    else:
+        # SQLite: a single file, writers are already serialized
+        yield
+
+
+def upgrade(timeout: float = settings.MIGRATION_LOCK_TIMEOUT_SECONDS) -> None:
+    """Upgrade the database to head, unless another process already did"""
+    from alembic import command
+    from alembic.config import Config
+
+    with engine.connect() as connection:
+        with migration_lock(connection, timeout):
+            heads = script_heads()
+            if database_heads(connection) == heads:
+                logger.info("Database already at migration head %s", ", ".join(sorted(heads)))
+                return
+            # Release the snapshot taken by the check before Alembic writes
+            connection.rollback()
+
+            started = time.perf_counter()
+            config = Config(ALEMBIC_INI)
+            config.set_main_option("script_location", os.path.join(PROJECT_DIR, "migrations"))
+            command.upgrade(config, "head")
+            logger.info("Migrated to %s in %.2fs", ", ".join(sorted(heads)), time.perf_counter() - started)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Apply or check database migrations")
+    parser.add_argument("--check", action="store_true", help="only compare the database revision with head")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    if args.check:
+        sys.exit(0 if check_revision() else 1)
+    upgrade()
+
+
+if __name__ == "__main__":
+    main()
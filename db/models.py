@@ -1,6 +1,7 @@
+import json
 from datetime import datetime
 
-from sqlalchemy import Column, Integer, String, ForeignKey, Text, Float, Enum, DateTime, Table
+from sqlalchemy import Column, Integer, String, ForeignKey, Text, Float, Enum, DateTime, Table, Index
 from sqlalchemy.orm import relationship
 
 from db import Base
@@ -51,6 +52,7 @@ class Restaurant(Base):
     updated_at = Column(DateTime, nullable=False, default=datetime.now, onupdate=datetime.now)
     menus = relationship('Menu', back_populates='restaurant')
     orders = relationship('Order', back_populates='restaurant')
+    delivery_zones = relationship('DeliveryZone', back_populates='restaurant')
 
 
 class MenuCategory(Base):
@@ -164,3 +166,80 @@ class Shipment(Base):
     status = Column(Enum('pending', 'completed', 'canceled'), nullable=False)
     created_at = Column(DateTime, nullable=False, default=datetime.now)
     updated_at = Column(DateTime, nullable=False, default=datetime.now, onupdate=datetime.now)
+
+
+class ShipperLocation(Base):
+    __tablename__ = 'shipper_locations'
+    __table_args__ = (
+        Index('ix_shipper_locations_shipper_id_recorded_at', 'shipper_id', 'recorded_at'),
+    )
+    id = Column(Integer, primary_key=True)
+    shipper_id = Column(Integer, ForeignKey('shippers.id'), nullable=False)
+    latitude = Column(Float, nullable=False)
+    longitude = Column(Float, nullable=False)
+    recorded_at = Column(DateTime, nullable=False)
+    created_at = Column(DateTime, nullable=False, default=datetime.now)
+
+
+class DeliveryZone(Base):
+    __tablename__ = 'delivery_zones'
+    id = Column(Integer, primary_key=True)
+    restaurant_id = Column(Integer, ForeignKey('restaurants.id'), nullable=False, index=True)
+    # Either a radius around the restaurant or a polygon of [latitude, longitude] vertices
+    radius_km = Column(Float, nullable=True)
+    polygon_json = Column(Text, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.now)
+    updated_at = Column(DateTime, nullable=False, default=datetime.now, onupdate=datetime.now)
+    restaurant = relationship('Restaurant', back_populates='delivery_zones')
+
+    @property
+    def polygon(self):
+        return json.loads(self.polygon_json) if self.polygon_json else None
+
+    @polygon.setter
+    def polygon(self, vertices):
+        self.polygon_json = json.dumps(vertices) if vertices else None
+
+
+class Job(Base):
+    """Background job (see services.jobs)"""
+    __tablename__ = 'jobs'
+    __table_args__ = (
+        # Claim order: queued jobs by priority, then due time
+        Index('ix_jobs_status_priority_run_at', 'status', 'priority', 'run_at'),
+    )
+    id = Column(Integer, primary_key=True)
+    name = Column(String(100), nullable=False)
+    payload_json = Column(Text, nullable=True)
+    priority = Column(Integer, nullable=False, default=0)
+    status = Column(String(20), nullable=False, default='queued')
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False)
+    run_at = Column(DateTime, nullable=False, default=datetime.now)
+    # Claim token of the worker running the job, and when its lease expires
+    locked_by = Column(String(100), nullable=True)
+    locked_until = Column(DateTime, nullable=True)
+    # Deduplicates scheduled (cron) runs across workers
+    unique_key = Column(String(200), nullable=True, unique=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.now)
+    finished_at = Column(DateTime, nullable=True)
+
+
+class OutboxEvent(Base):
+    """Domain event written in the same transaction as the change it describes (see services.outbox)"""
+    __tablename__ = 'outbox_events'
+    # Consumers read events in id order and keep the last id they handled as their offset
+    id = Column(Integer, primary_key=True)
+    topic = Column(String(100), nullable=False)
+    key = Column(String(100), nullable=True)
+    payload_json = Column(Text, nullable=False)
+    created_at = Column(DateTime, nullable=False, default=datetime.now, index=True)
+
+
+class ConsumerOffset(Base):
+    """Last outbox event id handled by a durable consumer"""
+    __tablename__ = 'consumer_offsets'
+    consumer = Column(String(100), primary_key=True)
+    last_event_id = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, nullable=False, default=datetime.now, onupdate=datetime.now)
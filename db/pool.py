@@ -0,0 +1,140 @@
+"""
+Connection pool configuration and telemetry.
+
+Engines get their pool sizing, recycle, pre-ping and timeout from settings,
+and a pool class that times every checkout, so the wait for a connection
+shows up in a histogram next to the number of connections in use and the
+overflow actually consumed.
+
+Pools are sized per engine, and every gunicorn worker has two primary
+engines (sync and async), so the primary may see up to
+SERVER_WORKERS * 2 * (DB_POOL_SIZE + DB_MAX_OVERFLOW) connections from the
+app, plus the job runner and migration processes. The server logs a
+warning at startup when that exceeds DB_SERVER_MAX_CONNECTIONS.
+"""
+import threading
+import time
+
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from config.settings import settings
+from utils.metrics import Histogram
+
+CHECKOUT_WAIT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class PoolStats:
+    def __init__(self):
+        self.checkout_wait = Histogram(CHECKOUT_WAIT_BUCKETS)
+        self.peak_in_use = 0
+        self.peak_overflow = 0
+        self.counters = {"checkouts": 0, "timeouts": 0, "connects": 0, "invalidations": 0}
+        self._lock = threading.Lock()
+
+    def count(self, name: str) -> None:
+        with self._lock:
+            self.counters[name] += 1
+
+    def record_checkout(self, wait: float, in_use: int, overflow: int) -> None:
+        self.checkout_wait.observe(wait)
+        with self._lock:
+            self.counters["checkouts"] += 1
+            self.peak_in_use = max(self.peak_in_use, in_use)
+            self.peak_overflow = max(self.peak_overflow, overflow)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            snapshot = {
+                "peak_in_use": self.peak_in_use,
+                "peak_overflow": self.peak_overflow,
+                "counters": dict(self.counters),
+            }
+        snapshot["checkout_wait_seconds"] = self.checkout_wait.snapshot()
+        return snapshot
+
+
+# Stats and engines per pool name; stats survive engine.dispose(), which recreates the pool
+pool_stats: dict[str, PoolStats] = {}
+engines: dict[str, Engine] = {}
+
+
+def get_pool_stats(name: str) -> PoolStats:
+    stats = pool_stats.get(name)
+    if stats is None:
+        stats = pool_stats.setdefault(name, PoolStats())
+    return stats
+
+
+class _CheckoutTimingMixin:
+    def connect(self):
+        stats = get_pool_stats(self.logging_name or "default")
+        started = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            stats.count("timeouts")
+            raise
+        stats.record_checkout(time.perf_counter() - started, self.checkedout(), max(self.overflow(), 0))
+        return connection
+
+
+class InstrumentedQueuePool(_CheckoutTimingMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(_CheckoutTimingMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def pool_options(url: str, name: str, is_async: bool = False) -> dict:
+    """create_engine keyword arguments configuring the pool for `url`"""
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:"):
+        # In-memory SQLite needs its single-connection pool
+        return {}
+    return {
+        "poolclass": InstrumentedAsyncQueuePool if is_async else InstrumentedQueuePool,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_recycle": settings.DB_POOL_RECYCLE_SECONDS,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "pool_timeout": settings.DB_POOL_TIMEOUT_SECONDS,
+        "pool_logging_name": name,
+    }
+
+
+def primary_connection_budget(workers: int = settings.SERVER_WORKERS) -> int:
+    """Most connections the app workers may open to the primary: a sync and an async pool each"""
+    return workers * 2 * (settings.DB_POOL_SIZE + max(settings.DB_MAX_OVERFLOW, 0))
+
+
+def instrument_engine(engine: Engine, name: str) -> None:
+    """Register an engine (the sync_engine of async ones) for pool telemetry"""
+    stats = get_pool_stats(name)
+    engines[name] = engine
+
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        stats.count("connects")
+
+    @event.listens_for(engine, "invalidate")
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        stats.count("invalidations")
+
+
+def pool_snapshot(name: str) -> dict:
+    pool = engines[name].pool
+    snapshot = {"pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        snapshot.update({
+            "size": pool.size(),
+            "max_overflow": settings.DB_MAX_OVERFLOW,
+            "in_use": pool.checkedout(),
+            "idle": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+        })
+
+    snapshot.update(get_pool_stats(name).snapshot())
+    return snapshot
@@ -0,0 +1,183 @@
+"""
+Read replica routing.
+
+Read-only handlers take their session from get_read_db / get_async_read_db,
+which hand out a replica chosen round-robin or by fewest connections in
+use. Clients that just wrote something carry a short-lived cookie (set by
+ReadYourWritesMiddleware) and keep reading from the primary until replicas
+have caught up. Replicas are ejected after REPLICA_FAILURE_THRESHOLD
+disconnect errors or failed probes, and readmitted once a probe succeeds.
+"""
+import asyncio
+import itertools
+import math
+import threading
+import time
+
+from fastapi import Request
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
+from starlette.concurrency import run_in_threadpool
+
+from config.settings import settings
+from db import SessionLocal, get_async_sessionmaker, to_async_url
+from db.pool import instrument_engine, pool_options
+
+READ_YOUR_WRITES_COOKIE = "db_primary_until"
+
+
+class Replica:
+    def __init__(self, name: str, url: str):
+        self.name = name
+        self.url = url
+        self.engine = create_engine(url, **pool_options(url, name))
+        self.session_factory = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+        self.async_engine = None
+        self._async_session_factory = None
+        self._lock = threading.Lock()
+
+        self.healthy = True
+        self.consecutive_failures = 0
+        self.times_ejected = 0
+        self._watch(self.engine, name)
+
+    def _watch(self, engine, name: str) -> None:
+        instrument_engine(engine, name)
+
+        @event.listens_for(engine, "handle_error")
+        def on_error(context):
+            if context.is_disconnect:
+                self.record_failure()
+
+    def async_session_factory(self) -> async_sessionmaker:
+        if self._async_session_factory is None:
+            with self._lock:
+                if self._async_session_factory is None:
+                    url = to_async_url(self.url)
+                    self.async_engine = create_async_engine(
+                        url, **pool_options(url, f"{self.name}_async", is_async=True)
+                    )
+                    self._watch(self.async_engine.sync_engine, f"{self.name}_async")
+                    self._async_session_factory = async_sessionmaker(
+                        self.async_engine, autoflush=False, expire_on_commit=False
+                    )
+        return self._async_session_factory
+
+    def in_use(self) -> int:
+        total = 0
+        for engine in (self.engine, self.async_engine and self.async_engine.sync_engine):
+            if engine is not None and isinstance(engine.pool, QueuePool):
+                total += engine.pool.checkedout()
+        return total
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.consecutive_failures = 0
+            self.healthy = True
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.healthy and self.consecutive_failures >= settings.REPLICA_FAILURE_THRESHOLD:
+                self.healthy = False
+                self.times_ejected += 1
+
+    def probe(self) -> bool:
+        try:
+            with self.engine.connect() as connection:
+                connection.execute(text("SELECT 1"))
+        except Exception:
+            self.record_failure()
+            return False
+        self.record_success()
+        return True
+
+    def snapshot(self) -> dict:
+        return {
+            "healthy": self.healthy,
+            "consecutive_failures": self.consecutive_failures,
+            "times_ejected": self.times_ejected,
+            "in_use": self.in_use(),
+        }
+
+
+class ReplicaSet:
+    def __init__(self, urls: list[str], strategy: str = settings.REPLICA_SELECTION):
+        self.replicas = [Replica(f"replica_{i}", url) for i, url in enumerate(urls)]
+        self.strategy = strategy
+        self._counter = itertools.count()
+
+    def choose(self) -> Replica | None:
+        """A healthy replica, or None to read from the primary"""
+        if not self.replicas:
+            return None
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            return None
+        if self.strategy == "least_busy":
+            return min(healthy, key=Replica.in_use)
+        return healthy[next(self._counter) % len(healthy)]
+
+    def check(self) -> None:
+        for replica in self.replicas:
+            replica.probe()
+
+    async def run(self) -> None:
+        """Probe every replica periodically, ejecting and readmitting them"""
+        while True:
+            await asyncio.sleep(settings.REPLICA_HEALTH_CHECK_SECONDS)
+            await run_in_threadpool(self.check)
+
+    async def dispose(self) -> None:
+        for replica in self.replicas:
+            replica.engine.dispose()
+            if replica.async_engine is not None:
+                await replica.async_engine.dispose()
+
+    def snapshot(self) -> dict:
+        return {
+            "strategy": self.strategy,
+            "replicas": {replica.name: replica.snapshot() for replica in self.replicas},
+        }
+
+
+def reads_from_primary(request: Request) -> bool:
+    """True while the client's own recent writes may not have reached the replicas"""
+    until = request.cookies.get(READ_YOUR_WRITES_COOKIE)
+    if until is None:
+        return False
+    try:
+        until = float(until)
+    except ValueError:
+        return False
+    now = time.time()
+    # The cookie comes from the client: a value we could not have set (inf, nan, far future) is
+    # ignored; the extra second covers the rounding of the values ReadYourWritesMiddleware sets
+    return math.isfinite(until) and now < until <= now + settings.READ_YOUR_WRITES_SECONDS + 1
+
+
+def get_read_db(request: Request):
+    """
+    Dependency function to get a database session for read-only handlers.
+    Served by a replica when one is available.
+    """
+    replica = None if reads_from_primary(request) else replica_set.choose()
+    db = replica.session_factory() if replica is not None else SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_read_db(request: Request):
+    """Async counterpart of get_read_db"""
+    replica = None if reads_from_primary(request) else replica_set.choose()
+    factory = replica.async_session_factory() if replica is not None else get_async_sessionmaker()
+    async with factory() as db:
+        yield db
+
+
+# Create the global replica set
+replica_set = ReplicaSet(settings.DATABASE_REPLICA_URLS)
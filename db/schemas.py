@@ -1,6 +1,6 @@
 from datetime import datetime
 
-from pydantic import BaseModel
+from pydantic import BaseModel, model_validator
 
 
 class TokenData(BaseModel):
@@ -34,6 +34,18 @@ class User(UserBase):
         from_attributes = True
 
 
+class Principal(BaseModel):
+    """Lightweight record of the authenticated user"""
+    id: int
+    email: str
+    first_name: str
+    last_name: str
+
+    class Config:
+        from_attributes = True
+        frozen = True
+
+
 class OrderItemSupplementBase(BaseModel):
     supplement_id: int
     quantity: int
@@ -80,6 +92,8 @@ class OrderBase(BaseModel):
 
 class OrderCreate(OrderBase):
     items: list[OrderItemCreate]
+    delivery_latitude: float | None = None
+    delivery_longitude: float | None = None
 
 
 class Order(OrderBase):
@@ -125,6 +139,33 @@ class Restaurant(RestaurantBase):
         from_attributes = True
 
 
+class DeliveryZoneBase(BaseModel):
+    radius_km: float | None = None
+    polygon: list[tuple[float, float]] | None = None
+
+
+class DeliveryZoneCreate(DeliveryZoneBase):
+    @model_validator(mode='after')
+    def radius_or_polygon(self):
+        if (self.radius_km is None) == (self.polygon is None):
+            raise ValueError('Specify either radius_km or polygon')
+        if self.radius_km is not None and self.radius_km <= 0:
+            raise ValueError('radius_km must be positive')
+        if self.polygon is not None and len(self.polygon) < 3:
+            raise ValueError('A polygon needs at least 3 vertices')
+        return self
+
+
+class DeliveryZone(DeliveryZoneBase):
+    id: int
+    restaurant_id: int
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
 class MenuCategoryBase(BaseModel):
     name: str
     image_url: str | None = None
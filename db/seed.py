@@ -0,0 +1,555 @@
+"""
+Deterministic synthetic dataset for load and performance testing.
+
+    python -m db.seed --scale small --create-tables           # local SQLite
+    python -m db.seed --scale large --method load-data        # MariaDB, tens of millions of rows
+
+Every table of db.models is filled from --seed: the same seed and scale
+always produce the same rows, whatever the insert method. Rows are
+generated with NumPy in fixed chunks of CHUNK_ROWS, each with its own
+random stream, so they never have to be held in memory at once.
+
+Distributions:
+    restaurants  clustered around neighbourhoods of a few cities
+    menus        grouped by restaurant, uneven menu counts per restaurant
+    popularity   Zipfian over menus: comments and orders concentrate on
+                 a few popular menus, spread over every restaurant
+    ratings      around a per-menu quality
+    orders       1-3 menus of one restaurant, some with supplements, a
+                 shipment near the restaurant, times growing with the id
+
+Insert methods:
+    insert     DB-API executemany: multi-row INSERTs with PyMySQL, bulk
+               execution with MariaDB Connector/Python, prepared
+               statements with SQLite
+    load-data  LOAD DATA LOCAL INFILE from tab-separated chunks (MariaDB and
+               MySQL; the server needs local_infile=ON)
+
+Tables must be empty (use --truncate). All users share the password
+SEED_PASSWORD.
+"""
+import argparse
+import logging
+import math
+import os
+import tempfile
+import time
+from dataclasses import dataclass, fields, replace
+from datetime import datetime
+
+import bcrypt
+import numpy as np
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import Engine, make_url
+
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+CHUNK_ROWS = 100_000
+SEED_PASSWORD = "password"
+# Fixed bcrypt salt so the password hash is deterministic as well
+SEED_PASSWORD_SALT = b"ndockseedsaltndockseeu"
+
+# Orders and comments are spread over the two years before this date
+PERIOD_END = np.datetime64("2025-06-01T00:00:00", "s")
+PERIOD_SECONDS = 2 * 365 * 24 * 3600
+
+MENU_ZIPF_EXPONENT = 1.1
+
+# City, latitude, longitude, share of restaurants
+CITIES = [
+    ("Douala", 4.05, 9.70, 0.35),
+    ("Yaoundé", 3.87, 11.52, 0.30),
+    ("Bafoussam", 5.48, 10.42, 0.10),
+    ("Bamenda", 5.96, 10.15, 0.09),
+    ("Garoua", 9.30, 13.40, 0.08),
+    ("Kribi", 2.94, 9.91, 0.08),
+]
+NEIGHBOURHOODS_PER_CITY = 8
+NEIGHBOURHOOD_SPREAD_DEG = 0.04  # neighbourhood centres around the city centre
+RESTAURANT_SPREAD_DEG = 0.006  # restaurants around their neighbourhood centre, about 600 m
+
+DISHES = [
+    "Ndolé", "Poulet DG", "Eru", "Koki", "Achu", "Poisson braisé", "Soya", "Okok", "Mbongo tchobi", "Sanga",
+    "Kondrè", "Beignets haricots", "Pizza", "Burger", "Shawarma", "Salade", "Riz sauté", "Spaghetti", "Taro",
+    "Brochettes",
+]
+CATEGORIES = [
+    "Plats traditionnels", "Grillades", "Fast-food", "Poissons", "Végétarien", "Desserts", "Boissons",
+    "Petit-déjeuner", "Salades", "Pizzas", "Sandwichs", "Soupes", "Fruits de mer", "Street food", "Épicerie",
+]
+SUPPLEMENTS = ["Plantain frit", "Miondo", "Bâton de manioc", "Frites", "Piment", "Avocat", "Oeuf", "Fromage",
+               "Sauce", "Riz"]
+COMMENTS = [
+    "Très bon, je recommande", "Livraison rapide", "Portion généreuse", "Un peu trop épicé", "Arrivé froid",
+    "Excellent rapport qualité prix", "Moyen", "Délicieux comme d'habitude", "Trop salé", "Parfait",
+]
+
+
+@dataclass(frozen=True)
+class Scale:
+    users: int
+    restaurants: int
+    menus: int
+    comments: int
+    orders: int
+    shippers: int
+    shipper_locations: int
+    categories: int = 30
+    supplements: int = 500
+
+
+SCALES = {
+    "small": Scale(users=1_000, restaurants=50, menus=1_000, comments=10_000, orders=5_000, shippers=50,
+                   shipper_locations=10_000),
+    "medium": Scale(users=50_000, restaurants=1_000, menus=100_000, comments=2_000_000, orders=1_000_000,
+                    shippers=500, shipper_locations=1_000_000),
+    "large": Scale(users=1_000_000, restaurants=10_000, menus=1_000_000, comments=50_000_000, orders=20_000_000,
+                   shippers=5_000, shipper_locations=10_000_000),
+}
+
+# Child tables first, for truncation
+TABLES = [
+    "shipper_locations", "shipments", "order_item_supplements", "order_items", "orders", "comments",
+    "delivery_zones", "menu_supplements_association", "menu_categories_association", "menus", "supplements",
+    "menu_categories", "shippers", "restaurants", "users",
+]
+
+
+def _timestamps(ids: np.ndarray, total: int, rng: np.random.Generator) -> np.ndarray:
+    """Creation times growing with the id over the seeded period, with a few hours of jitter"""
+    offsets = (ids / max(total, 1) * PERIOD_SECONDS).astype(np.int64) + rng.integers(0, 4 * 3600, len(ids))
+    return PERIOD_END - PERIOD_SECONDS + np.minimum(offsets, PERIOD_SECONDS).astype("timedelta64[s]")
+
+
+def _pick(pool: list[str], indexes: np.ndarray) -> list[str]:
+    return np.asarray(pool, dtype=object)[indexes].tolist()
+
+
+class Writer:
+    """Loads column-oriented chunks with executemany or LOAD DATA LOCAL INFILE"""
+
+    def __init__(self, engine: Engine, method: str):
+        self.engine = engine
+        self.method = method
+        self.placeholder = "?" if engine.dialect.paramstyle == "qmark" else "%s"
+        self.rows: dict[str, int] = {}
+
+    @staticmethod
+    def _python(column):
+        if isinstance(column, np.ndarray):
+            return column.tolist()
+        return column
+
+    @staticmethod
+    def _text(column) -> list[str]:
+        if isinstance(column, np.ndarray):
+            if column.dtype.kind == "M":
+                return np.char.replace(np.datetime_as_string(column, unit="s"), "T", " ").tolist()
+            if column.dtype.kind == "f":
+                return np.char.mod("%.6f", column).tolist()
+            return column.astype(str).tolist()
+        return ["\\N" if value is None else str(value) for value in column]
+
+    def write(self, table: str, columns: dict) -> None:
+        names = list(columns)
+        count = len(next(iter(columns.values())))
+        if count == 0:
+            return
+        with self.engine.begin() as conn:
+            if self.method == "load-data":
+                self._load_data(conn, table, names, columns)
+            else:
+                sql = f"INSERT INTO {table} ({', '.join(names)}) VALUES ({', '.join([self.placeholder] * len(names))})"
+                conn.exec_driver_sql(sql, list(zip(*(self._python(columns[name]) for name in names))))
+        self.rows[table] = self.rows.get(table, 0) + count
+
+    def _load_data(self, conn, table: str, names: list[str], columns: dict) -> None:
+        with tempfile.NamedTemporaryFile("w", suffix=".tsv", encoding="utf-8", delete=False) as file:
+            file.write("\n".join(map("\t".join, zip(*(self._text(columns[name]) for name in names)))))
+            file.write("\n")
+        try:
+            conn.exec_driver_sql(
+                f"LOAD DATA LOCAL INFILE '{file.name}' INTO TABLE {table} CHARACTER SET utf8mb4 "
+                f"FIELDS TERMINATED BY '\\t' LINES TERMINATED BY '\\n' ({', '.join(names)})"
+            )
+        finally:
+            os.unlink(file.name)
+
+
+class Seeder:
+    def __init__(self, writer: Writer, scale: Scale, seed: int):
+        self.writer = writer
+        self.scale = scale
+        self.seed = seed
+
+    def rng(self, table: str, chunk: int = 0) -> np.random.Generator:
+        """Independent stream per table and chunk, so chunks can be generated one at a time"""
+        return np.random.default_rng([self.seed, TABLES.index(table), chunk])
+
+    @staticmethod
+    def chunks(total: int):
+        for chunk, start in enumerate(range(0, total, CHUNK_ROWS)):
+            yield chunk, np.arange(start + 1, min(total, start + CHUNK_ROWS) + 1, dtype=np.int64)
+
+    def run(self) -> None:
+        for step in (self.users, self.restaurants, self.catalog, self.menus, self.delivery_zones, self.shippers,
+                     self.comments, self.orders, self.shipper_locations):
+            started = time.perf_counter()
+            before = sum(self.writer.rows.values())
+            step()
+            rows = sum(self.writer.rows.values()) - before
+            elapsed = time.perf_counter() - started
+            logger.info("%s: %d rows in %.1fs (%.0f rows/s)", step.__name__, rows, elapsed, rows / max(elapsed, 1e-9))
+
+    def users(self) -> None:
+        rounds = f"$2b${settings.BCRYPT_ROUNDS:02d}$".encode()
+        password_hash = bcrypt.hashpw(SEED_PASSWORD.encode(), rounds + SEED_PASSWORD_SALT).decode()
+        for chunk, ids in self.chunks(self.scale.users):
+            rng = self.rng("users", chunk)
+            created = _timestamps(ids, self.scale.users, rng)
+            self.writer.write("users", {
+                "id": ids,
+                "first_name": [f"Prénom{i}" for i in ids.tolist()],
+                "last_name": [f"Nom{i}" for i in ids.tolist()],
+                "email": [f"user{i}@example.com" for i in ids.tolist()],
+                "phone_number": [f"+2376{i:08d}" for i in ids.tolist()],
+                "password_hash": [password_hash] * len(ids),
+                "address": [f"{i % 500 + 1} rue {CITIES[i % len(CITIES)][0]}" for i in ids.tolist()],
+                "created_at": created,
+                "updated_at": created,
+            })
+
+    def _restaurant_locations(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        rng = self.rng("restaurants")
+        shares = np.array([city[3] for city in CITIES])
+        city = rng.choice(len(CITIES), self.scale.restaurants, p=shares / shares.sum())
+        centres = np.array([[city[1], city[2]] for city in CITIES])
+        neighbourhoods = centres[:, None, :] + rng.normal(0, NEIGHBOURHOOD_SPREAD_DEG,
+                                                          (len(CITIES), NEIGHBOURHOODS_PER_CITY, 2))
+        neighbourhood = rng.integers(0, NEIGHBOURHOODS_PER_CITY, self.scale.restaurants)
+        points = neighbourhoods[city, neighbourhood] + rng.normal(0, RESTAURANT_SPREAD_DEG, (self.scale.restaurants, 2))
+        return city, points[:, 0], points[:, 1]
+
+    def restaurants(self) -> None:
+        self.restaurant_city, self.restaurant_lat, self.restaurant_lng = self._restaurant_locations()
+        for chunk, ids in self.chunks(self.scale.restaurants):
+            rng = self.rng("restaurants", chunk + 1)
+            index = ids - 1
+            created = PERIOD_END - PERIOD_SECONDS + rng.integers(0, PERIOD_SECONDS // 4, len(ids)).astype("timedelta64[s]")
+            cities = [CITIES[c][0] for c in self.restaurant_city[index].tolist()]
+            self.writer.write("restaurants", {
+                "id": ids,
+                "name": [f"{DISHES[i % len(DISHES)]} {city} {i}" for i, city in zip(ids.tolist(), cities)],
+                "latitude": self.restaurant_lat[index],
+                "longitude": self.restaurant_lng[index],
+                "address": [f"{i % 300 + 1} avenue principale, {city}" for i, city in zip(ids.tolist(), cities)],
+                "phone_number": [f"+2332{i:07d}" for i in ids.tolist()],
+                "description": ["Restaurant de quartier"] * len(ids),
+                "logo_url": [None] * len(ids),
+                "banner_url": [None] * len(ids),
+                "created_at": created,
+                "updated_at": created,
+            })
+
+    def catalog(self) -> None:
+        created = np.full(self.scale.categories, PERIOD_END - PERIOD_SECONDS)
+        ids = np.arange(1, self.scale.categories + 1)
+        self.writer.write("menu_categories", {
+            "id": ids,
+            "name": [CATEGORIES[(i - 1) % len(CATEGORIES)] + ("" if i <= len(CATEGORIES) else f" {i}")
+                     for i in ids.tolist()],
+            "image_url": [None] * len(ids),
+            "created_at": created,
+            "updated_at": created,
+        })
+
+        rng = self.rng("supplements")
+        ids = np.arange(1, self.scale.supplements + 1)
+        self.supplement_price = np.round(rng.uniform(200, 1500, len(ids)), -2)
+        created = np.full(len(ids), PERIOD_END - PERIOD_SECONDS)
+        self.writer.write("supplements", {
+            "id": ids,
+            "name": [f"{SUPPLEMENTS[i % len(SUPPLEMENTS)]} {i}" for i in ids.tolist()],
+            "price": self.supplement_price,
+            "description": ["Supplément"] * len(ids),
+            "preparation_time": rng.integers(0, 6, len(ids)),
+            "image_url": [None] * len(ids),
+            "created_at": created,
+            "updated_at": created,
+        })
+
+    # Categories and supplements of a menu are functions of its id, so orders can pick them without lookups
+    def menu_categories(self, menu_ids: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        counts = 1 + menu_ids % 2
+        menus = np.repeat(menu_ids, counts)
+        slot = np.arange(len(menus)) - np.repeat(np.cumsum(counts) - counts, counts)
+        return menus, (menus * 31 + slot) % self.scale.categories + 1
+
+    def menu_supplement_counts(self, menu_ids: np.ndarray) -> np.ndarray:
+        return np.minimum(menu_ids % 4, self.scale.supplements)
+
+    def menu_supplement(self, menu_ids: np.ndarray, slot: np.ndarray) -> np.ndarray:
+        return (menu_ids * 7919 + slot) % self.scale.supplements + 1
+
+    def menus(self) -> None:
+        rng = self.rng("menus")
+        # Uneven menu counts per restaurant; menus of a restaurant have consecutive ids
+        weights = rng.lognormal(0, 0.8, self.scale.restaurants)
+        counts = rng.multinomial(self.scale.menus, weights / weights.sum())
+        self.restaurant_menu_start = np.cumsum(counts) - counts + 1
+        self.restaurant_menu_count = counts
+        self.menu_restaurant = np.repeat(np.arange(1, self.scale.restaurants + 1), counts)
+
+        # Zipfian popularity, with the popularity ranks shuffled over the menus
+        ranks = np.arange(1, self.scale.menus + 1, dtype=np.float64)
+        self.menu_popularity_cdf = np.cumsum(ranks ** -MENU_ZIPF_EXPONENT)
+        self.menu_popularity_cdf /= self.menu_popularity_cdf[-1]
+        self.menu_by_rank = rng.permutation(self.scale.menus) + 1
+        self.menu_quality = rng.uniform(2.5, 4.8, self.scale.menus)
+        self.menu_price = np.round(rng.lognormal(math.log(3000), 0.5, self.scale.menus), -2).clip(500, 50000)
+
+        for chunk, ids in self.chunks(self.scale.menus):
+            rng = self.rng("menus", chunk + 1)
+            index = ids - 1
+            created = PERIOD_END - PERIOD_SECONDS + rng.integers(0, PERIOD_SECONDS // 2, len(ids)).astype("timedelta64[s]")
+            self.writer.write("menus", {
+                "id": ids,
+                "restaurant_id": self.menu_restaurant[index],
+                "name": [f"{DISHES[i % len(DISHES)]} {i}" for i in ids.tolist()],
+                "price": self.menu_price[index],
+                "description": _pick(["Plat maison", "Recette du chef", "Spécialité locale", "Classique"],
+                                     rng.integers(0, 4, len(ids))),
+                "preparation_time": rng.normal(20, 8, len(ids)).round().clip(5, 60).astype(np.int64),
+                "image_url": [None] * len(ids),
+                "created_at": created,
+                "updated_at": created,
+            })
+
+            menus, categories = self.menu_categories(ids)
+            self.writer.write("menu_categories_association", {"menu_id": menus, "category_id": categories})
+            counts = self.menu_supplement_counts(ids)
+            menus = np.repeat(ids, counts)
+            slot = np.arange(len(menus)) - np.repeat(np.cumsum(counts) - counts, counts)
+            self.writer.write("menu_supplements_association", {
+                "menu_id": menus, "supplement_id": self.menu_supplement(menus, slot),
+            })
+
+    def popular_menus(self, rng: np.random.Generator, count: int) -> np.ndarray:
+        return self.menu_by_rank[np.searchsorted(self.menu_popularity_cdf, rng.random(count))]
+
+    def delivery_zones(self) -> None:
+        """Explicit zones for 40% of restaurants: mostly radius zones, some square polygons"""
+        rng = self.rng("delivery_zones")
+        restaurant_ids = np.flatnonzero(rng.random(self.scale.restaurants) < 0.4) + 1
+        polygon = rng.random(len(restaurant_ids)) < 0.25
+        radius = np.round(rng.uniform(2, 10, len(restaurant_ids)), 1)
+        polygons = []
+        for restaurant_id, is_polygon, size in zip(restaurant_ids.tolist(), polygon.tolist(), radius.tolist()):
+            if not is_polygon:
+                polygons.append(None)
+                continue
+            lat, lng, half = self.restaurant_lat[restaurant_id - 1], self.restaurant_lng[restaurant_id - 1], size / 111
+            polygons.append(f"[[{lat - half:.6f}, {lng - half:.6f}], [{lat - half:.6f}, {lng + half:.6f}], "
+                            f"[{lat + half:.6f}, {lng + half:.6f}], [{lat + half:.6f}, {lng - half:.6f}]]")
+        created = np.full(len(restaurant_ids), PERIOD_END - PERIOD_SECONDS)
+        self.writer.write("delivery_zones", {
+            "id": np.arange(1, len(restaurant_ids) + 1),
+            "restaurant_id": restaurant_ids,
+            "radius_km": [None if is_polygon else size for is_polygon, size in zip(polygon.tolist(), radius.tolist())],
+            "polygon_json": polygons,
+            "created_at": created,
+            "updated_at": created,
+        })
+
+    def shippers(self) -> None:
+        ids = np.arange(1, self.scale.shippers + 1)
+        created = np.full(len(ids), PERIOD_END - PERIOD_SECONDS)
+        self.writer.write("shippers", {
+            "id": ids,
+            "name": [f"Livreur {i}" for i in ids.tolist()],
+            "phone_number": [f"+2376{90000000 + i}" for i in ids.tolist()],
+            "email": [f"shipper{i}@example.com" for i in ids.tolist()],
+            "created_at": created,
+            "updated_at": created,
+        })
+
+    def comments(self) -> None:
+        for chunk, ids in self.chunks(self.scale.comments):
+            rng = self.rng("comments", chunk)
+            menus = self.popular_menus(rng, len(ids))
+            ratings = rng.normal(self.menu_quality[menus - 1], 0.9).round().clip(1, 5).astype(np.int64)
+            created = _timestamps(ids, self.scale.comments, rng)
+            self.writer.write("comments", {
+                "id": ids,
+                "client_id": rng.integers(1, self.scale.users + 1, len(ids)),
+                "menu_id": menus,
+                "comment": _pick(COMMENTS, rng.integers(0, len(COMMENTS), len(ids))),
+                "rating": ratings,
+                "created_at": created,
+                "updated_at": created,
+            })
+
+    def orders(self) -> None:
+        """Orders with their items, item supplements and shipment, generated together"""
+        item_id = supplement_row_id = shipment_id = 0
+        for chunk, ids in self.chunks(self.scale.orders):
+            rng = self.rng("orders", chunk)
+            count = len(ids)
+            created = _timestamps(ids, self.scale.orders, rng)
+
+            # The first item follows menu popularity, the others come from the same restaurant
+            first_menu = self.popular_menus(rng, count)
+            restaurants = self.menu_restaurant[first_menu - 1]
+            items_per_order = rng.integers(1, 4, count)
+            order_index = np.repeat(np.arange(count), items_per_order)
+            first = np.r_[0, np.cumsum(items_per_order)[:-1]]
+            menus = (self.restaurant_menu_start[restaurants - 1][order_index]
+                     + (rng.random(len(order_index)) * self.restaurant_menu_count[restaurants - 1][order_index])
+                     .astype(np.int64))
+            menus[first] = first_menu
+            quantities = 1 + rng.binomial(2, 0.2, len(order_index))
+            item_ids = np.arange(item_id + 1, item_id + len(order_index) + 1)
+            item_id += len(order_index)
+
+            # One supplement on 15% of the items whose menu offers some
+            supplement_counts = self.menu_supplement_counts(menus)
+            with_supplement = (rng.random(len(menus)) < 0.15) & (supplement_counts > 0)
+            supplement_slot = (rng.random(len(menus)) * np.maximum(supplement_counts, 1)).astype(np.int64)
+            supplements = self.menu_supplement(menus, supplement_slot)[with_supplement]
+            supplement_quantities = rng.integers(1, 3, len(supplements))
+
+            line_totals = self.menu_price[menus - 1] * quantities
+            line_totals[with_supplement] += self.supplement_price[supplements - 1] * supplement_quantities
+            totals = np.bincount(order_index, weights=line_totals, minlength=count)
+
+            self.writer.write("orders", {
+                "id": ids,
+                "client_id": rng.integers(1, self.scale.users + 1, count),
+                "restaurant_id": restaurants,
+                "total_amount": totals,
+                "created_at": created,
+                "updated_at": created,
+            })
+            item_created = created[order_index]
+            self.writer.write("order_items", {
+                "id": item_ids,
+                "order_id": ids[order_index],
+                "menu_id": menus,
+                "quantity": quantities,
+                "created_at": item_created,
+                "updated_at": item_created,
+            })
+            supplement_ids = np.arange(supplement_row_id + 1, supplement_row_id + len(supplements) + 1)
+            supplement_row_id += len(supplements)
+            self.writer.write("order_item_supplements", {
+                "id": supplement_ids,
+                "order_item_id": item_ids[with_supplement],
+                "supplement_id": supplements,
+                "quantity": supplement_quantities,
+                "created_at": item_created[with_supplement],
+                "updated_at": item_created[with_supplement],
+            })
+
+            # Every order is shipped close to its restaurant; the most recent ones are still pending
+            shipment_ids = np.arange(shipment_id + 1, shipment_id + count + 1)
+            shipment_id += count
+            status = np.where(rng.random(count) < 0.05, "canceled", "completed").astype(object)
+            status[ids > self.scale.orders * 0.995] = "pending"
+            self.writer.write("shipments", {
+                "id": shipment_ids,
+                "order_id": ids,
+                "restaurant_id": restaurants,
+                "shipper_id": rng.integers(1, self.scale.shippers + 1, count),
+                "delivery_latitude": self.restaurant_lat[restaurants - 1] + rng.normal(0, 0.02, count),
+                "delivery_longitude": self.restaurant_lng[restaurants - 1] + rng.normal(0, 0.02, count),
+                "delivery_address": [f"Adresse de livraison {i}" for i in ids.tolist()],
+                "status": status.tolist(),
+                "created_at": created,
+                "updated_at": created,
+            })
+
+    def shipper_locations(self) -> None:
+        """GPS fixes of each shipper around the city they work in"""
+        centres = np.array([[city[1], city[2]] for city in CITIES])
+        for chunk, ids in self.chunks(self.scale.shipper_locations):
+            rng = self.rng("shipper_locations", chunk)
+            shippers = rng.integers(1, self.scale.shippers + 1, len(ids))
+            positions = centres[shippers % len(CITIES)] + rng.normal(0, NEIGHBOURHOOD_SPREAD_DEG, (len(ids), 2))
+            recorded = _timestamps(ids, self.scale.shipper_locations, rng)
+            self.writer.write("shipper_locations", {
+                "id": ids,
+                "shipper_id": shippers,
+                "latitude": positions[:, 0],
+                "longitude": positions[:, 1],
+                "recorded_at": recorded,
+                "created_at": recorded,
+            })
+
+
+def create_seed_engine(database_url: str, method: str) -> Engine:
+    """Engine tuned for bulk loading: no foreign key or unique checks, relaxed durability on SQLite"""
+    url = make_url(database_url)
+    backend = url.get_backend_name()
+    connect_args = {"local_infile": True} if method == "load-data" else {}
+    engine = create_engine(database_url, connect_args=connect_args)
+
+    @event.listens_for(engine, "connect")
+    def _configure(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        if backend == "sqlite":
+            cursor.execute("PRAGMA foreign_keys=OFF")
+            cursor.execute("PRAGMA synchronous=OFF")
+            cursor.execute("PRAGMA journal_mode=WAL")
+        elif backend in ("mysql", "mariadb"):
+            cursor.execute("SET SESSION foreign_key_checks=0, unique_checks=0")
+        cursor.close()
+
+    return engine
+
+
+def check_empty(engine: Engine, truncate: bool) -> None:
+    with engine.begin() as conn:
+        if truncate:
+            for table in TABLES:
+                conn.execute(text(f"DELETE FROM {table}"))
+            return
+        for table in TABLES:
+            if conn.execute(text(f"SELECT 1 FROM {table} LIMIT 1")).first() is not None:
+                raise SystemExit(f"Table {table} is not empty; use --truncate to replace its rows")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Fill the database with a deterministic synthetic dataset")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--method", choices=["insert", "load-data"], default="insert")
+    parser.add_argument("--database-url", default=settings.DATABASE_URL)
+    parser.add_argument("--truncate", action="store_true", help="delete existing rows first")
+    parser.add_argument("--create-tables", action="store_true",
+                        help="create missing tables from the models (scratch databases; use migrations otherwise)")
+    for field in fields(Scale):
+        parser.add_argument(f"--{field.name.replace('_', '-')}", type=int, help=f"override the {field.name} count")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    overrides = {field.name: getattr(args, field.name) for field in fields(Scale) if getattr(args, field.name)}
+    scale = replace(SCALES[args.scale], **overrides)
+
+    engine = create_seed_engine(args.database_url, args.method)
+    if args.create_tables:
+        from db import Base, models  # noqa: F401 - registers the tables
+        Base.metadata.create_all(engine)
+    check_empty(engine, args.truncate)
+
+    started = time.perf_counter()
+    writer = Writer(engine, args.method)
+    Seeder(writer, scale, args.seed).run()
+    total = sum(writer.rows.values())
+    logger.info("Seeded %d rows in %.1fs at %s", total, time.perf_counter() - started,
+                datetime.now().isoformat(timespec="seconds"))
+
+
+if __name__ == "__main__":
+    main()
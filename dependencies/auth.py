@@ -1,19 +1,87 @@
+import hashlib
+import time
+from typing import Any, Dict
+
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import event
 
+from config.settings import settings
 from utils.auth import validate_token
-from db import get_db
+from utils.cache import LRUCache
+from utils.log import set_request_user
+from db import SessionLocal
 from db.models import User as UserModel
+from db.schemas import Principal
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/token")
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+# Decoded token claims keyed by token hash, kept until the token expires
+token_cache = LRUCache(maxsize=settings.PRINCIPAL_TOKEN_CACHE_SIZE, name="token_claims")
+# Lightweight user records keyed by user id
+user_cache = LRUCache(
+    maxsize=settings.PRINCIPAL_USER_CACHE_SIZE, ttl=settings.PRINCIPAL_USER_CACHE_TTL_SECONDS, name="principals"
+)
+# Bumped when a user changes; cached claims from an older generation are ignored
+_user_generation: Dict[str, int] = {}
+
+
+def get_token_claims(token: str) -> Dict[str, Any]:
+    """
+    Decode and validate a JWT, skipping the signature check for tokens seen before.
+    """
+    key = hashlib.sha256(token.encode()).digest()
+    entry = token_cache.get(key)
+    if entry is not None:
+        claims, user_id, generation = entry
+        if _user_generation.get(user_id, 0) == generation:
+            return claims
+
+    claims = validate_token(token)
+    exp = claims.get("exp")
+    ttl = exp - time.time() if exp is not None else None
+    if ttl is None or ttl > 0:
+        user_id = claims.get("sub")
+        token_cache.set(key, (claims, user_id, _user_generation.get(user_id, 0)), ttl=ttl)
+    return claims
+
+
+def load_principal(user_id: int) -> Principal | None:
+    principal = user_cache.get(user_id)
+    if principal is not None:
+        return principal
+
+    db = SessionLocal()
+    try:
+        user = db.query(UserModel).filter(UserModel.id == user_id).first()
+        principal = Principal.model_validate(user) if user is not None else None
+    finally:
+        db.close()
+
+    if principal is not None:
+        user_cache.set(user_id, principal)
+    return principal
+
+
+def invalidate_user(user_id: int) -> None:
+    """Drop the cached record and token claims of a user"""
+    user_cache.pop(user_id)
+    _user_generation[str(user_id)] = _user_generation.get(str(user_id), 0) + 1
+
+
+@event.listens_for(UserModel, "after_update")
+@event.listens_for(UserModel, "after_delete")
+def _invalidate_user_on_write(mapper, connection, target):
+    invalidate_user(target.id)
+
+
+def get_current_user(token: str = Depends(oauth2_scheme)) -> Principal:
     """
     Dependency to get the current authenticated user.
-    Validates the token and returns the user from the database.
+    Token claims and user records are cached, so authenticated requests usually
+    need neither signature verification nor a database query.
     """
-    payload = validate_token(token)
+    payload = get_token_claims(token)
     user_id = payload.get("sub")
     if user_id is None:
         raise HTTPException(
@@ -21,13 +89,23 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
             detail="Invalid authentication credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    
-    user = db.query(UserModel).filter(UserModel.id == user_id).first()
+
+    try:
+        user_id = int(user_id)
+    except (TypeError, ValueError):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid authentication credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    user = load_principal(user_id)
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User not found",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    
-    return user
\ No newline at end of file
+
+    set_request_user(user.id)
+    return user
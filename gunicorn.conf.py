@@ -0,0 +1,37 @@
+# Gunicorn configuration, see server.py
+from config.settings import settings
+
+bind = settings.SERVER_BIND
+workers = settings.SERVER_WORKERS
+worker_class = "server.Worker"
+preload_app = settings.SERVER_PRELOAD
+keepalive = settings.SERVER_KEEPALIVE_SECONDS
+timeout = settings.SERVER_TIMEOUT_SECONDS
+graceful_timeout = settings.SERVER_GRACEFUL_TIMEOUT_SECONDS
+max_requests = settings.SERVER_MAX_REQUESTS
+max_requests_jitter = settings.SERVER_MAX_REQUESTS_JITTER
+
+
+def on_starting(server):
+    from db.pool import primary_connection_budget
+
+    budget = primary_connection_budget(workers)
+    if budget > settings.DB_SERVER_MAX_CONNECTIONS:
+        server.log.warning(
+            "%d workers may open %d database connections, above DB_SERVER_MAX_CONNECTIONS=%d: "
+            "lower DB_POOL_SIZE / DB_MAX_OVERFLOW or raise max_connections",
+            workers, budget, settings.DB_SERVER_MAX_CONNECTIONS,
+        )
+
+
+def post_fork(server, worker):
+    from server import reset_after_fork
+
+    reset_after_fork()
+
+
+def post_worker_init(worker):
+    if settings.SERVER_MAX_WORKER_MEMORY_MB:
+        from server import watch_memory
+
+        watch_memory(settings.SERVER_MAX_WORKER_MEMORY_MB)
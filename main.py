@@ -1,36 +1,124 @@
+import asyncio
+import logging
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-import alembic.config
-import os
 
-from routes import orders, auth, restaurants, menus, comments, deliveries, health, menu_categories, supplements
 from config.settings import settings
+from db import dispose_async_engine, migrate
+from db.replicas import replica_set
+from middleware.access_log import AccessLogMiddleware
+from middleware.compression import CompressionMiddleware
+from middleware.deadline import DeadlineMiddleware
 from middleware.error_handlers import add_error_handlers
+from middleware.metrics import MetricsMiddleware
+from middleware.profiling import ProfilingMiddleware
+from middleware.rate_limit import RateLimitMiddleware
+from middleware.read_your_writes import ReadYourWritesMiddleware
+from middleware.sql_instrumentation import SqlInstrumentationMiddleware
+from routes import (
+    auth, comments, deliveries, delivery_zones, dispatch, health, menu_categories, menus, metrics, orders,
+    profiling as profiling_routes, restaurants, supplements, tracking,
+)
+from services.dispatch import dispatch_engine
+from services.hashing import password_hasher
+from services.isochrones import isochrone_store
+from services.jobs import job_runner
+from services import metrics as app_metrics
+from services.outbox import outbox_relay
+from services import profiling
+from services.tracking import location_store
+from utils.log import configure_logging
+from utils.openapi import install_schema
+from utils.serialization import default_response_class
+
+configure_logging()
+logger = logging.getLogger(__name__)
+
 
 def apply_migrations():
-    """Apply database migrations at startup."""
+    """
+    Check the database revision at startup (or migrate with MIGRATIONS_ON_STARTUP=upgrade).
+    Deploys run `python -m db.migrate` once instead of every worker upgrading.
+    """
     try:
-        alembic_cfg = alembic.config.Config("alembic.ini")
-        alembic.command.upgrade(alembic_cfg, "head")
-    except Exception as e:
-        print(f"Error applying migrations: {e}")
-        # You might want to log this error or handle it differently
-        # depending on your application's needs
+        if settings.MIGRATIONS_ON_STARTUP == "upgrade":
+            migrate.upgrade()
+        elif settings.MIGRATIONS_ON_STARTUP == "check":
+            migrate.check_revision()
+    except Exception:
+        logger.exception("Error checking database migrations")
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     apply_migrations()
+    if settings.PROFILING_ENABLED:
+        profiling.install_signal_handler()
+
+    background_tasks = [asyncio.create_task(location_store.run())]
+    if settings.DISPATCH_ENABLED:
+        background_tasks.append(asyncio.create_task(dispatch_engine.run()))
+    if settings.ISOCHRONE_REFRESH_ENABLED:
+        background_tasks.append(asyncio.create_task(isochrone_store.run()))
+    if replica_set.replicas:
+        background_tasks.append(asyncio.create_task(replica_set.run()))
+    if settings.JOBS_ENABLED:
+        background_tasks.append(asyncio.create_task(job_runner.run()))
+    if settings.OUTBOX_RELAY_ENABLED:
+        background_tasks.append(asyncio.create_task(outbox_relay.run()))
+    if settings.METRICS_ENABLED and settings.METRICS_MULTIPROC_DIR:
+        background_tasks.append(asyncio.create_task(app_metrics.run()))
+
     yield
 
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    password_hasher.shutdown()
+    await dispose_async_engine()
+    await replica_set.dispose()
+
 
-app = FastAPI(lifespan=lifespan)
+app = FastAPI(lifespan=lifespan, default_response_class=default_response_class)
 
 # Add error handlers
 add_error_handlers(app)
 
+# Bound database statements and routing calls by a per-route deadline
+# (innermost, so metrics and the SQL stats see the resulting status)
+if settings.REQUEST_DEADLINES_ENABLED:
+    app.add_middleware(DeadlineMiddleware)
+
+# Profile single requests carrying a signed X-Profile header
+if settings.PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
+
+# Request count, latency and in-flight metrics per route
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
+# JSON access log with route, status, duration, SQL count and user (inside the SQL stats)
+if settings.ACCESS_LOG_ENABLED:
+    app.add_middleware(AccessLogMiddleware)
+
+# Count statements and database time per request
+if settings.SQL_INSTRUMENTATION_ENABLED:
+    app.add_middleware(SqlInstrumentationMiddleware)
+
+# Keep clients that just wrote on the primary while replicas catch up
+if replica_set.replicas:
+    app.add_middleware(ReadYourWritesMiddleware)
+
+# Add rate limiting (inside CORS so rejections still carry CORS headers)
+if settings.RATE_LIMIT_ENABLED:
+    app.add_middleware(RateLimitMiddleware)
+
+# Compress large JSON and text responses
+if settings.COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware)
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -49,4 +137,13 @@ app.include_router(menu_categories.router, tags=["menu-categories"])
 app.include_router(supplements.router, tags=["supplements"])
 app.include_router(comments.router, tags=["comments"])
 app.include_router(deliveries.router, tags=["deliveries"])
+app.include_router(delivery_zones.router, tags=["delivery-zones"])
+app.include_router(dispatch.router, tags=["dispatch"])
+app.include_router(tracking.router, tags=["tracking"])
 app.include_router(health.router)
+if settings.METRICS_ENABLED:
+    app.include_router(metrics.router, tags=["metrics"])
+if settings.PROFILING_ENABLED:
+    app.include_router(profiling_routes.router, tags=["profiling"])
+
+install_schema(app)
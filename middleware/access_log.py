@@ -0,0 +1,76 @@
+"""
+Structured access log.
+
+One record per request on the "access" logger with the method, route
+template, status, duration, SQL statement count and database time (from
+SqlInstrumentationMiddleware) and the authenticated user id. Successful
+(2xx) responses faster than ACCESS_LOG_SLOW_SECONDS are sampled at
+ACCESS_LOG_2XX_SAMPLE_RATE; the rate is logged with each record so counts
+can be scaled back up. Records go through the logging queue (utils.log).
+"""
+import logging
+import random
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from config.settings import settings
+from db.instrumentation import current_sql_stats
+from middleware.routes import RouteResolver
+from utils.log import RequestLogContext, current_log_context
+
+access_logger = logging.getLogger("access")
+
+
+class AccessLogMiddleware:
+    def __init__(
+        self,
+        app: ASGIApp,
+        sample_rate: float = settings.ACCESS_LOG_2XX_SAMPLE_RATE,
+        slow_seconds: float = settings.ACCESS_LOG_SLOW_SECONDS,
+    ):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.slow_seconds = slow_seconds
+        self._route = RouteResolver()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        context = RequestLogContext()
+        token = current_log_context.set(context)
+        status_code = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            current_log_context.reset(token)
+            duration = time.perf_counter() - started
+            sampled = 200 <= status_code < 300 and duration < self.slow_seconds
+            if not sampled or random.random() < self.sample_rate:
+                self._log(scope, status_code, duration, context, self.sample_rate if sampled else 1.0)
+
+    def _log(self, scope: Scope, status_code: int, duration: float, context: RequestLogContext,
+             sample_rate: float) -> None:
+        route = self._route(scope)
+        stats = current_sql_stats.get()
+        access_logger.info("%s %s %d", scope["method"], route, status_code, extra={
+            "method": scope["method"],
+            "route": route,
+            "path": scope["path"],
+            "status": status_code,
+            "duration_ms": round(duration * 1000, 2),
+            "sql_count": stats.statements if stats is not None else None,
+            "sql_ms": round(stats.duration * 1000, 2) if stats is not None else None,
+            "user_id": context.user_id,
+            "sample_rate": sample_rate,
+        })
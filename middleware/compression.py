@@ -0,0 +1,135 @@
+"""
+Response compression middleware.
+
+Bodies whose content type is in COMPRESSION_CONTENT_TYPES are compressed
+with brotli or gzip, following the client's Accept-Encoding. Complete
+bodies smaller than COMPRESSION_MIN_SIZE are sent as is, since the
+headers would outweigh the savings. Responses that already carry a
+Content-Encoding (the precompressed catalog cache) pass through untouched.
+"""
+from anyio import to_thread
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from config.settings import settings
+from utils.compression import StreamCompressor, choose_encoding, compress
+
+# Larger bodies are compressed off the event loop (zlib and brotli release the GIL)
+THREADPOOL_MIN_SIZE = 64 * 1024
+
+# Compressed responses and bytes before/after compression, per encoding
+compression_stats: dict[str, list[int]] = {}
+
+
+class CompressionMiddleware:
+    def __init__(
+            self,
+            app: ASGIApp,
+            minimum_size: int = settings.COMPRESSION_MIN_SIZE,
+            content_types: list[str] | None = None,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.content_types = frozenset(content_types if content_types is not None else settings.COMPRESSION_CONTENT_TYPES)
+        self.levels = {"gzip": settings.COMPRESSION_GZIP_LEVEL, "br": settings.COMPRESSION_BROTLI_QUALITY}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = None
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                encoding = choose_encoding(value.decode("latin-1"))
+                break
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        await self.app(scope, receive, CompressingSender(self, encoding, send).send)
+
+
+class CompressingSender:
+    """Holds back the response start until the first body chunk shows whether to compress"""
+
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send: Send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self.level = middleware.levels[encoding]
+        self._send = send
+        self.start: Message | None = None
+        self.compressor: StreamCompressor | None = None
+        self.passthrough = False
+
+    def _compressible(self, headers: MutableHeaders) -> bool:
+        if "content-encoding" in headers or self.start["status"] in (204, 304):
+            return False
+        content_type = headers.get("content-type", "").partition(";")[0].strip().lower()
+        if content_type not in self.middleware.content_types:
+            return False
+        headers.add_vary_header("Accept-Encoding")
+        return True
+
+    def _count(self, before: int, after: int) -> None:
+        stats = compression_stats.setdefault(self.encoding, [0, 0, 0])
+        stats[0] += 1
+        stats[1] += before
+        stats[2] += after
+
+    async def send(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            self.start = message
+            return
+        if self.passthrough or message["type"] != "http.response.body":
+            if self.start is not None:
+                await self._send(self.start)
+                self.start = None
+            await self._send(message)
+            return
+
+        if self.compressor is not None:
+            await self._stream(message)
+            return
+
+        headers = MutableHeaders(raw=self.start["headers"])
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if not self._compressible(headers) or (not more_body and len(body) < self.middleware.minimum_size):
+            self.passthrough = True
+            await self._send(self.start)
+            self.start = None
+            await self._send(message)
+            return
+
+        headers["content-encoding"] = self.encoding
+        if not more_body:
+            if len(body) >= THREADPOOL_MIN_SIZE:
+                compressed = await to_thread.run_sync(compress, body, self.encoding, self.level)
+            else:
+                compressed = compress(body, self.encoding, self.level)
+            self._count(len(body), len(compressed))
+            headers["content-length"] = str(len(compressed))
+            await self._send(self.start)
+            self.start = None
+            await self._send({"type": "http.response.body", "body": compressed})
+            return
+
+        # Streamed response: the final length is unknown
+        del headers["content-length"]
+        self.compressor = StreamCompressor(self.encoding, self.level)
+        self._count(0, 0)
+        await self._send(self.start)
+        self.start = None
+        await self._stream(message)
+
+    async def _stream(self, message: Message) -> None:
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        chunk = self.compressor.compress(body)
+        if not more_body:
+            chunk += self.compressor.finish()
+        stats = compression_stats[self.encoding]
+        stats[1] += len(body)
+        stats[2] += len(chunk)
+        await self._send({"type": "http.response.body", "body": chunk, "more_body": more_body})
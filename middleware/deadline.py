@@ -0,0 +1,52 @@
+"""
+Per-route request deadlines.
+
+Sets the deadline of each request (REQUEST_DEADLINE_ROUTES, else
+REQUEST_DEADLINE_SECONDS) for the code below to honour: database
+statements and routing calls are bounded by the time left (see
+db.deadlines and services.routing), and work starting after the deadline
+fails with 504. Handlers are never cancelled mid-flight, so sessions and
+pooled connections unwind through the usual exception path. Responses
+finishing past their deadline are counted as "request" overruns.
+"""
+import time
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+import db.deadlines  # noqa: F401 - registers the statement timeout hook
+from config.settings import settings
+from middleware.routes import RouteResolver
+from utils.deadline import Deadline, current_deadline, record_overrun
+
+
+class DeadlineMiddleware:
+    def __init__(
+        self,
+        app: ASGIApp,
+        default_seconds: float = settings.REQUEST_DEADLINE_SECONDS,
+        route_seconds: dict[str, float] | None = None,
+    ):
+        self.app = app
+        self.default_seconds = default_seconds
+        self.route_seconds = settings.REQUEST_DEADLINE_ROUTES if route_seconds is None else route_seconds
+        self._route = RouteResolver()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        route = self._route(scope)
+        seconds = self.route_seconds.get(f"{scope['method']} {route}", self.default_seconds)
+        if seconds <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        deadline = Deadline(route, time.monotonic() + seconds)
+        token = current_deadline.set(deadline)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_deadline.reset(token)
+            if deadline.remaining() < 0:
+                record_overrun("request", deadline)
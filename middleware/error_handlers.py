@@ -1,8 +1,11 @@
 from fastapi import Request, status
+from fastapi.encoders import jsonable_encoder
 from fastapi.responses import JSONResponse
 from fastapi.exceptions import RequestValidationError
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.exc import SQLAlchemyError, TimeoutError as PoolTimeoutError
 
+from db.deadlines import is_statement_timeout
+from utils.deadline import record_overrun
 from utils.exceptions import APIError
 
 async def api_error_handler(request: Request, exc: APIError):
@@ -23,7 +26,7 @@ async def validation_error_handler(request: Request, exc: RequestValidationError
         status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
         content={
             "detail": "Validation error",
-            "errors": exc.errors(),
+            "errors": jsonable_encoder(exc.errors()),
         },
     )
 
@@ -31,6 +34,21 @@ async def sqlalchemy_error_handler(request: Request, exc: SQLAlchemyError):
     """
     Handler for SQLAlchemy errors
     """
+    if is_statement_timeout(exc):
+        # Interrupted by the server at the request deadline
+        record_overrun("statement")
+        return JSONResponse(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            content={"detail": "Request deadline exceeded"},
+        )
+    if isinstance(exc, PoolTimeoutError):
+        # No pooled connection freed up in time
+        record_overrun("pool")
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={"detail": "Database busy, retry later"},
+            headers={"Retry-After": "1"},
+        )
     return JSONResponse(
         status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
         content={"detail": "Database error occurred"},
@@ -0,0 +1,39 @@
+"""
+HTTP request metrics: count, latency histogram and in-flight gauge per
+route template (not raw path, to keep label cardinality bounded).
+"""
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from middleware.routes import RouteResolver
+from services.metrics import http_in_flight, http_request_duration, http_requests
+
+
+class MetricsMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self._route = RouteResolver()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        labels = (scope["method"], self._route(scope))
+        status_code = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        http_in_flight.inc(labels)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            http_request_duration.observe(labels, time.perf_counter() - started)
+            http_requests.inc((*labels, str(status_code)))
+            http_in_flight.dec(labels)
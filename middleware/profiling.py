@@ -0,0 +1,46 @@
+"""
+Per-request profiling.
+
+A request carrying a valid X-Profile token (see services.profiling) is
+sampled while it runs; the response gets an X-Profile-Id header and the
+collapsed stacks are kept for GET /debug/profiles/{id}. Samples cover
+every busy thread of the worker, so profile a quiet worker to see one
+request alone. Other requests only pay for the header lookup.
+"""
+import uuid
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from services.profiling import SamplingProfiler, profile_store, verify_token
+
+PROFILE_HEADER = b"x-profile"
+
+
+class ProfilingMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        token = next((value for name, value in scope["headers"] if name == PROFILE_HEADER), None)
+        if token is None or not verify_token(token.decode("latin-1"), "request"):
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = uuid.uuid4().hex[:16]
+
+        async def send_with_profile_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), (b"x-profile-id", profile_id.encode())]
+            await send(message)
+
+        profiler = SamplingProfiler()
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            profiler.stop()
+            profile_store.add(profile_id, profiler.collapsed())
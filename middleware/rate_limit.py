@@ -0,0 +1,333 @@
+"""
+Rate limiting middleware.
+
+Rules are matched on (method, path) with a dict lookup, so unprotected
+routes pay nothing beyond it. Each rule keys its bucket per client IP, per
+authenticated user (falling back to the IP) or per route, and uses either a
+token bucket (bursty, smooth refill) or a sliding window counter.
+
+A request matching several rules is let through only if every one allows
+it; when a later rule rejects it, the cost already taken by the earlier
+ones is refunded, so rejected requests do not drain the other buckets.
+
+Buckets live in a lock-sharded in-memory store by default, which limits per
+worker. Set RATE_LIMIT_STORE=redis to share limits across workers and hosts.
+"""
+import json
+import math
+import threading
+import time
+from dataclasses import dataclass
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from config.settings import settings
+
+SHARD_COUNT = 64
+SHARD_SWEEP_SIZE = 10000  # sweep idle buckets once a shard grows past this
+
+# Requests rejected per rule name
+rejected_requests: dict[str, int] = {}
+
+
+class InMemoryStore:
+    """Per-process buckets, spread over lock-protected shards to limit contention"""
+
+    def __init__(self, shard_count: int = SHARD_COUNT):
+        self._mask = shard_count - 1
+        self._locks = [threading.Lock() for _ in range(shard_count)]
+        self._shards: list[dict[str, list]] = [{} for _ in range(shard_count)]
+
+    def _shard(self, key: str) -> int:
+        return hash(key) & self._mask
+
+    def _sweep(self, shard: dict, now: float) -> None:
+        """Drop buckets that have been idle long enough to be back to their initial state"""
+        for key in [key for key, state in shard.items() if state[-1] < now]:
+            del shard[key]
+
+    async def token_bucket(self, key: str, capacity: float, refill_per_second: float, cost: float = 1) -> tuple[bool, float]:
+        now = time.monotonic()
+        index = self._shard(key)
+        with self._locks[index]:
+            shard = self._shards[index]
+            state = shard.get(key)
+            if state is None:
+                if len(shard) >= SHARD_SWEEP_SIZE:
+                    self._sweep(shard, now)
+                # tokens, last refill, time at which the bucket is full again
+                state = shard[key] = [capacity, now, now]
+
+            tokens = min(capacity, state[0] + (now - state[1]) * refill_per_second)
+            state[1] = now
+            if tokens >= cost:
+                state[0] = tokens - cost
+                state[2] = now + (capacity - state[0]) / refill_per_second
+                return True, 0.0
+            state[0] = tokens
+            return False, (cost - tokens) / refill_per_second
+
+    async def sliding_window(self, key: str, limit: int, period: float, cost: int = 1) -> tuple[bool, float]:
+        now = time.monotonic()
+        window = math.floor(now / period) * period
+        index = self._shard(key)
+        with self._locks[index]:
+            shard = self._shards[index]
+            state = shard.get(key)
+            if state is None:
+                if len(shard) >= SHARD_SWEEP_SIZE:
+                    self._sweep(shard, now)
+                # window start, current count, previous count, expiry
+                state = shard[key] = [window, 0, 0, window + 2 * period]
+
+            if state[0] != window:
+                state[2] = state[1] if window - state[0] == period else 0
+                state[1] = 0
+                state[0] = window
+                state[3] = window + 2 * period
+
+            elapsed = now - window
+            estimated = state[2] * (1 - elapsed / period) + state[1]
+            if estimated + cost > limit:
+                return False, period - elapsed
+            state[1] += cost
+            return True, 0.0
+
+    async def refund_token_bucket(self, key: str, capacity: float, refill_per_second: float, cost: float = 1) -> None:
+        index = self._shard(key)
+        with self._locks[index]:
+            state = self._shards[index].get(key)
+            if state is not None:
+                state[0] = min(capacity, state[0] + cost)
+                state[2] = state[1] + (capacity - state[0]) / refill_per_second
+
+    async def refund_sliding_window(self, key: str, limit: int, period: float, cost: int = 1) -> None:
+        window = math.floor(time.monotonic() / period) * period
+        index = self._shard(key)
+        with self._locks[index]:
+            state = self._shards[index].get(key)
+            if state is not None:
+                # The window may have rolled over since the request was counted
+                slot = 1 if state[0] == window else 2
+                state[slot] = max(0, state[slot] - cost)
+
+
+class RedisStore:
+    """Buckets shared by every worker through Redis, updated atomically with Lua scripts"""
+
+    TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local refill = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + (now - ts) * refill)
+local allowed = 0
+local retry = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+else
+    retry = (cost - tokens) / refill
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / refill * 1000) + 1000)
+return {allowed, tostring(retry)}
+"""
+
+    SLIDING_WINDOW_SCRIPT = """
+local limit = tonumber(ARGV[1])
+local period = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local window = math.floor(now / period)
+local current_key = KEYS[1] .. ':' .. window
+local previous_key = KEYS[1] .. ':' .. (window - 1)
+local current = tonumber(redis.call('GET', current_key) or '0')
+local previous = tonumber(redis.call('GET', previous_key) or '0')
+local elapsed = now - window * period
+if previous * (1 - elapsed / period) + current + cost > limit then
+    return {0, tostring(period - elapsed)}
+end
+redis.call('INCRBY', current_key, cost)
+redis.call('EXPIRE', current_key, math.ceil(period * 2))
+return {1, '0'}
+"""
+
+    REFUND_TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local cost = tonumber(ARGV[2])
+local tokens = tonumber(redis.call('HGET', KEYS[1], 'tokens'))
+if tokens then
+    redis.call('HSET', KEYS[1], 'tokens', tostring(math.min(capacity, tokens + cost)))
+end
+return 1
+"""
+
+    REFUND_SLIDING_WINDOW_SCRIPT = """
+local period = tonumber(ARGV[1])
+local cost = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local window = math.floor((tonumber(t[1]) + tonumber(t[2]) / 1000000) / period)
+local current_key = KEYS[1] .. ':' .. window
+local current = tonumber(redis.call('GET', current_key) or '0')
+if current > 0 then
+    redis.call('DECRBY', current_key, math.min(cost, current))
+end
+return 1
+"""
+
+    def __init__(self, url: str = settings.RATE_LIMIT_REDIS_URL):
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise RuntimeError("RATE_LIMIT_STORE=redis requires the 'redis' package")
+
+        self._client = redis.from_url(url)
+        self._token_bucket = self._client.register_script(self.TOKEN_BUCKET_SCRIPT)
+        self._sliding_window = self._client.register_script(self.SLIDING_WINDOW_SCRIPT)
+        self._refund_token_bucket = self._client.register_script(self.REFUND_TOKEN_BUCKET_SCRIPT)
+        self._refund_sliding_window = self._client.register_script(self.REFUND_SLIDING_WINDOW_SCRIPT)
+
+    async def token_bucket(self, key: str, capacity: float, refill_per_second: float, cost: float = 1) -> tuple[bool, float]:
+        allowed, retry = await self._token_bucket(keys=[f"ratelimit:{key}"], args=[capacity, refill_per_second, cost])
+        return bool(allowed), float(retry)
+
+    async def sliding_window(self, key: str, limit: int, period: float, cost: int = 1) -> tuple[bool, float]:
+        allowed, retry = await self._sliding_window(keys=[f"ratelimit:{key}"], args=[limit, period, cost])
+        return bool(allowed), float(retry)
+
+    async def refund_token_bucket(self, key: str, capacity: float, refill_per_second: float, cost: float = 1) -> None:
+        await self._refund_token_bucket(keys=[f"ratelimit:{key}"], args=[capacity, cost])
+
+    async def refund_sliding_window(self, key: str, limit: int, period: float, cost: int = 1) -> None:
+        await self._refund_sliding_window(keys=[f"ratelimit:{key}"], args=[period, cost])
+
+
+@dataclass(frozen=True)
+class RateLimitRule:
+    name: str
+    method: str
+    path: str
+    limit: int
+    period: float  # seconds
+    key: str = "ip"  # "ip", "user" or "route"
+    algorithm: str = "token_bucket"  # "token_bucket" or "sliding_window"
+
+    async def check(self, store, identity: str) -> tuple[bool, float]:
+        key = f"{self.name}:{identity}"
+        if self.algorithm == "sliding_window":
+            return await store.sliding_window(key, self.limit, self.period)
+        return await store.token_bucket(key, self.limit, self.limit / self.period)
+
+    async def refund(self, store, identity: str) -> None:
+        """Give back what check took, for a request another rule rejected"""
+        key = f"{self.name}:{identity}"
+        if self.algorithm == "sliding_window":
+            await store.refund_sliding_window(key, self.limit, self.period)
+        else:
+            await store.refund_token_bucket(key, self.limit, self.limit / self.period)
+
+
+def default_rules() -> list[RateLimitRule]:
+    return [
+        RateLimitRule("login", "POST", "/auth/login", settings.RATE_LIMIT_LOGIN_PER_MINUTE, 60),
+        RateLimitRule("register", "POST", "/auth/register", settings.RATE_LIMIT_REGISTER_PER_HOUR, 3600,
+                      algorithm="sliding_window"),
+        RateLimitRule("estimate", "POST", "/delivery-estimate", settings.RATE_LIMIT_ESTIMATE_PER_MINUTE, 60,
+                      key="user"),
+        # Global cap protecting the routing provider
+        RateLimitRule("estimate_global", "POST", "/delivery-estimate", settings.RATE_LIMIT_ESTIMATE_GLOBAL_PER_SECOND, 1,
+                      key="route", algorithm="sliding_window"),
+        RateLimitRule("orders", "POST", "/orders", settings.RATE_LIMIT_ORDERS_PER_MINUTE, 60, key="user"),
+    ]
+
+
+def create_store():
+    if settings.RATE_LIMIT_STORE == "redis":
+        return RedisStore()
+    return InMemoryStore()
+
+
+class RateLimitMiddleware:
+    def __init__(self, app: ASGIApp, rules: list[RateLimitRule] | None = None, store=None):
+        self.app = app
+        self.store = store if store is not None else create_store()
+        self._rules: dict[tuple[str, str], list[RateLimitRule]] = {}
+        for rule in rules if rules is not None else default_rules():
+            self._rules.setdefault((rule.method, rule.path), []).append(rule)
+
+    @staticmethod
+    def _client_ip(scope: Scope) -> str:
+        if settings.RATE_LIMIT_TRUST_FORWARDED_FOR:
+            forwarded = [
+                entry for name, value in scope["headers"] if name == b"x-forwarded-for"
+                for entry in (part.strip() for part in value.decode("latin-1").split(",")) if entry
+            ]
+            if forwarded:
+                # Each proxy appends the address it got the request from: entries left of
+                # the ones our proxies added come from the client and cannot be trusted
+                return forwarded[-min(settings.RATE_LIMIT_TRUSTED_PROXIES, len(forwarded))]
+        client = scope.get("client")
+        return client[0] if client else "unknown"
+
+    @classmethod
+    def _user(cls, scope: Scope) -> str:
+        for name, value in scope["headers"]:
+            if name == b"authorization":
+                scheme, _, token = value.decode("latin-1").partition(" ")
+                if scheme.lower() == "bearer" and token:
+                    # Imported here so the middleware does not pull in auth at import time
+                    from dependencies.auth import get_token_claims
+                    try:
+                        return f"user:{get_token_claims(token)['sub']}"
+                    except Exception:
+                        break
+                break
+        return f"ip:{cls._client_ip(scope)}"
+
+    def _identity(self, rule: RateLimitRule, scope: Scope) -> str:
+        if rule.key == "route":
+            return "*"
+        if rule.key == "user":
+            return self._user(scope)
+        return self._client_ip(scope)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        rules = self._rules.get((scope["method"], scope["path"]))
+        if rules:
+            passed = []
+            for rule in rules:
+                identity = self._identity(rule, scope)
+                allowed, retry_after = await rule.check(self.store, identity)
+                if not allowed:
+                    rejected_requests[rule.name] = rejected_requests.get(rule.name, 0) + 1
+                    for earlier, earlier_identity in passed:
+                        await earlier.refund(self.store, earlier_identity)
+                    await self._reject(send, retry_after)
+                    return
+                passed.append((rule, identity))
+
+        await self.app(scope, receive, send)
+
+    @staticmethod
+    async def _reject(send: Send, retry_after: float) -> None:
+        body = json.dumps({"detail": "Too many requests"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,36 @@
+"""
+Read-your-writes stickiness for replica reads.
+
+Successful writes (POST, PUT, PATCH, DELETE) set a cookie holding the time
+until which the client's reads should go to the primary, see db.replicas.
+"""
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from config.settings import settings
+from db.replicas import READ_YOUR_WRITES_COOKIE
+
+WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+
+class ReadYourWritesMiddleware:
+    def __init__(self, app: ASGIApp, window_seconds: int = settings.READ_YOUR_WRITES_SECONDS):
+        self.app = app
+        self.window_seconds = window_seconds
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] not in WRITE_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_cookie(message: Message) -> None:
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                cookie = (
+                    f"{READ_YOUR_WRITES_COOKIE}={time.time() + self.window_seconds:.0f}; "
+                    f"Max-Age={self.window_seconds}; Path=/; HttpOnly; SameSite=Lax"
+                )
+                message["headers"] = [*message.get("headers", []), (b"set-cookie", cookie.encode("latin-1"))]
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
@@ -0,0 +1,30 @@
+"""
+Route template lookup shared by the middlewares that label or configure
+requests per route (not raw path, to keep label cardinality bounded).
+"""
+from starlette.routing import Match
+from starlette.types import Scope
+
+UNMATCHED_ROUTE = "unmatched"
+ROUTE_CACHE_SIZE = 10000
+
+
+class RouteResolver:
+    def __init__(self):
+        self._cache: dict[tuple[str, str], str] = {}
+
+    def __call__(self, scope: Scope) -> str:
+        """Route template for the request, resolved once per (method, path)"""
+        key = (scope["method"], scope["path"])
+        route = self._cache.get(key)
+        if route is None:
+            route = UNMATCHED_ROUTE
+            for candidate in scope["app"].router.routes:
+                match, _ = candidate.matches(scope)
+                if match == Match.FULL:
+                    route = candidate.path
+                    break
+            if len(self._cache) >= ROUTE_CACHE_SIZE:
+                self._cache.clear()
+            self._cache[key] = route
+        return route
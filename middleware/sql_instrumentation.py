@@ -0,0 +1,46 @@
+"""
+Per-request SQL instrumentation.
+
+Counts the statements and database time of every request (see
+db.instrumentation), reports them in a Server-Timing header, warns when a
+request repeats the same normalized statement more than
+SQL_N_PLUS_ONE_THRESHOLD times and aggregates the figures per route.
+"""
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from config.settings import settings
+from db.instrumentation import RequestSqlStats, current_sql_stats, finish_request
+
+
+class SqlInstrumentationMiddleware:
+    def __init__(self, app: ASGIApp, n_plus_one_threshold: int = settings.SQL_N_PLUS_ONE_THRESHOLD):
+        self.app = app
+        self.n_plus_one_threshold = n_plus_one_threshold
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestSqlStats()
+        token = current_sql_stats.set(stats)
+        started = time.perf_counter()
+
+        async def send_with_timing(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                timing = (
+                    f'db;dur={stats.duration * 1000:.2f};desc="{stats.statements} queries", '
+                    f"app;dur={(time.perf_counter() - started) * 1000:.2f}"
+                )
+                message["headers"] = [*message.get("headers", []), (b"server-timing", timing.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_sql_stats.reset(token)
+            route = scope.get("route")
+            if route is not None:
+                finish_request(f"{scope['method']} {route.path}", stats, self.n_plus_one_threshold)
@@ -0,0 +1,39 @@
+"""Add ShipperLocations Table
+
+Revision ID: 3b7e21c9d4a0
+Revises: 001fcb4c5c4e
+Create Date: 2025-05-03 09:15:12.518204+00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b7e21c9d4a0'
+down_revision: Union[str, None] = '001fcb4c5c4e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('shipper_locations',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('shipper_id', sa.Integer(), nullable=False),
+    sa.Column('latitude', sa.Float(), nullable=False),
+    sa.Column('longitude', sa.Float(), nullable=False),
+    sa.Column('recorded_at', sa.DateTime(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['shipper_id'], ['shippers.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_shipper_locations_shipper_id_recorded_at', 'shipper_locations', ['shipper_id', 'recorded_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_shipper_locations_shipper_id_recorded_at', table_name='shipper_locations')
+    op.drop_table('shipper_locations')
@@ -0,0 +1,39 @@
+"""Add DeliveryZones Table
+
+Revision ID: 8f4c02d1e6b7
+Revises: 3b7e21c9d4a0
+Create Date: 2025-05-06 14:02:37.094512+00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8f4c02d1e6b7'
+down_revision: Union[str, None] = '3b7e21c9d4a0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('delivery_zones',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('restaurant_id', sa.Integer(), nullable=False),
+    sa.Column('radius_km', sa.Float(), nullable=True),
+    sa.Column('polygon_json', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['restaurant_id'], ['restaurants.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_delivery_zones_restaurant_id'), 'delivery_zones', ['restaurant_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_delivery_zones_restaurant_id'), table_name='delivery_zones')
+    op.drop_table('delivery_zones')
@@ -0,0 +1,44 @@
+"""Add Outbox Tables
+
+Revision ID: e7d14b6a9c02
+Revises: c5a9e2f41b37
+Create Date: 2025-05-12 10:30:41.207634+00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7d14b6a9c02'
+down_revision: Union[str, None] = 'c5a9e2f41b37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('outbox_events',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('topic', sa.String(length=100), nullable=False),
+    sa.Column('key', sa.String(length=100), nullable=True),
+    sa.Column('payload_json', sa.Text(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_outbox_events_created_at'), 'outbox_events', ['created_at'], unique=False)
+    op.create_table('consumer_offsets',
+    sa.Column('consumer', sa.String(length=100), nullable=False),
+    sa.Column('last_event_id', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('consumer')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('consumer_offsets')
+    op.drop_index(op.f('ix_outbox_events_created_at'), table_name='outbox_events')
+    op.drop_table('outbox_events')
@@ -1,28 +1,34 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
 from typing import Optional
 
 from db import get_db
 from db.models import User as UserModel
-from db.schemas import UserCreate, TokenData, UserLogin, User
-from utils.auth import verify_password, get_password_hash, create_access_token
+from db.schemas import UserCreate, TokenData, UserLogin, User, Principal
+from dependencies.auth import get_current_user
+from services.hashing import password_hasher
+from utils.auth import create_access_token
 
 router = APIRouter()
 
 
 @router.post("/register", response_model=TokenData)
-def register(client: UserCreate, db: Session = Depends(get_db)):
+async def register(client: UserCreate, db: Session = Depends(get_db)):
     try:
         # Check if email already exists
-        existing_user = db.query(UserModel).filter(UserModel.email == client.email).first()
+        existing_user = await run_in_threadpool(
+            lambda: db.query(UserModel.id).filter(UserModel.email == client.email).first()
+        )
         if existing_user:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Email already registered"
             )
 
-        # Create new user with hashed password
-        hashed_password = get_password_hash(client.password)
+        # Create new user with hashed password, hashing runs on its own executor
+        hashed_password = await password_hasher.hash(client.password)
         db_client = UserModel(
             first_name=client.first_name,
             last_name=client.last_name,
@@ -32,9 +38,12 @@ def register(client: UserCreate, db: Session = Depends(get_db)):
             password_hash=hashed_password
         )
 
-        db.add(db_client)
-        db.commit()
-        db.refresh(db_client)
+        def save_user():
+            db.add(db_client)
+            db.commit()
+            db.refresh(db_client)
+
+        await run_in_threadpool(save_user)
 
         # Create access token
         access_token = create_access_token(
@@ -42,16 +51,24 @@ def register(client: UserCreate, db: Session = Depends(get_db)):
         )
 
         return TokenData(access_token=access_token)
+    except HTTPException:
+        raise
+    except SQLAlchemyError:
+        # Left to the app's handlers: statement timeouts become 504s, pool exhaustion 503s
+        await run_in_threadpool(db.rollback)
+        raise
     except Exception as e:
-        db.rollback()
+        await run_in_threadpool(db.rollback)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
 
 @router.post("/login", response_model=TokenData)
-def login(user_credentials: UserLogin, db: Session = Depends(get_db)):
+async def login(user_credentials: UserLogin, db: Session = Depends(get_db)):
     try:
         # Find user by email
-        user = db.query(UserModel).filter(UserModel.email == user_credentials.email).first()
+        user = await run_in_threadpool(
+            lambda: db.query(UserModel).filter(UserModel.email == user_credentials.email).first()
+        )
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -60,19 +77,41 @@ def login(user_credentials: UserLogin, db: Session = Depends(get_db)):
             )
 
         # Verify password
-        if not verify_password(user_credentials.password, user.password_hash):
+        valid, new_hash = await password_hasher.verify_and_update(
+            user_credentials.password, user.password_hash
+        )
+        if not valid:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Incorrect email or password",
                 headers={"WWW-Authenticate": "Bearer"},
             )
 
+        # Transparently upgrade hashes made with a different cost
+        if new_hash is not None:
+            def save_hash():
+                user.password_hash = new_hash
+                db.commit()
+
+            await run_in_threadpool(save_hash)
+
         # Create access token
         access_token = create_access_token(
             data={"sub": user.id, "email": user.email},
         )
 
         return TokenData(access_token=access_token)
+    except HTTPException:
+        raise
+    except SQLAlchemyError:
+        # Left to the app's handlers: statement timeouts become 504s, pool exhaustion 503s
+        await run_in_threadpool(db.rollback)
+        raise
     except Exception as e:
-        db.rollback()
+        await run_in_threadpool(db.rollback)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+
+@router.get("/me", response_model=Principal)
+async def read_current_user(current_user: Principal = Depends(get_current_user)):
+    return current_user
@@ -3,12 +3,19 @@ from sqlalchemy.orm import Session
 from typing import List
 
 from db import get_db
+from db.replicas import get_read_db
 from db.models import Comment, Menu, User
 from db.schemas import CommentCreate, Comment as CommentSchema, CommentUpdate
+from services.outbox import record_event
 
 router = APIRouter()
 
 
+def comment_payload(comment: Comment) -> dict:
+    return {"comment_id": comment.id, "menu_id": comment.menu_id, "client_id": comment.client_id,
+            "rating": comment.rating}
+
+
 @router.post("/comments", response_model=CommentSchema, status_code=status.HTTP_201_CREATED)
 def create_comment(comment: CommentCreate, db: Session = Depends(get_db)):
     # Verify menu exists
@@ -36,6 +43,8 @@ def create_comment(comment: CommentCreate, db: Session = Depends(get_db)):
 
     db_comment = Comment(**comment.model_dump())
     db.add(db_comment)
+    db.flush()
+    record_event(db, "comment.created", comment_payload(db_comment), key=db_comment.menu_id)
     db.commit()
     db.refresh(db_comment)
     return db_comment
@@ -48,7 +57,7 @@ def list_comments(
         rating: int | None = Query(None, ge=1, le=5),
         skip: int = Query(default=0, ge=0),
         limit: int = Query(default=100, le=100),
-        db: Session = Depends(get_db)
+        db: Session = Depends(get_read_db)
 ):
     query = db.query(Comment)
 
@@ -64,7 +73,7 @@ def list_comments(
 
 
 @router.get("/comments/{comment_id}", response_model=CommentSchema)
-def get_comment(comment_id: int, db: Session = Depends(get_db)):
+def get_comment(comment_id: int, db: Session = Depends(get_read_db)):
     comment = db.query(Comment).filter(Comment.id == comment_id).first()
     if comment is None:
         raise HTTPException(
@@ -99,6 +108,7 @@ def update_comment(
     for key, value in update_data.items():
         setattr(db_comment, key, value)
 
+    record_event(db, "comment.updated", comment_payload(db_comment), key=db_comment.menu_id)
     db.commit()
     db.refresh(db_comment)
     return db_comment
@@ -114,6 +124,7 @@ def delete_comment(comment_id: int, db: Session = Depends(get_db)):
         )
 
     db.delete(db_comment)
+    record_event(db, "comment.deleted", comment_payload(db_comment), key=db_comment.menu_id)
     db.commit()
     return None
 
@@ -124,7 +135,7 @@ def get_menu_comments(
         skip: int = Query(default=0, ge=0),
         limit: int = Query(default=100, le=100),
         min_rating: int = Query(None, ge=1, le=5),
-        db: Session = Depends(get_db)
+        db: Session = Depends(get_read_db)
 ):
     # Verify menu exists
     menu = db.query(Menu).filter(Menu.id == menu_id).first()
@@ -144,7 +155,7 @@ def get_menu_comments(
 
 
 @router.get("/menus/{menu_id}/rating", response_model=dict)
-def get_menu_rating(menu_id: int, db: Session = Depends(get_db)):
+def get_menu_rating(menu_id: int, db: Session = Depends(get_read_db)):
     # Verify menu exists
     menu = db.query(Menu).filter(Menu.id == menu_id).first()
     if not menu:
@@ -1,12 +1,16 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
 from pydantic import BaseModel, field_validator, confloat
 from typing import List, Dict
-import requests
 from datetime import datetime, timedelta
 
 from db import get_db
 from db.models import Menu, Restaurant
+from services.isochrones import isochrone_store
+from services.routing import routing_client
+from services.zones import zone_index
 
 router = APIRouter()
 
@@ -54,39 +58,17 @@ class EstimateResponse(BaseModel):
 # Constants
 AVERAGE_PICKUP_TIME = 5  # minutes
 AVERAGE_DROPOFF_TIME = 5  # minutes
-OSRM_BASE_URL = "http://router.project-osrm.org/route/v1/bike"
 
 
 def get_bike_route(
         origin: tuple[float, float],
         destination: tuple[float, float]
 ) -> dict:
-    """Get routing information from OSRM bike service"""
-    url = f"{OSRM_BASE_URL}/{origin[1]},{origin[0]};{destination[1]},{destination[0]}"
-    params = {
-        "overview": "false",
-        "alternatives": "false",
-        "annotations": "false"
-    }
-
-    try:
-        response = requests.get(url, params=params, timeout=10.0)
-        response.raise_for_status()
-        data = response.json()
-
-        if data["code"] != "Ok":
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Could not calculate route"
-            )
-
-        return data["routes"][0]
-
-    except requests.RequestException as exc:
-        raise HTTPException(
-            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-            detail=f"Routing service error: {str(exc)}"
-        )
+    """
+    Get routing information from the OSRM bike service.
+    Falls back to a distance-based estimate when the provider is degraded.
+    """
+    return routing_client.get_route(origin, destination)
 
 
 def calculate_preparation_time(menu_items_with_quantity: List[dict]) -> int:
@@ -129,6 +111,19 @@ async def estimate_delivery_time(
     - Bicycle routing time
     """
 
+    # Reject addresses the restaurant does not deliver to before any DB or routing work.
+    # The zone index may have to be reloaded from the sync engine
+    if not await run_in_threadpool(
+            zone_index.serves,
+            request.restaurant_id,
+            request.delivery_location.latitude,
+            request.delivery_location.longitude
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Delivery address is outside the restaurant's delivery zone"
+        )
+
     try:
         # Verify a restaurant exists and gets its details
         restaurant = db.query(Restaurant).filter(Restaurant.id == request.restaurant_id).first()
@@ -181,11 +176,17 @@ async def estimate_delivery_time(
             request.delivery_location.longitude
         )
 
-        route_details = get_bike_route(restaurant_coords, delivery_coords)
+        # Interpolate from the precomputed grid, fall back to live routing outside it
+        grid_estimate = isochrone_store.lookup(restaurant.id, *restaurant_coords, *delivery_coords)
+        if grid_estimate is not None:
+            duration_seconds, distance_meters = grid_estimate
+        else:
+            route_details = await run_in_threadpool(get_bike_route, restaurant_coords, delivery_coords)
+            duration_seconds, distance_meters = route_details["duration"], route_details["distance"]
 
         # Calculate times
-        distance_km = route_details["distance"] / 1000
-        cycling_duration_minutes = route_details["duration"] / 60
+        distance_km = distance_meters / 1000
+        cycling_duration_minutes = duration_seconds / 60
         preparation_time = calculate_preparation_time(menu_items)
 
         # Calculate total delivery time
@@ -212,6 +213,12 @@ async def estimate_delivery_time(
             # menu_items_summary=menu_items_summary,
             total_order_price=round(total_price, 2)
         )
+    except HTTPException:
+        raise
+    except SQLAlchemyError:
+        # Left to the app's handlers: statement timeouts become 504s, pool exhaustion 503s
+        db.rollback()
+        raise
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
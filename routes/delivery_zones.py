@@ -0,0 +1,68 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+from typing import List
+
+from db import get_db
+from db.models import DeliveryZone, Restaurant
+from db.schemas import DeliveryZoneCreate, DeliveryZone as DeliveryZoneSchema
+from services.outbox import record_event
+from services.zones import zone_index
+
+router = APIRouter()
+
+
+@router.post(
+    "/restaurants/{restaurant_id}/delivery-zones",
+    response_model=DeliveryZoneSchema,
+    status_code=status.HTTP_201_CREATED
+)
+def create_delivery_zone(restaurant_id: int, zone: DeliveryZoneCreate, db: Session = Depends(get_db)):
+    """Add a delivery zone (radius around the restaurant or polygon) to a restaurant"""
+    restaurant = db.query(Restaurant).filter(Restaurant.id == restaurant_id).first()
+    if restaurant is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Restaurant not found"
+        )
+
+    db_zone = DeliveryZone(restaurant_id=restaurant_id, radius_km=zone.radius_km)
+    db_zone.polygon = [list(vertex) for vertex in zone.polygon] if zone.polygon else None
+    db.add(db_zone)
+    db.flush()
+    record_event(db, "delivery_zone.created", {"zone_id": db_zone.id, "restaurant_id": restaurant_id},
+                 key=restaurant_id)
+    db.commit()
+    db.refresh(db_zone)
+    zone_index.invalidate()
+    return db_zone
+
+
+@router.get("/restaurants/{restaurant_id}/delivery-zones", response_model=List[DeliveryZoneSchema])
+def list_delivery_zones(restaurant_id: int, db: Session = Depends(get_db)):
+    """List the delivery zones of a restaurant"""
+    restaurant = db.query(Restaurant).filter(Restaurant.id == restaurant_id).first()
+    if restaurant is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Restaurant not found"
+        )
+
+    return db.query(DeliveryZone).filter(DeliveryZone.restaurant_id == restaurant_id).all()
+
+
+@router.delete("/delivery-zones/{zone_id}", status_code=status.HTTP_204_NO_CONTENT)
+def delete_delivery_zone(zone_id: int, db: Session = Depends(get_db)):
+    """Delete a delivery zone"""
+    db_zone = db.query(DeliveryZone).filter(DeliveryZone.id == zone_id).first()
+    if db_zone is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Delivery zone not found"
+        )
+
+    db.delete(db_zone)
+    record_event(db, "delivery_zone.deleted", {"zone_id": zone_id, "restaurant_id": db_zone.restaurant_id},
+                 key=db_zone.restaurant_id)
+    db.commit()
+    zone_index.invalidate()
+    return None
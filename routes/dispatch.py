@@ -0,0 +1,124 @@
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from pydantic import BaseModel, confloat
+from sqlalchemy.orm import Session
+
+from db import get_db
+from db.models import Order, Restaurant, Shipper
+from routes.deliveries import LocationCoordinates
+from services.dispatch import ReadyOrder, dispatch_engine
+
+router = APIRouter()
+
+
+class ReadyOrderRequest(BaseModel):
+    order_id: int
+    delivery_location: LocationCoordinates
+
+
+class ShipperAvailability(BaseModel):
+    latitude: confloat(ge=-90, le=90)
+    longitude: confloat(ge=-180, le=180)
+    available: bool = True
+
+
+class DispatchAssignment(BaseModel):
+    order_id: int
+    shipper_id: int
+    pickup_distance_km: float
+
+
+class DispatchStatus(BaseModel):
+    pending_orders: int
+    available_shippers: int
+    assignments: list[DispatchAssignment] = []
+
+
+@router.post("/dispatch/orders", response_model=DispatchStatus, status_code=status.HTTP_202_ACCEPTED)
+def queue_ready_orders(ready_orders: list[ReadyOrderRequest], db: Session = Depends(get_db)):
+    """Queue orders that are ready for pickup; they are assigned at the end of the current window"""
+    if not ready_orders:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="At least one order must be specified"
+        )
+
+    order_ids = [ready_order.order_id for ready_order in ready_orders]
+    rows = (
+        db.query(Order.id, Restaurant.id, Restaurant.latitude, Restaurant.longitude)
+        .join(Restaurant, Order.restaurant_id == Restaurant.id)
+        .filter(Order.id.in_(order_ids))
+        .all()
+    )
+    pickups = {order_id: (restaurant_id, lat, lng) for order_id, restaurant_id, lat, lng in rows}
+
+    missing = [order_id for order_id in order_ids if order_id not in pickups]
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Orders not found: {missing}"
+        )
+
+    now = datetime.now()
+    dispatch_engine.submit_orders([
+        ReadyOrder(
+            order_id=ready_order.order_id,
+            restaurant_id=pickups[ready_order.order_id][0],
+            pickup_latitude=pickups[ready_order.order_id][1],
+            pickup_longitude=pickups[ready_order.order_id][2],
+            delivery_latitude=ready_order.delivery_location.latitude,
+            delivery_longitude=ready_order.delivery_location.longitude,
+            delivery_address=ready_order.delivery_location.address,
+            ready_at=now,
+        )
+        for ready_order in ready_orders
+    ])
+
+    return DispatchStatus(
+        pending_orders=dispatch_engine.pending_orders,
+        available_shippers=dispatch_engine.available_shippers,
+    )
+
+
+@router.put("/dispatch/shippers/{shipper_id}", response_model=DispatchStatus)
+def update_shipper_availability(
+        shipper_id: int,
+        availability: ShipperAvailability,
+        db: Session = Depends(get_db)
+):
+    """Mark a shipper as available at a position, or take them out of dispatch"""
+    shipper = db.query(Shipper.id).filter(Shipper.id == shipper_id).first()
+    if shipper is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Shipper not found"
+        )
+
+    if availability.available:
+        dispatch_engine.update_shipper(shipper_id, availability.latitude, availability.longitude)
+    else:
+        dispatch_engine.remove_shipper(shipper_id)
+
+    return DispatchStatus(
+        pending_orders=dispatch_engine.pending_orders,
+        available_shippers=dispatch_engine.available_shippers,
+    )
+
+
+@router.post("/dispatch/run", response_model=DispatchStatus)
+def run_dispatch():
+    """Run a dispatch batch immediately instead of waiting for the window to close"""
+    assignments = dispatch_engine.dispatch_batch()
+    return DispatchStatus(
+        pending_orders=dispatch_engine.pending_orders,
+        available_shippers=dispatch_engine.available_shippers,
+        assignments=[
+            DispatchAssignment(
+                order_id=assignment.order_id,
+                shipper_id=assignment.shipper_id,
+                pickup_distance_km=assignment.pickup_distance_km,
+            )
+            for assignment in assignments
+        ],
+    )
@@ -1,6 +1,16 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, status
+from fastapi.responses import JSONResponse
+from sqlalchemy import text
 from sqlalchemy.orm import Session
 from db import get_db
+from db.instrumentation import route_sql_snapshot
+from db.pool import engines, pool_snapshot
+from db.replicas import replica_set
+from services.hashing import password_hasher
+from services.jobs import job_runner
+from services.outbox import outbox_relay
+from services.readiness import readiness
+from services.routing import routing_client
 
 router = APIRouter()
 
@@ -12,7 +22,86 @@ def health_check(db: Session = Depends(get_db)):
     """
     try:
         # Try to execute a simple query to check database connection
-        db.execute("SELECT 1")
+        db.execute(text("SELECT 1"))
         return {"status": "healthy", "database": "connected"}
     except Exception as e:
-        return {"status": "unhealthy", "database": str(e)}
\ No newline at end of file
+        return {"status": "unhealthy", "database": str(e)}
+
+
+@router.get("/livez", tags=["health"])
+async def liveness():
+    """
+    Liveness probe: the worker answers requests. Touches no dependency.
+    """
+    return {"status": "alive"}
+
+
+@router.get("/readyz", tags=["health"])
+def readiness_probe():
+    """
+    Readiness probe: database reachable, connection pool not saturated,
+    migrations at head and routing breaker state, cached for
+    READINESS_CACHE_SECONDS. Returns 503 when not ready.
+    """
+    ready, report = readiness.result()
+    return JSONResponse(
+        status_code=status.HTTP_200_OK if ready else status.HTTP_503_SERVICE_UNAVAILABLE,
+        content=report,
+    )
+
+
+@router.get("/health/routing", tags=["health"])
+def routing_health():
+    """
+    Routing provider status: circuit breaker state, adaptive timeout,
+    hedging counters and latency histogram.
+    """
+    return routing_client.snapshot()
+
+
+@router.get("/health/password-hashing", tags=["health"])
+def password_hashing_health():
+    """
+    Password hashing executor: throughput counters, queue wait and run time histograms.
+    """
+    return password_hasher.snapshot()
+
+
+@router.get("/health/db-pool", tags=["health"])
+def db_pool_health():
+    """
+    Database connection pools: connections in use, overflow, checkout wait histogram.
+    """
+    return {name: pool_snapshot(name) for name in list(engines)}
+
+
+@router.get("/health/replicas", tags=["health"])
+def replicas_health():
+    """
+    Read replicas: health, consecutive failures, ejections and connections in use.
+    """
+    return replica_set.snapshot()
+
+
+@router.get("/health/sql", tags=["health"])
+def sql_health():
+    """
+    SQL statements and database time per route, with N+1 warning counts.
+    """
+    return route_sql_snapshot()
+
+
+@router.get("/health/jobs", tags=["health"])
+def jobs_health():
+    """
+    Background jobs: jobs per status, runner counters and run time histogram.
+    """
+    return job_runner.snapshot()
+
+
+@router.get("/health/outbox", tags=["health"])
+def outbox_health():
+    """
+    Outbox relay: latest event id, lag and failures of each consumer, relay counters.
+    """
+    return outbox_relay.snapshot()
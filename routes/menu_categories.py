@@ -3,8 +3,10 @@ from sqlalchemy.orm import Session
 from typing import List
 
 from db import get_db
+from db.replicas import get_read_db
 from db.models import MenuCategory, Menu
 from db.schemas import MenuCategoryCreate, MenuCategory as MenuCategorySchema, MenuCategoryUpdate, Menu as MenuSchema
+from services.outbox import record_event
 
 router = APIRouter()
 
@@ -14,6 +16,8 @@ def create_menu_category(menu_category: MenuCategoryCreate, db: Session = Depend
     """Create a new menu category"""
     db_menu_category = MenuCategory(**menu_category.model_dump())
     db.add(db_menu_category)
+    db.flush()
+    record_event(db, "menu_category.created", {"menu_category_id": db_menu_category.id}, key=db_menu_category.id)
     db.commit()
     db.refresh(db_menu_category)
     return db_menu_category
@@ -23,7 +27,7 @@ def create_menu_category(menu_category: MenuCategoryCreate, db: Session = Depend
 def list_menu_categories(
     skip: int = Query(default=0, ge=0),
     limit: int = Query(default=100, le=100),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Get all menu categories"""
     menu_categories = db.query(MenuCategory).offset(skip).limit(limit).all()
@@ -31,7 +35,7 @@ def list_menu_categories(
 
 
 @router.get("/menu-categories/{category_id}", response_model=MenuCategorySchema)
-def get_menu_category(category_id: int, db: Session = Depends(get_db)):
+def get_menu_category(category_id: int, db: Session = Depends(get_read_db)):
     """Get a specific menu category by ID"""
     menu_category = db.query(MenuCategory).filter(MenuCategory.id == category_id).first()
     if menu_category is None:
@@ -61,6 +65,7 @@ def update_menu_category(
     for key, value in update_data.items():
         setattr(db_menu_category, key, value)
 
+    record_event(db, "menu_category.updated", {"menu_category_id": category_id}, key=category_id)
     db.commit()
     db.refresh(db_menu_category)
     return db_menu_category
@@ -85,6 +90,7 @@ def delete_menu_category(category_id: int, db: Session = Depends(get_db)):
         )
 
     db.delete(db_menu_category)
+    record_event(db, "menu_category.deleted", {"menu_category_id": category_id}, key=category_id)
     db.commit()
     return None
 
@@ -94,7 +100,7 @@ def get_menus_by_category(
     category_id: int,
     skip: int = Query(default=0, ge=0),
     limit: int = Query(default=100, le=100),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Get all menus for a specific category"""
     # Verify category exists
@@ -1,16 +1,30 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import func, outerjoin
+from fastapi import APIRouter, Depends, HTTPException, Request, status, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import func, outerjoin, select
 from typing import List, Dict, Any
 
 from db import get_db
+from db.replicas import get_async_read_db
 from db.models import Menu, Restaurant, MenuCategory, Comment, Supplement
 from db.schemas import MenuCreate, Menu as MenuSchema, MenuUpdate
+from services.catalog_cache import catalog_cache
+from services.outbox import record_event
+from utils.serialization import FastSerializer, encode_many, encode_one
 
 router = APIRouter()
 
 MINIMUM_PREP_TIME = 1  # minimum 1 minute
 
+# Relationships serialized with every menu, loaded up front (async sessions cannot lazy load)
+MENU_LOAD_OPTIONS = (
+    selectinload(Menu.restaurant),
+    selectinload(Menu.categories),
+    selectinload(Menu.supplements),
+)
+
+menu_serializer = FastSerializer(MenuSchema)
+
 
 def calculate_average_ratings(db: Session, menu_ids: List[int]) -> Dict[int, float]:
     """
@@ -35,6 +49,30 @@ def calculate_average_ratings(db: Session, menu_ids: List[int]) -> Dict[int, flo
     return {rating.menu_id: float(rating.average_rating) for rating in ratings}
 
 
+async def fetch_average_ratings(db: AsyncSession, menu_ids: List[int]) -> Dict[int, float]:
+    """Async counterpart of calculate_average_ratings"""
+    if not menu_ids:
+        return {}
+
+    result = await db.execute(
+        select(Comment.menu_id, func.avg(Comment.rating).label("average_rating"))
+        .where(Comment.menu_id.in_(menu_ids))
+        .group_by(Comment.menu_id)
+    )
+    return {rating.menu_id: float(rating.average_rating) for rating in result}
+
+
+async def populate_average_ratings(db: AsyncSession, menus: List[Menu]) -> List[Menu]:
+    ratings = await fetch_average_ratings(db, [menu.id for menu in menus])
+    for menu in menus:
+        menu.average_rating = ratings.get(menu.id)
+    return menus
+
+
+def menu_payload(menu: Menu) -> dict:
+    return {"menu_id": menu.id, "restaurant_id": menu.restaurant_id, "name": menu.name, "price": menu.price}
+
+
 @router.post("/menus", response_model=MenuSchema, status_code=status.HTTP_201_CREATED)
 def create_menu(menu: MenuCreate, db: Session = Depends(get_db)):
     if not menu.preparation_time >= MINIMUM_PREP_TIME:
@@ -90,65 +128,112 @@ def create_menu(menu: MenuCreate, db: Session = Depends(get_db)):
         db_menu.supplements = supplements
 
     db.add(db_menu)
+    db.flush()
+    record_event(db, "menu.created", menu_payload(db_menu), key=db_menu.restaurant_id)
     db.commit()
     db.refresh(db_menu)
     return db_menu
 
 
 @router.get("/menus", response_model=List[MenuSchema])
-def list_menus(
+async def list_menus(
+        request: Request,
         restaurant_id: int | None = None,
         skip: int = Query(default=0, ge=0),
         limit: int = Query(default=100, le=100),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_async_read_db)
 ):
-    query = db.query(Menu)
+    cached = catalog_cache.get(request)
+    if cached is not None:
+        return cached
 
-    if restaurant_id:
-        query = query.filter(Menu.restaurant_id == restaurant_id)
+    query = select(Menu).options(*MENU_LOAD_OPTIONS)
 
-    menus = query.offset(skip).limit(limit).all()
-
-    # Calculate average ratings for all menus
-    menu_ids = [menu.id for menu in menus]
-    ratings = calculate_average_ratings(db, menu_ids)
-
-    # Populate average_rating field
-    for menu in menus:
-        menu.average_rating = ratings.get(menu.id)
+    if restaurant_id:
+        query = query.where(Menu.restaurant_id == restaurant_id)
 
-    return menus
+    menus = (await db.scalars(query.offset(skip).limit(limit))).all()
+    await populate_average_ratings(db, menus)
+    return await catalog_cache.put(request, encode_many(menu_serializer, menus))
 
 
 @router.get("/menus/quick-service", response_model=List[MenuSchema])
-def get_quick_service_menus(
+async def get_quick_service_menus(
+        request: Request,
         max_preparation_time: int = Query(30, ge=MINIMUM_PREP_TIME),
         restaurant_id: int | None = Query(None),
         skip: int = Query(default=0, ge=0),
         limit: int = Query(default=100, le=100),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_async_read_db)
 ):
-    query = db.query(Menu).filter(Menu.preparation_time <= max_preparation_time)
+    cached = catalog_cache.get(request)
+    if cached is not None:
+        return cached
+
+    query = select(Menu).options(*MENU_LOAD_OPTIONS).where(Menu.preparation_time <= max_preparation_time)
 
     if restaurant_id:
-        query = query.filter(Menu.restaurant_id == restaurant_id)
+        query = query.where(Menu.restaurant_id == restaurant_id)
 
-    menus = query.offset(skip).limit(limit).all()
+    menus = (await db.scalars(query.offset(skip).limit(limit))).all()
+    await populate_average_ratings(db, menus)
+    return await catalog_cache.put(request, encode_many(menu_serializer, menus))
 
-    # Calculate average ratings for all menus
-    menu_ids = [menu.id for menu in menus]
-    ratings = calculate_average_ratings(db, menu_ids)
 
-    # Populate average_rating field
-    for menu in menus:
-        menu.average_rating = ratings.get(menu.id)
+# Declared before /menus/{menu_id}, which would otherwise match it
+@router.get("/menus/most-rated", response_model=List[MenuSchema])
+async def get_most_rated_menus(
+        request: Request,
+        skip: int = Query(default=0, ge=0),
+        limit: int = Query(default=100, le=100),
+        db: AsyncSession = Depends(get_async_read_db)
+):
+    """Get menus ordered by their average rating (highest first)"""
+    cached = catalog_cache.get(request)
+    if cached is not None:
+        return cached
 
-    return menus
+    # Subquery to calculate average rating for each menu
+    subquery = (
+        select(
+            Menu.id.label("menu_id"),
+            func.avg(Comment.rating).label("avg_rating"),
+            func.count(Comment.id).label("review_count")
+        )
+        .join(Comment, Menu.id == Comment.menu_id)
+        .group_by(Menu.id)
+        .subquery()
+    )
+
+    # Main query to get menus with their average rating
+    query = (
+        select(Menu, subquery.c.avg_rating)
+        .join(
+            subquery,
+            Menu.id == subquery.c.menu_id
+        )
+        .options(*MENU_LOAD_OPTIONS)
+        .order_by(subquery.c.avg_rating.desc(), subquery.c.review_count.desc())
+    )
+
+    results = (await db.execute(query.offset(skip).limit(limit))).all()
+
+    # Extract menus and set average_rating
+    menus = []
+    for menu, avg_rating in results:
+        menu.average_rating = float(avg_rating) if avg_rating is not None else None
+        menus.append(menu)
+
+    return await catalog_cache.put(request, encode_many(menu_serializer, menus))
 
 
 @router.get("/menus/{menu_id}", response_model=MenuSchema)
-def get_menu(menu_id: int, db: Session = Depends(get_db)):
-    menu = db.query(Menu).filter(Menu.id == menu_id).first()
+async def get_menu(menu_id: int, request: Request, db: AsyncSession = Depends(get_async_read_db)):
+    cached = catalog_cache.get(request)
+    if cached is not None:
+        return cached
+
+    menu = await db.scalar(select(Menu).options(*MENU_LOAD_OPTIONS).where(Menu.id == menu_id))
     if menu is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -156,10 +241,8 @@ def get_menu(menu_id: int, db: Session = Depends(get_db)):
         )
 
     # Calculate average rating for this menu
-    ratings = calculate_average_ratings(db, [menu_id])
-    menu.average_rating = ratings.get(menu_id)
-
-    return menu
+    await populate_average_ratings(db, [menu])
+    return await catalog_cache.put(request, encode_one(menu_serializer, menu))
 
 
 @router.put("/menus/{menu_id}", response_model=MenuSchema)
@@ -228,6 +311,7 @@ def update_menu(
     for key, value in update_data.items():
         setattr(db_menu, key, value)
 
+    record_event(db, "menu.updated", menu_payload(db_menu), key=db_menu.restaurant_id)
     db.commit()
     db.refresh(db_menu)
 
@@ -248,77 +332,37 @@ def delete_menu(menu_id: int, db: Session = Depends(get_db)):
         )
 
     db.delete(db_menu)
+    record_event(db, "menu.deleted", menu_payload(db_menu), key=db_menu.restaurant_id)
     db.commit()
     return None
 
 
 @router.get("/restaurants/{restaurant_id}/menus", response_model=List[MenuSchema])
-def get_restaurant_menus(
+async def get_restaurant_menus(
         restaurant_id: int,
+        request: Request,
         skip: int = Query(default=0, ge=0),
         limit: int = Query(default=100, le=100),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_async_read_db)
 ):
-    try:
-        # Verify restaurant exists
-        restaurant = db.query(Restaurant).filter(Restaurant.id == restaurant_id).first()
-        if not restaurant:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Restaurant not found"
-            )
-
-        menus = db.query(Menu).filter(Menu.restaurant_id == restaurant_id).offset(skip).limit(limit).all()
-
-        # Calculate average ratings for all menus
-        menu_ids = [menu.id for menu in menus]
-        ratings = calculate_average_ratings(db, menu_ids)
+    cached = catalog_cache.get(request)
+    if cached is not None:
+        return cached
 
-        # Populate average_rating field
-        for menu in menus:
-            menu.average_rating = ratings.get(menu.id)
-
-        return menus
-    except Exception as e:
-        print(str(e))
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
-
-
-@router.get("/menus/most-rated", response_model=List[MenuSchema])
-def get_most_rated_menus(
-        skip: int = Query(default=0, ge=0),
-        limit: int = Query(default=100, le=100),
-        db: Session = Depends(get_db)
-):
-    """Get menus ordered by their average rating (highest first)"""
-    # Subquery to calculate average rating for each menu
-    subquery = (
-        db.query(
-            Menu.id.label("menu_id"),
-            func.avg(Comment.rating).label("avg_rating"),
-            func.count(Comment.id).label("review_count")
-        )
-        .join(Comment, Menu.id == Comment.menu_id)
-        .group_by(Menu.id)
-        .subquery()
-    )
-
-    # Main query to get menus with their average rating
-    query = (
-        db.query(Menu, subquery.c.avg_rating)
-        .join(
-            subquery,
-            Menu.id == subquery.c.menu_id
+    # Verify restaurant exists
+    restaurant = await db.get(Restaurant, restaurant_id)
+    if not restaurant:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Restaurant not found"
         )
-        .order_by(subquery.c.avg_rating.desc(), subquery.c.review_count.desc())
-    )
-
-    results = query.offset(skip).limit(limit).all()
 
-    # Extract menus and set average_rating
-    menus = []
-    for menu, avg_rating in results:
-        menu.average_rating = float(avg_rating) if avg_rating is not None else None
-        menus.append(menu)
-
-    return menus
+    menus = (await db.scalars(
+        select(Menu)
+        .options(*MENU_LOAD_OPTIONS)
+        .where(Menu.restaurant_id == restaurant_id)
+        .offset(skip)
+        .limit(limit)
+    )).all()
+    await populate_average_ratings(db, menus)
+    return await catalog_cache.put(request, encode_many(menu_serializer, menus))
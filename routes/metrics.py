@@ -0,0 +1,19 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from starlette.concurrency import run_in_threadpool
+
+from services.metrics import registry
+
+router = APIRouter()
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics():
+    """
+    Metrics in the Prometheus text format, aggregated across workers when
+    METRICS_MULTIPROC_DIR is set.
+    """
+    body = await run_in_threadpool(registry.render)
+    return PlainTextResponse(body, media_type=PROMETHEUS_CONTENT_TYPE)
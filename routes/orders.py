@@ -12,10 +12,21 @@ from db.models import (
     Supplement as SupplementModel,
     OrderItemSupplement as OrderItemSupplementModel
 )
+from services.outbox import record_event
+from services.zones import zone_index
 
 router = APIRouter()
 
 
+def calculate_item_price(menu_item: MenuModel, quantity: int, supplements: list[tuple[SupplementModel, int]]) -> float:
+    """Price of an order line: the menu times its quantity, plus each supplement times its quantity"""
+    item_price = menu_item.price * quantity
+    supplements_price = 0
+    for supplement, supplement_quantity in supplements:
+        supplements_price += supplement.price * supplement_quantity
+    return item_price + supplements_price
+
+
 @router.post("/orders", response_model=Order)
 def create_order(order: OrderCreate, db: Session = Depends(get_db)):
     # Extract items from the order
@@ -24,6 +35,12 @@ def create_order(order: OrderCreate, db: Session = Depends(get_db)):
     if not items:
         raise HTTPException(status_code=400, detail="Order must contain at least one item")
 
+    has_delivery_location = order.delivery_latitude is not None and order.delivery_longitude is not None
+
+    # Reject addresses no restaurant delivers to before touching the database
+    if has_delivery_location and not zone_index.restaurants_serving(order.delivery_latitude, order.delivery_longitude):
+        raise HTTPException(status_code=400, detail="Delivery address is outside every delivery zone")
+
     # Calculate the total amount and get restaurant_id
     total_amount = 0
     restaurant_id = None
@@ -33,11 +50,8 @@ def create_order(order: OrderCreate, db: Session = Depends(get_db)):
         if not menu_item:
             raise HTTPException(status_code=404, detail=f"Menu item with id {item.menu_id} not found")
 
-        # Calculate menu item price
-        item_price = menu_item.price * item.quantity
-
-        # Calculate supplements price
-        supplements_price = 0
+        # Collect the ordered supplements
+        supplements = []
         for supplement_item in item.supplements:
             supplement = db.query(SupplementModel).filter(SupplementModel.id == supplement_item.supplement_id).first()
             if not supplement:
@@ -50,9 +64,9 @@ def create_order(order: OrderCreate, db: Session = Depends(get_db)):
                     detail=f"Supplement with id {supplement_item.supplement_id} is not available for menu item with id {item.menu_id}"
                 )
 
-            supplements_price += supplement.price * supplement_item.quantity
+            supplements.append((supplement, supplement_item.quantity))
 
-        total_amount += item_price + supplements_price
+        total_amount += calculate_item_price(menu_item, item.quantity, supplements)
 
         # Set restaurant_id from the first menu item
         if restaurant_id is None:
@@ -61,12 +75,14 @@ def create_order(order: OrderCreate, db: Session = Depends(get_db)):
         elif restaurant_id != menu_item.restaurant_id:
             raise HTTPException(status_code=400, detail="All menu items must belong to the same restaurant")
 
+    if has_delivery_location and not zone_index.serves(restaurant_id, order.delivery_latitude, order.delivery_longitude):
+        raise HTTPException(status_code=400, detail="Delivery address is outside the restaurant's delivery zone")
+
     # Create order without items
-    order_data = order.model_dump(exclude={"items"})
+    order_data = order.model_dump(exclude={"items", "delivery_latitude", "delivery_longitude"})
     db_order = OrderModel(**order_data, total_amount=total_amount, restaurant_id=restaurant_id)
     db.add(db_order)
-    db.commit()
-    db.refresh(db_order)
+    db.flush()  # Flush to get the order.id
 
     # Create order items
     for item in items:
@@ -87,6 +103,13 @@ def create_order(order: OrderCreate, db: Session = Depends(get_db)):
             )
             db.add(db_order_item_supplement)
 
+    record_event(db, "order.created", {
+        "order_id": db_order.id,
+        "restaurant_id": restaurant_id,
+        "client_id": db_order.client_id,
+        "total_amount": total_amount,
+        "items": [{"menu_id": item.menu_id, "quantity": item.quantity} for item in items],
+    }, key=restaurant_id)
     db.commit()
     db.refresh(db_order)
 
@@ -0,0 +1,85 @@
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+from fastapi.responses import PlainTextResponse
+from starlette.concurrency import run_in_threadpool
+
+from config.settings import settings
+from services.profiling import memory_tracker, profile_for, profile_lock, profile_store, verify_token
+
+
+def require_admin_token(x_profile_token: str = Header(default="")):
+    if not verify_token(x_profile_token, "admin"):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Valid X-Profile-Token required"
+        )
+
+
+router = APIRouter(prefix="/debug", dependencies=[Depends(require_admin_token)], include_in_schema=False)
+
+
+@router.get("/profile", response_class=PlainTextResponse)
+async def sample_profile(
+        seconds: float = Query(10, gt=0),
+        interval: float = Query(settings.PROFILING_INTERVAL_SECONDS, ge=0.001, le=1),
+):
+    """
+    Sample every busy thread of this worker for `seconds` and return the
+    collapsed stacks (flamegraph.pl / speedscope input).
+    """
+    if seconds > settings.PROFILING_MAX_SECONDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Profiles are limited to {settings.PROFILING_MAX_SECONDS:g} seconds"
+        )
+    if not profile_lock.acquire(blocking=False):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="A profile is already running on this worker"
+        )
+    try:
+        return await run_in_threadpool(profile_for, seconds, interval)
+    finally:
+        profile_lock.release()
+
+
+@router.get("/profiles")
+def list_profiles():
+    """Ids of the last per-request and signal profiles of this worker"""
+    return profile_store.ids()
+
+
+@router.get("/profiles/{profile_id}", response_class=PlainTextResponse)
+def get_profile(profile_id: str):
+    collapsed = profile_store.get(profile_id)
+    if collapsed is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Profile not found"
+        )
+    return collapsed
+
+
+@router.post("/memory/start", status_code=status.HTTP_204_NO_CONTENT)
+def start_memory_tracking(frames: int = Query(settings.PROFILING_TRACEMALLOC_FRAMES, ge=1, le=100)):
+    """Start tracemalloc and take the baseline snapshot"""
+    memory_tracker.start(frames)
+
+
+@router.get("/memory/diff")
+def memory_diff(
+        limit: int = Query(25, ge=1, le=500),
+        key: str = Query("lineno", pattern="^(lineno|filename|traceback)$"),
+        reset: bool = False,
+):
+    """Largest allocation changes since the baseline; `reset` makes this snapshot the new baseline"""
+    if not memory_tracker.tracing:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Memory tracking is not started"
+        )
+    return memory_tracker.diff(limit, key, reset)
+
+
+@router.post("/memory/stop", status_code=status.HTTP_204_NO_CONTENT)
+def stop_memory_tracking():
+    memory_tracker.stop()
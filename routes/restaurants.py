@@ -1,46 +1,74 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from typing import List
 
 from db import get_db
+from db.replicas import get_async_read_db
 from db.models import Restaurant
 from db.schemas import RestaurantCreate, Restaurant as RestaurantSchema, RestaurantUpdate
+from services.outbox import record_event
+from services.zones import zone_index
+from utils.serialization import FastSerializer, serialize_many, serialize_one
 
 router = APIRouter()
 
+restaurant_serializer = FastSerializer(RestaurantSchema)
+
 
 @router.post("/restaurants", response_model=RestaurantSchema, status_code=status.HTTP_201_CREATED)
 def create_restaurant(restaurant: RestaurantCreate, db: Session = Depends(get_db)):
     try:
         db_restaurant = Restaurant(**restaurant.model_dump())
         db.add(db_restaurant)
+        db.flush()
+        record_event(db, "restaurant.created", {"restaurant_id": db_restaurant.id}, key=db_restaurant.id)
         db.commit()
         db.refresh(db_restaurant)
+        zone_index.invalidate()
         return db_restaurant
+    except SQLAlchemyError:
+        db.rollback()
+        raise
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
 
 @router.get("/restaurants", response_model=List[RestaurantSchema])
-def list_restaurants(
+async def list_restaurants(
         skip: int = 0,
         limit: int = 100,
-        db: Session = Depends(get_db)
+        latitude: float | None = Query(None, ge=-90, le=90),
+        longitude: float | None = Query(None, ge=-180, le=180),
+        db: AsyncSession = Depends(get_async_read_db)
 ):
-    restaurants = db.query(Restaurant).offset(skip).limit(limit).all()
-    return restaurants
+    query = select(Restaurant)
+
+    # Only list restaurants delivering to the given location
+    if latitude is not None and longitude is not None:
+        # The zone index may have to be reloaded from the sync engine
+        restaurant_ids = await run_in_threadpool(zone_index.restaurants_serving, latitude, longitude)
+        if not restaurant_ids:
+            return []
+        query = query.where(Restaurant.id.in_(restaurant_ids))
+
+    restaurants = (await db.scalars(query.offset(skip).limit(limit))).all()
+    return serialize_many(restaurant_serializer, restaurants)
 
 
 @router.get("/restaurants/{restaurant_id}", response_model=RestaurantSchema)
-def get_restaurant(restaurant_id: int, db: Session = Depends(get_db)):
-    restaurant = db.query(Restaurant).filter(Restaurant.id == restaurant_id).first()
+async def get_restaurant(restaurant_id: int, db: AsyncSession = Depends(get_async_read_db)):
+    restaurant = await db.get(Restaurant, restaurant_id)
     if restaurant is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Restaurant not found"
         )
-    return restaurant
+    return serialize_one(restaurant_serializer, restaurant)
 
 
 @router.put("/restaurants/{restaurant_id}", response_model=RestaurantSchema)
@@ -60,8 +88,10 @@ def update_restaurant(
     for key, value in restaurant_update.model_dump().items():
         setattr(db_restaurant, key, value)
 
+    record_event(db, "restaurant.updated", {"restaurant_id": restaurant_id}, key=restaurant_id)
     db.commit()
     db.refresh(db_restaurant)
+    zone_index.invalidate()
     return db_restaurant
 
 
@@ -75,5 +105,7 @@ def delete_restaurant(restaurant_id: int, db: Session = Depends(get_db)):
         )
 
     db.delete(db_restaurant)
+    record_event(db, "restaurant.deleted", {"restaurant_id": restaurant_id}, key=restaurant_id)
     db.commit()
+    zone_index.invalidate()
     return None
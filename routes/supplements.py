@@ -3,8 +3,10 @@ from sqlalchemy.orm import Session
 from typing import List
 
 from db import get_db
+from db.replicas import get_read_db
 from db.models import Supplement, Menu
 from db.schemas import SupplementCreate, Supplement as SupplementSchema, SupplementUpdate
+from services.outbox import record_event
 
 router = APIRouter()
 
@@ -14,6 +16,8 @@ def create_supplement(supplement: SupplementCreate, db: Session = Depends(get_db
     """Create a new supplement"""
     db_supplement = Supplement(**supplement.model_dump())
     db.add(db_supplement)
+    db.flush()
+    record_event(db, "supplement.created", {"supplement_id": db_supplement.id}, key=db_supplement.id)
     db.commit()
     db.refresh(db_supplement)
     return db_supplement
@@ -23,7 +27,7 @@ def create_supplement(supplement: SupplementCreate, db: Session = Depends(get_db
 def list_supplements(
     skip: int = Query(default=0, ge=0),
     limit: int = Query(default=100, le=100),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """List all supplements"""
     supplements = db.query(Supplement).offset(skip).limit(limit).all()
@@ -31,7 +35,7 @@ def list_supplements(
 
 
 @router.get("/supplements/{supplement_id}", response_model=SupplementSchema)
-def get_supplement(supplement_id: int, db: Session = Depends(get_db)):
+def get_supplement(supplement_id: int, db: Session = Depends(get_read_db)):
     """Get a specific supplement by ID"""
     supplement = db.query(Supplement).filter(Supplement.id == supplement_id).first()
     if supplement is None:
@@ -63,6 +67,7 @@ def update_supplement(
     for key, value in update_data.items():
         setattr(db_supplement, key, value)
 
+    record_event(db, "supplement.updated", {"supplement_id": supplement_id}, key=supplement_id)
     db.commit()
     db.refresh(db_supplement)
     return db_supplement
@@ -86,6 +91,7 @@ def delete_supplement(supplement_id: int, db: Session = Depends(get_db)):
         )
 
     db.delete(db_supplement)
+    record_event(db, "supplement.deleted", {"supplement_id": supplement_id}, key=supplement_id)
     db.commit()
     return None
 
@@ -95,7 +101,7 @@ def get_menu_supplements(
     menu_id: int,
     skip: int = Query(default=0, ge=0),
     limit: int = Query(default=100, le=100),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Get all supplements for a specific menu"""
     # Verify menu exists
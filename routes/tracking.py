@@ -0,0 +1,118 @@
+import asyncio
+import time
+from datetime import datetime
+
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect, status
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel, confloat
+
+from config.settings import settings
+from db import SessionLocal
+from db.models import Shipment, Shipper
+from services.dispatch import dispatch_engine
+from services.tracking import Position, location_store, tracking_hub
+
+router = APIRouter()
+
+
+class LocationPing(BaseModel):
+    shipper_id: int
+    latitude: confloat(ge=-90, le=90)
+    longitude: confloat(ge=-180, le=180)
+    recorded_at: datetime | None = None
+
+
+class IngestResponse(BaseModel):
+    accepted: int
+    ignored: int
+
+
+def _find_unknown_shippers(shipper_ids: set[int]) -> set[int]:
+    db = SessionLocal()
+    try:
+        found = {row.id for row in db.query(Shipper.id).filter(Shipper.id.in_(shipper_ids))}
+    finally:
+        db.close()
+    location_store.known_shippers.update(found)
+    return shipper_ids - found
+
+
+def _get_shipment_shipper(shipment_id: int) -> int | None:
+    db = SessionLocal()
+    try:
+        row = db.query(Shipment.shipper_id).filter(Shipment.id == shipment_id).first()
+    finally:
+        db.close()
+    return row.shipper_id if row else None
+
+
+@router.post("/shippers/locations", response_model=IngestResponse, status_code=status.HTTP_202_ACCEPTED)
+async def ingest_locations(pings: list[LocationPing]):
+    """
+    Accept a batch of GPS pings.
+    Pings only update in-memory state; tracks are persisted by the periodic flush.
+    """
+    unseen = {ping.shipper_id for ping in pings} - location_store.known_shippers
+    if unseen:
+        unknown = await run_in_threadpool(_find_unknown_shippers, unseen)
+        if unknown:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Shippers not found: {sorted(unknown)}"
+            )
+
+    accepted = 0
+    now = time.time()
+    # A clock running ahead would otherwise freeze the shipper until real time caught up
+    for ping in sorted(pings, key=lambda p: min(p.recorded_at.timestamp(), now) if p.recorded_at else now):
+        timestamp = min(ping.recorded_at.timestamp(), now) if ping.recorded_at else now
+        if not location_store.update(ping.shipper_id, ping.latitude, ping.longitude, timestamp):
+            continue
+        accepted += 1
+        dispatch_engine.move_shipper(ping.shipper_id, ping.latitude, ping.longitude)
+        tracking_hub.publish(Position(ping.shipper_id, ping.latitude, ping.longitude, timestamp))
+
+    return IngestResponse(accepted=accepted, ignored=len(pings) - accepted)
+
+
+@router.websocket("/shipments/{shipment_id}/track")
+async def track_shipment(websocket: WebSocket, shipment_id: int):
+    """Stream the position of the shipper carrying a shipment, throttled per client"""
+    shipper_id = await run_in_threadpool(_get_shipment_shipper, shipment_id)
+    if shipper_id is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Shipment not found")
+        return
+
+    await websocket.accept()
+    subscription = tracking_hub.subscribe(shipper_id)
+    receiver = None
+    try:
+        current = location_store.get(shipper_id)
+        if current is not None:
+            subscription.offer(current)
+
+        receiver = asyncio.create_task(websocket.receive_text())
+        while True:
+            update = asyncio.create_task(subscription.next())
+            done, _ = await asyncio.wait({receiver, update}, return_when=asyncio.FIRST_COMPLETED)
+            if receiver in done:
+                if receiver.exception() is not None:
+                    update.cancel()
+                    break
+                # Clients only listen, incoming messages are ignored
+                receiver = asyncio.create_task(websocket.receive_text())
+                if update not in done:
+                    update.cancel()
+                    continue
+            await websocket.send_json(update.result().as_dict())
+            await asyncio.sleep(settings.TRACKING_PUSH_INTERVAL_SECONDS)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        tracking_hub.unsubscribe(subscription)
+        if receiver is not None:
+            if not receiver.done():
+                receiver.cancel()
+            elif not receiver.cancelled():
+                # Retrieve the disconnect so it is not reported as unhandled
+                receiver.exception()
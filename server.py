@@ -0,0 +1,79 @@
+"""
+Production server: gunicorn pre-forking uvicorn workers.
+
+    gunicorn -c gunicorn.conf.py main:app
+
+The app is imported once in the master (SERVER_PRELOAD) so workers fork
+with the code already loaded, then every worker drops the database
+connections it inherited and opens its own (see reset_after_fork). Send
+HUP to the master for a rolling restart of the workers (new workers start
+before the old ones finish their requests); with preloading, code changes
+need USR2 to re-exec the master.
+
+SERVER_WORKERS defaults to a single worker because some state still lives
+in the worker process: the dispatch engine's pending orders and shippers,
+the shipper location store and the tracking websocket hub. With several
+workers, an order queued on one worker is never matched with a shipper
+registered on another, and a customer's tracking socket only receives the
+pings its own worker ingested. Run more workers only with DISPATCH_ENABLED
+off and tracking served by a single process, until that state is shared.
+"""
+import logging
+import os
+import signal
+import threading
+import time
+
+from uvicorn.workers import UvicornWorker
+
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+class Worker(UvicornWorker):
+    # The app writes its own access log (middleware.access_log)
+    CONFIG_KWARGS = {
+        "loop": settings.SERVER_LOOP, "http": settings.SERVER_HTTP, "access_log": not settings.ACCESS_LOG_ENABLED,
+    }
+
+
+def reset_after_fork() -> None:
+    """
+    Forget pooled connections inherited from the master without closing them,
+    since the master (and sibling workers) still own the sockets.
+    """
+    import db
+    from db.replicas import replica_set
+
+    db.engine.dispose(close=False)
+    if db.async_engine is not None:
+        db.async_engine.sync_engine.dispose(close=False)
+    for replica in replica_set.replicas:
+        replica.engine.dispose(close=False)
+        if replica.async_engine is not None:
+            replica.async_engine.sync_engine.dispose(close=False)
+
+
+def resident_memory_mb() -> float:
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except OSError:
+        import resource
+        # Peak rather than current usage, in KB on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def watch_memory(limit_mb: float, interval: float = settings.SERVER_MEMORY_CHECK_SECONDS) -> None:
+    """Gracefully stop this worker once it grows past `limit_mb`; the master replaces it"""
+    def watch():
+        while True:
+            time.sleep(interval)
+            rss = resident_memory_mb()
+            if rss > limit_mb:
+                logger.warning("Worker %d uses %.0f MB (limit %.0f MB), recycling it", os.getpid(), rss, limit_mb)
+                os.kill(os.getpid(), signal.SIGTERM)
+                return
+
+    threading.Thread(target=watch, name="memory-watchdog", daemon=True).start()
@@ -0,0 +1,121 @@
+"""
+Cache of encoded catalog responses.
+
+Menu listings are cached per path and query string as JSON bytes together
+with their gzip (and brotli) encodings, compressed once when the entry is
+stored, so repeat hits neither query, serialize nor compress anything.
+
+A commit touching menus, restaurants, categories, supplements or comments
+clears this worker's cache; other workers clear theirs when the outbox
+relay delivers the change's event (services.outbox), or within
+CATALOG_CACHE_TTL_SECONDS at worst. Clients that just wrote (read-your-writes
+cookie) bypass the cache like they bypass the replicas.
+"""
+import threading
+from itertools import chain
+
+from fastapi import Request
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import Response
+
+from config.settings import settings
+from db.models import Comment, Menu, MenuCategory, Restaurant, Supplement
+from db.replicas import reads_from_primary
+from services.outbox import subscribe
+from utils.cache import LRUCache
+from utils.compression import SUPPORTED_ENCODINGS, choose_encoding, compress
+
+CATALOG_MODELS = (Menu, Restaurant, MenuCategory, Supplement, Comment)
+
+# Stored entries are compressed once, so they can afford stronger settings than the middleware
+PRECOMPRESSION_LEVELS = {"gzip": 9, "br": 9}
+
+
+class PrecompressedPayload:
+    """A response body stored alongside its compressed encodings"""
+
+    __slots__ = ("media_type", "encodings")
+
+    def __init__(self, body: bytes, media_type: str, minimum_size: int = settings.COMPRESSION_MIN_SIZE):
+        self.media_type = media_type
+        self.encodings: dict[str | None, bytes] = {None: body}
+        if settings.COMPRESSION_ENABLED and len(body) >= minimum_size:
+            for encoding in SUPPORTED_ENCODINGS:
+                self.encodings[encoding] = compress(body, encoding, PRECOMPRESSION_LEVELS[encoding])
+
+    def response(self, accept_encoding: str | None) -> Response:
+        encoding = choose_encoding(accept_encoding) if accept_encoding else None
+        if encoding not in self.encodings:
+            encoding = None
+        headers = {"vary": "Accept-Encoding"}
+        if encoding is not None:
+            headers["content-encoding"] = encoding
+        return Response(self.encodings[encoding], headers=headers, media_type=self.media_type)
+
+
+class CatalogCache:
+    def __init__(self, maxsize: int = settings.CATALOG_CACHE_SIZE, ttl: float = settings.CATALOG_CACHE_TTL_SECONDS):
+        self.enabled = ttl > 0
+        self._cache = LRUCache(maxsize=maxsize, ttl=ttl, name="catalog")
+        # Bumped by invalidate(): a miss that read the rows before a commit must not store them after it
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(request: Request) -> tuple[str, bytes]:
+        return request.scope["path"], request.scope["query_string"]
+
+    def get(self, request: Request) -> Response | None:
+        if not self.enabled:
+            return None
+        request.state.catalog_generation = self._generation
+        if reads_from_primary(request):
+            return None
+        payload = self._cache.get(self._key(request))
+        if payload is None:
+            return None
+        return payload.response(request.headers.get("accept-encoding"))
+
+    async def put(self, request: Request, response):
+        """Store an encoded response and return it in the client's encoding; other results are returned as is"""
+        if not self.enabled or not isinstance(response, Response) or response.status_code != 200:
+            return response
+        payload = await run_in_threadpool(PrecompressedPayload, response.body, response.media_type)
+        with self._lock:
+            if getattr(request.state, "catalog_generation", None) == self._generation:
+                self._cache.set(self._key(request), payload)
+        return payload.response(request.headers.get("accept-encoding"))
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._cache.clear()
+
+
+catalog_cache = CatalogCache()
+
+
+@event.listens_for(Session, "after_flush")
+def _track_catalog_changes(session, flush_context):
+    if any(isinstance(obj, CATALOG_MODELS) for obj in chain(session.new, session.dirty, session.deleted)):
+        session.info["catalog_changed"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_catalog(session):
+    if session.info.pop("catalog_changed", False):
+        catalog_cache.invalidate()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_catalog_changes(session):
+    session.info.pop("catalog_changed", None)
+
+
+@subscribe("menu.*", "restaurant.*", "menu_category.*", "supplement.*", "comment.*",
+           name="catalog_cache.invalidate", durable=False)
+def _invalidate_on_events(events) -> None:
+    # Catalog writes committed by other workers, which would otherwise be served until the TTL
+    catalog_cache.invalidate()
@@ -0,0 +1,261 @@
+"""
+Shipper dispatch engine.
+
+Ready orders are collected for a short time window, then assigned to the
+available shippers in one batch: candidate shippers come from a spatial grid
+index around each pickup point, pairs are scored by pickup distance plus a
+load penalty, and the assignment is solved with a greedy regret heuristic.
+The resulting `Shipment` rows are written with a single bulk insert.
+
+State lives in the process that runs the engine, so only one process should
+have DISPATCH_ENABLED set.
+"""
+import asyncio
+import heapq
+import logging
+import math
+import threading
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime
+
+from sqlalchemy import func, insert, select
+
+from config.settings import settings
+from db import SessionLocal
+from db.models import Shipment
+from utils.geo import GridIndex
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ReadyOrder:
+    order_id: int
+    restaurant_id: int
+    pickup_latitude: float
+    pickup_longitude: float
+    delivery_latitude: float
+    delivery_longitude: float
+    delivery_address: str
+    ready_at: datetime
+
+
+@dataclass
+class Assignment:
+    order_id: int
+    shipper_id: int
+    pickup_distance_km: float
+    cost: float
+
+
+def solve_assignment(
+        orders: list[ReadyOrder],
+        candidates: list[list[tuple[int, float]]],
+        capacity: dict[int, int],
+        base_load: dict[int, int],
+        load_penalty_km: float,
+) -> list[Assignment]:
+    """
+    Greedy regret assignment of orders to shippers.
+
+    `candidates[i]` lists (shipper_id, distance_km) pairs for `orders[i]`.
+    At each step the order with the largest regret (cost gap between its best
+    and second best shipper) is assigned first, so orders with few good
+    options are served before the others take their shipper. Entries are
+    re-evaluated lazily when a shipper's remaining capacity or load changes.
+    """
+    assigned_count: dict[int, int] = defaultdict(int)
+
+    def best_two(index):
+        best = second = None
+        for shipper_id, distance in candidates[index]:
+            if assigned_count[shipper_id] >= capacity.get(shipper_id, 0):
+                continue
+            cost = distance + load_penalty_km * (base_load.get(shipper_id, 0) + assigned_count[shipper_id])
+            option = (cost, shipper_id, distance)
+            if best is None or option < best:
+                best, second = option, best
+            elif second is None or option < second:
+                second = option
+        return best, second
+
+    def heap_entry(index, best, second):
+        regret = second[0] - best[0] if second is not None else math.inf
+        return -regret, best[0], index, best[1]
+
+    heap = []
+    for index in range(len(orders)):
+        best, second = best_two(index)
+        if best is not None:
+            heap.append(heap_entry(index, best, second))
+    heapq.heapify(heap)
+
+    assignments = []
+    while heap:
+        entry = heapq.heappop(heap)
+        index = entry[2]
+        best, second = best_two(index)
+        if best is None:
+            continue
+
+        current = heap_entry(index, best, second)
+        if current != entry:
+            # Stale entry: capacities or loads moved since it was pushed
+            heapq.heappush(heap, current)
+            continue
+
+        cost, shipper_id, distance = best
+        assigned_count[shipper_id] += 1
+        assignments.append(Assignment(
+            order_id=orders[index].order_id,
+            shipper_id=shipper_id,
+            pickup_distance_km=round(distance, 3),
+            cost=round(cost, 3),
+        ))
+
+    return assignments
+
+
+class DispatchEngine:
+    """Collects ready orders and assigns them to available shippers in batches"""
+
+    def __init__(
+            self,
+            session_factory=SessionLocal,
+            window_seconds: float = settings.DISPATCH_WINDOW_SECONDS,
+            max_pickup_km: float = settings.DISPATCH_MAX_PICKUP_KM,
+            max_load: int = settings.DISPATCH_MAX_SHIPPER_LOAD,
+            load_penalty_km: float = settings.DISPATCH_LOAD_PENALTY_KM,
+            candidates_per_order: int = settings.DISPATCH_CANDIDATES_PER_ORDER,
+    ):
+        self.session_factory = session_factory
+        self.window_seconds = window_seconds
+        self.max_pickup_km = max_pickup_km
+        self.max_load = max_load
+        self.load_penalty_km = load_penalty_km
+        self.candidates_per_order = candidates_per_order
+
+        self._lock = threading.Lock()
+        self._batch_lock = threading.Lock()
+        self._pending: dict[int, ReadyOrder] = {}
+        self._shippers = GridIndex(cell_km=max(max_pickup_km / 2, 0.5))
+
+    @property
+    def pending_orders(self) -> int:
+        return len(self._pending)
+
+    @property
+    def available_shippers(self) -> int:
+        return len(self._shippers)
+
+    def submit_orders(self, orders: list[ReadyOrder]) -> None:
+        with self._lock:
+            for order in orders:
+                self._pending[order.order_id] = order
+
+    def update_shipper(self, shipper_id: int, latitude: float, longitude: float) -> None:
+        with self._lock:
+            self._shippers.insert(shipper_id, latitude, longitude)
+
+    def move_shipper(self, shipper_id: int, latitude: float, longitude: float) -> None:
+        """Update the position of a shipper only if it is currently available"""
+        with self._lock:
+            if shipper_id in self._shippers:
+                self._shippers.insert(shipper_id, latitude, longitude)
+
+    def remove_shipper(self, shipper_id: int) -> None:
+        with self._lock:
+            self._shippers.remove(shipper_id)
+
+    def dispatch_batch(self) -> list[Assignment]:
+        """
+        Assign every pending order that has a shipper in range.
+        Orders left without a shipper stay queued for the next window.
+        """
+        with self._batch_lock:
+            with self._lock:
+                orders = list(self._pending.values())
+                self._pending.clear()
+                candidates = [
+                    self._shippers.nearby(
+                        order.pickup_latitude,
+                        order.pickup_longitude,
+                        self.max_pickup_km,
+                        limit=self.candidates_per_order,
+                    )
+                    for order in orders
+                ]
+
+            if not orders:
+                return []
+
+            db = self.session_factory()
+            try:
+                # Drop orders that were dispatched by hand in the meantime
+                order_ids = [order.order_id for order in orders]
+                shipped = set(db.scalars(
+                    select(Shipment.order_id).where(Shipment.order_id.in_(order_ids))
+                ))
+                if shipped:
+                    kept = [i for i, order in enumerate(orders) if order.order_id not in shipped]
+                    orders = [orders[i] for i in kept]
+                    candidates = [candidates[i] for i in kept]
+
+                shipper_ids = {shipper_id for options in candidates for shipper_id, _ in options}
+                base_load = {}
+                if shipper_ids:
+                    base_load = dict(db.execute(
+                        select(Shipment.shipper_id, func.count(Shipment.id))
+                        .where(Shipment.status == 'pending', Shipment.shipper_id.in_(shipper_ids))
+                        .group_by(Shipment.shipper_id)
+                    ).all())
+                capacity = {
+                    shipper_id: self.max_load - base_load.get(shipper_id, 0)
+                    for shipper_id in shipper_ids
+                }
+
+                assignments = solve_assignment(orders, candidates, capacity, base_load, self.load_penalty_km)
+
+                if assignments:
+                    by_id = {order.order_id: order for order in orders}
+                    db.execute(insert(Shipment), [
+                        {
+                            "order_id": assignment.order_id,
+                            "restaurant_id": by_id[assignment.order_id].restaurant_id,
+                            "shipper_id": assignment.shipper_id,
+                            "delivery_latitude": by_id[assignment.order_id].delivery_latitude,
+                            "delivery_longitude": by_id[assignment.order_id].delivery_longitude,
+                            "delivery_address": by_id[assignment.order_id].delivery_address,
+                            "status": "pending",
+                        }
+                        for assignment in assignments
+                    ])
+                    db.commit()
+            except Exception:
+                db.rollback()
+                self.submit_orders(orders)
+                raise
+            finally:
+                db.close()
+
+            assigned_ids = {assignment.order_id for assignment in assignments}
+            with self._lock:
+                for order in orders:
+                    if order.order_id not in assigned_ids:
+                        self._pending.setdefault(order.order_id, order)
+
+            return assignments
+
+    async def run(self) -> None:
+        """Dispatch loop, run as a background task from the app lifespan"""
+        while True:
+            await asyncio.sleep(self.window_seconds)
+            try:
+                await asyncio.to_thread(self.dispatch_batch)
+            except Exception:
+                logger.exception("Error dispatching orders")
+
+
+# Create a global dispatch engine
+dispatch_engine = DispatchEngine()
@@ -0,0 +1,114 @@
+"""
+Dedicated executor for bcrypt work.
+
+Hashing and verifying passwords costs hundreds of milliseconds of CPU, so it
+runs on its own pool (threads by default, bcrypt releases the GIL; or
+processes) instead of Starlette's shared threadpool. At most
+PASSWORD_HASH_WORKERS operations run at once; callers that cannot get a slot
+within PASSWORD_HASH_QUEUE_TIMEOUT_SECONDS get a 503 instead of piling up.
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from fastapi import HTTPException, status
+
+from config.settings import settings
+from utils.auth import get_password_hash, verify_and_update_password
+from utils.metrics import Histogram
+
+
+class PasswordHasher:
+    def __init__(
+            self,
+            workers: int = settings.PASSWORD_HASH_WORKERS,
+            queue_timeout: float = settings.PASSWORD_HASH_QUEUE_TIMEOUT_SECONDS,
+            executor_kind: str = settings.PASSWORD_HASH_EXECUTOR,
+    ):
+        self.workers = workers
+        self.queue_timeout = queue_timeout
+        self.executor_kind = executor_kind
+        self._executor = None
+        self._semaphore: asyncio.Semaphore | None = None
+        self._lock = threading.Lock()
+
+        self.wait_time = Histogram()
+        self.run_time = Histogram()
+        self.counters = {"completed": 0, "failed": 0, "rejected": 0, "rehashed": 0}
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    if self.executor_kind == "process":
+                        self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                    else:
+                        self._executor = ThreadPoolExecutor(
+                            max_workers=self.workers, thread_name_prefix="password-hash"
+                        )
+        return self._executor
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self.counters[name] += 1
+
+    async def _run(self, func, *args):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.workers)
+
+        queued_at = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._count("rejected")
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Authentication service busy, please retry",
+                headers={"Retry-After": "1"},
+            )
+
+        started = time.perf_counter()
+        self.wait_time.observe(started - queued_at)
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self._get_executor(), func, *args)
+        except Exception:
+            self._count("failed")
+            raise
+        finally:
+            self._semaphore.release()
+            self.run_time.observe(time.perf_counter() - started)
+        self._count("completed")
+        return result
+
+    async def hash(self, password: str) -> str:
+        return await self._run(get_password_hash, password)
+
+    async def verify_and_update(self, password: str, hashed_password: str) -> tuple[bool, str | None]:
+        """Verify a password; the second item is a new hash when the stored cost is outdated"""
+        valid, new_hash = await self._run(verify_and_update_password, password, hashed_password)
+        if new_hash is not None:
+            self._count("rehashed")
+        return valid, new_hash
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counters = dict(self.counters)
+        return {
+            "executor": self.executor_kind,
+            "workers": self.workers,
+            "rounds": settings.BCRYPT_ROUNDS,
+            "counters": counters,
+            "wait_seconds": self.wait_time.snapshot(),
+            "run_seconds": self.run_time.snapshot(),
+        }
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+# Create a global password hasher
+password_hasher = PasswordHasher()
@@ -0,0 +1,287 @@
+"""
+Precomputed delivery-time grids ("isochrones") per restaurant.
+
+For each restaurant a square grid of bike travel durations and distances is
+computed around its location with the OSRM table service and stored as a
+float32 NumPy array of shape (2, size, size), next to a small JSON metadata
+file describing the grid geometry. Grids are memory-mapped on first use and
+delivery estimates are bilinearly interpolated from the four surrounding
+cells; callers fall back to live routing outside the grid.
+
+Grids are built from OSRM with one table request per 100 cells, so they
+are built once per deployment rather than by every worker: by hand with
+`python -m services.isochrones [restaurant_id ...]`, or by the
+"isochrones.refresh" background job on ISOCHRONE_REFRESH_CRON. Point
+OSRM_URL to your own server first; the public demo server has a usage
+policy. ISOCHRONE_REFRESH_ENABLED runs the refresh loop in the app
+lifespan instead, for single-process setups.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass
+
+import numpy as np
+import requests
+
+from config.settings import settings
+from db import SessionLocal
+from db.models import Restaurant
+from services.jobs import job
+
+logger = logging.getLogger(__name__)
+
+METERS_PER_DEGREE_LAT = 111320.0
+OSRM_TABLE_URL = f"{settings.OSRM_URL}/table/v1/bike"
+TABLE_CHUNK_SIZE = 100  # destinations per OSRM table request
+
+DURATION = 0
+DISTANCE = 1
+
+
+@dataclass
+class GridMeta:
+    restaurant_id: int
+    latitude: float
+    longitude: float
+    origin_latitude: float
+    origin_longitude: float
+    lat_step: float
+    lng_step: float
+    size: int
+    computed_at: float
+    file: str
+
+
+class IsochroneGrid:
+    def __init__(self, meta: GridMeta, data: np.ndarray):
+        self.meta = meta
+        self.data = data
+
+    def covers_location(self, latitude: float, longitude: float) -> bool:
+        """Whether the grid was computed for a restaurant at this location"""
+        return math.isclose(self.meta.latitude, latitude, abs_tol=1e-6) and \
+            math.isclose(self.meta.longitude, longitude, abs_tol=1e-6)
+
+    def interpolate(self, latitude: float, longitude: float) -> tuple[float, float] | None:
+        """
+        Bilinear interpolation of (duration_seconds, distance_meters).
+        Returns None outside the grid or next to unreachable cells.
+        """
+        meta = self.meta
+        fy = (latitude - meta.origin_latitude) / meta.lat_step
+        fx = (longitude - meta.origin_longitude) / meta.lng_step
+        last = meta.size - 1
+        if not (0 <= fy <= last and 0 <= fx <= last):
+            return None
+
+        row = min(int(fy), last - 1)
+        col = min(int(fx), last - 1)
+        ty = fy - row
+        tx = fx - col
+
+        cells = self.data[:, row:row + 2, col:col + 2]
+        if np.isnan(cells).any():
+            return None
+
+        weights = np.array([[(1 - ty) * (1 - tx), (1 - ty) * tx],
+                            [ty * (1 - tx), ty * tx]], dtype=np.float64)
+        values = (cells * weights).sum(axis=(1, 2))
+        return float(values[DURATION]), float(values[DISTANCE])
+
+
+def grid_geometry(latitude: float, longitude: float, radius_km: float, cell_m: float) -> tuple[float, float, float, float, int]:
+    """Return (origin_latitude, origin_longitude, lat_step, lng_step, size) for a grid centered on a point"""
+    half = int(math.ceil(radius_km * 1000 / cell_m))
+    lat_step = cell_m / METERS_PER_DEGREE_LAT
+    lng_step = cell_m / (METERS_PER_DEGREE_LAT * max(math.cos(math.radians(latitude)), 0.01))
+    return latitude - half * lat_step, longitude - half * lng_step, lat_step, lng_step, 2 * half + 1
+
+
+def fetch_osrm_table(origin: tuple[float, float], destinations: list[tuple[float, float]]) -> tuple[list, list]:
+    """Durations (s) and distances (m) from one origin to many destinations; None when unreachable"""
+    durations = []
+    distances = []
+    for start in range(0, len(destinations), TABLE_CHUNK_SIZE):
+        chunk = destinations[start:start + TABLE_CHUNK_SIZE]
+        coordinates = ";".join(f"{lng},{lat}" for lat, lng in [origin, *chunk])
+        response = requests.get(
+            f"{OSRM_TABLE_URL}/{coordinates}",
+            params={
+                "sources": "0",
+                "destinations": ";".join(str(i) for i in range(1, len(chunk) + 1)),
+                "annotations": "duration,distance",
+            },
+            timeout=30.0,
+        )
+        response.raise_for_status()
+        data = response.json()
+        if data["code"] != "Ok":
+            raise ValueError(f"OSRM table error: {data.get('message', data['code'])}")
+        durations.extend(data["durations"][0])
+        distances.extend(data["distances"][0])
+    return durations, distances
+
+
+class IsochroneStore:
+    """Grid files on disk plus a cache of memory-mapped grids"""
+
+    def __init__(self, directory: str = settings.ISOCHRONE_DIR):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._grids: dict[int, tuple[float, IsochroneGrid]] = {}
+
+    def _meta_path(self, restaurant_id: int) -> str:
+        return os.path.join(self.directory, f"restaurant_{restaurant_id}.json")
+
+    def read_meta(self, restaurant_id: int) -> GridMeta | None:
+        try:
+            with open(self._meta_path(restaurant_id), encoding="utf-8") as f:
+                return GridMeta(**json.load(f))
+        except FileNotFoundError:
+            return None
+
+    def get(self, restaurant_id: int) -> IsochroneGrid | None:
+        try:
+            mtime = os.stat(self._meta_path(restaurant_id)).st_mtime
+        except FileNotFoundError:
+            return None
+
+        cached = self._grids.get(restaurant_id)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+
+        with self._lock:
+            meta = self.read_meta(restaurant_id)
+            if meta is None:
+                return None
+            try:
+                data = np.load(os.path.join(self.directory, meta.file), mmap_mode="r")
+            except OSError:
+                # Replaced by another process's save() in between; live routing answers meanwhile
+                return None
+            grid = IsochroneGrid(meta, data)
+            self._grids[restaurant_id] = (mtime, grid)
+            return grid
+
+    def lookup(self, restaurant_id: int, restaurant_latitude: float, restaurant_longitude: float,
+               latitude: float, longitude: float) -> tuple[float, float] | None:
+        """(duration_seconds, distance_meters) from the restaurant grid, or None to use live routing"""
+        grid = self.get(restaurant_id)
+        if grid is None or not grid.covers_location(restaurant_latitude, restaurant_longitude):
+            return None
+        return grid.interpolate(latitude, longitude)
+
+    def save(self, meta: GridMeta, data: np.ndarray) -> None:
+        """
+        Write the grid under a fresh file name, then atomically swap the metadata.
+        Workers that still map the previous array keep a valid view of it.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        previous = self.read_meta(meta.restaurant_id)
+
+        np.save(os.path.join(self.directory, meta.file), data.astype(np.float32))
+        meta_path = self._meta_path(meta.restaurant_id)
+        tmp_path = f"{meta_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(asdict(meta), f)
+        os.replace(tmp_path, meta_path)
+
+        if previous is not None and previous.file != meta.file:
+            try:
+                os.remove(os.path.join(self.directory, previous.file))
+            except FileNotFoundError:
+                pass
+
+    def build(self, restaurant_id: int, latitude: float, longitude: float, fetch_table=fetch_osrm_table) -> GridMeta:
+        origin_lat, origin_lng, lat_step, lng_step, size = grid_geometry(
+            latitude, longitude, settings.ISOCHRONE_RADIUS_KM, settings.ISOCHRONE_CELL_M
+        )
+        rows = origin_lat + lat_step * np.arange(size)
+        cols = origin_lng + lng_step * np.arange(size)
+        destinations = [(float(lat), float(lng)) for lat in rows for lng in cols]
+
+        durations, distances = fetch_table((latitude, longitude), destinations)
+        data = np.array([durations, distances], dtype=np.float64)  # None becomes NaN
+        data = data.reshape(2, size, size)
+
+        computed_at = time.time()
+        meta = GridMeta(
+            restaurant_id=restaurant_id,
+            latitude=latitude,
+            longitude=longitude,
+            origin_latitude=origin_lat,
+            origin_longitude=origin_lng,
+            lat_step=lat_step,
+            lng_step=lng_step,
+            size=size,
+            computed_at=computed_at,
+            file=f"restaurant_{restaurant_id}_{int(computed_at * 1000)}.npy",
+        )
+        self.save(meta, data)
+        return meta
+
+    def is_stale(self, restaurant_id: int, latitude: float, longitude: float) -> bool:
+        meta = self.read_meta(restaurant_id)
+        if meta is None:
+            return True
+        moved = not (math.isclose(meta.latitude, latitude, abs_tol=1e-6)
+                     and math.isclose(meta.longitude, longitude, abs_tol=1e-6))
+        too_old = time.time() - meta.computed_at > settings.ISOCHRONE_MAX_AGE_HOURS * 3600
+        return moved or too_old
+
+    def refresh(self, restaurant_ids: list[int] | None = None, force: bool = False, session_factory=SessionLocal) -> int:
+        """Rebuild missing or stale grids; returns the number of grids built"""
+        db = session_factory()
+        try:
+            query = db.query(Restaurant.id, Restaurant.latitude, Restaurant.longitude)
+            if restaurant_ids:
+                query = query.filter(Restaurant.id.in_(restaurant_ids))
+            restaurants = query.all()
+        finally:
+            db.close()
+
+        built = 0
+        for restaurant_id, latitude, longitude in restaurants:
+            if not force and not self.is_stale(restaurant_id, latitude, longitude):
+                continue
+            try:
+                self.build(restaurant_id, latitude, longitude)
+                built += 1
+            except (requests.RequestException, ValueError) as e:
+                logger.warning("Error building isochrone grid for restaurant %s: %s", restaurant_id, e)
+        return built
+
+    async def run(self, interval_seconds: float = settings.ISOCHRONE_REFRESH_SECONDS) -> None:
+        """Refresh loop, run as a background task from the app lifespan"""
+        while True:
+            try:
+                await asyncio.to_thread(self.refresh)
+            except Exception:
+                logger.exception("Error refreshing isochrone grids")
+            await asyncio.sleep(interval_seconds)
+
+
+# Create a global isochrone store
+isochrone_store = IsochroneStore()
+
+
+@job("isochrones.refresh", max_attempts=1, cron=settings.ISOCHRONE_REFRESH_CRON or None)
+def refresh_isochrones(payload: dict) -> None:
+    """Rebuild missing or stale grids, or those of payload["restaurant_ids"]"""
+    isochrone_store.refresh(payload.get("restaurant_ids"), force=payload.get("force", False))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build delivery-time grids for restaurants")
+    parser.add_argument("restaurant_ids", nargs="*", type=int, help="restaurants to build (default: all)")
+    parser.add_argument("--force", action="store_true", help="rebuild grids that are still fresh")
+    args = parser.parse_args()
+
+    count = isochrone_store.refresh(args.restaurant_ids or None, force=args.force)
+    print(f"Built {count} isochrone grid(s) in {isochrone_store.directory}")
@@ -0,0 +1,515 @@
+"""
+Background jobs.
+
+Jobs are rows of the `jobs` table, so they survive restarts and can be
+enqueued in the same transaction as the write that calls for them:
+
+    @job("ratings.recompute", max_attempts=3)
+    def recompute_ratings(payload: dict) -> None: ...
+
+    enqueue("ratings.recompute", {"menu_id": 42}, db=db)  # committed with db
+    enqueue("exports.orders", {"day": "2025-05-10"}, delay=60, priority=5)
+
+    @job("rollups.daily", cron="5 0 * * *")  # scheduled: minute hour day month weekday
+    def daily_rollup(payload: dict) -> None: ...
+
+A JobRunner claims due jobs in batches (highest priority first, SKIP
+LOCKED where the database supports it, so several runners never take the
+same job), runs them on a thread or process pool and records the results
+in bulk. Failed jobs are retried with exponential backoff and jitter up to
+their max_attempts. A claimed job holds a lease, which its runner extends
+while the job waits in the pool and runs: if the runner dies, the job runs
+again once the lease expires, so jobs must tolerate running more than once.
+Results are only recorded while the runner still holds the claim, so a
+runner that lost its lease cannot overwrite the state of the new run. Scheduled runs are deduplicated across runners by unique_key.
+
+The runner starts from the app lifespan (JOBS_ENABLED) or as its own
+process:
+
+    python -m services.jobs --workers 8 --executor process
+"""
+import argparse
+import asyncio
+import importlib
+import itertools
+import json
+import logging
+import os
+import queue
+import random
+import socket
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Callable
+
+from sqlalchemy import bindparam, delete, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from config.settings import settings
+from db import SessionLocal, engine
+from db.models import Job
+from utils.metrics import Histogram
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+MAX_ERROR_LENGTH = 2000
+MAINTENANCE_SECONDS = 5
+PURGE_BATCH_SIZE = 1000
+
+jobs = Job.__table__
+
+
+class CronSchedule:
+    """Five-field cron expression: minute hour day-of-month month day-of-week (0 = Sunday)"""
+
+    FIELDS = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 6))
+
+    def __init__(self, expression: str):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression needs 5 fields: {expression!r}")
+        self.expression = expression
+        self.minutes, self.hours, self.days, self.months, self.weekdays = (
+            self._parse(field, low, high) for field, (low, high) in zip(fields, self.FIELDS)
+        )
+        # Like cron, a restricted day of month and day of week match either one
+        self._either_day = fields[2] != "*" and fields[4] != "*"
+
+    @staticmethod
+    def _parse(field: str, low: int, high: int) -> frozenset[int]:
+        values = set()
+        for part in field.split(","):
+            span, _, step = part.partition("/")
+            if span == "*":
+                start, end = low, high
+            elif "-" in span:
+                start, end = (int(bound) for bound in span.split("-", 1))
+            else:
+                start = int(span)
+                end = high if step else start
+            values.update(range(start, end + 1, int(step) if step else 1))
+        if not values or min(values) < low or max(values) > high:
+            raise ValueError(f"Cron field {field!r} outside {low}-{high}")
+        return frozenset(values)
+
+    def _day_matches(self, moment: datetime) -> bool:
+        day = moment.day in self.days
+        weekday = (moment.weekday() + 1) % 7 in self.weekdays
+        return (day or weekday) if self._either_day else (day and weekday)
+
+    def next_after(self, moment: datetime) -> datetime:
+        """First matching minute strictly after `moment`"""
+        moment = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = moment + timedelta(days=366 * 5)
+        while moment < limit:
+            if moment.month not in self.months:
+                moment = (moment.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+            elif not self._day_matches(moment):
+                moment = moment.replace(hour=0, minute=0) + timedelta(days=1)
+            elif moment.hour not in self.hours:
+                moment = moment.replace(minute=0) + timedelta(hours=1)
+            elif moment.minute not in self.minutes:
+                moment += timedelta(minutes=1)
+            else:
+                return moment
+        raise ValueError(f"Cron expression never matches: {self.expression!r}")
+
+
+@dataclass(frozen=True)
+class JobDefinition:
+    name: str
+    func: Callable[[dict], Any]
+    max_attempts: int
+    priority: int
+
+
+registry: dict[str, JobDefinition] = {}
+# (schedule, job name) of the jobs declared with a cron expression
+schedules: list[tuple[CronSchedule, str]] = []
+
+
+def job(name: str, *, max_attempts: int = settings.JOB_MAX_ATTEMPTS, priority: int = 0, cron: str | None = None):
+    """Register a function taking the job payload dict; with `cron`, also run it on that schedule"""
+    def register(func):
+        registry[name] = JobDefinition(name, func, max_attempts, priority)
+        if cron is not None:
+            schedules.append((CronSchedule(cron), name))
+        return func
+    return register
+
+
+def _job_row(name: str, payload: dict | None = None, *, priority: int | None = None,
+             run_at: datetime | None = None, delay: float | None = None, max_attempts: int | None = None,
+             unique_key: str | None = None) -> dict:
+    definition = registry.get(name)
+    now = datetime.now()
+    if run_at is None:
+        run_at = now + timedelta(seconds=delay) if delay else now
+    return {
+        "name": name,
+        "payload_json": json.dumps(payload) if payload is not None else None,
+        "priority": priority if priority is not None else (definition.priority if definition else 0),
+        "status": QUEUED,
+        "attempts": 0,
+        "max_attempts": max_attempts or (definition.max_attempts if definition else settings.JOB_MAX_ATTEMPTS),
+        "run_at": run_at,
+        "unique_key": unique_key,
+        "created_at": now,
+    }
+
+
+def enqueue_many(specs: list[dict], db=None) -> None:
+    """
+    Insert jobs described by enqueue() keyword dicts ({"name": ..., "payload": ...}).
+    With `db` they are committed with the caller's transaction, otherwise right away.
+    """
+    if not specs:
+        return
+    rows = [_job_row(**spec) for spec in specs]
+    if db is not None:
+        db.execute(insert(jobs), rows)
+        return
+    with engine.begin() as connection:
+        connection.execute(insert(jobs), rows)
+    job_runner.wake()
+
+
+def enqueue(name: str, payload: dict | None = None, *, db=None, **options) -> None:
+    """
+    Queue one job. Options: priority (higher first), run_at or delay (seconds),
+    max_attempts and unique_key.
+    """
+    enqueue_many([{"name": name, "payload": payload, **options}], db=db)
+
+
+def _execute(func: Callable[[dict], Any], payload: dict) -> float:
+    # Module level so process pools can pickle it
+    started = time.perf_counter()
+    func(payload)
+    return time.perf_counter() - started
+
+
+def backoff_seconds(attempts: int) -> float:
+    delay = min(settings.JOB_BACKOFF_BASE_SECONDS * 2 ** (attempts - 1), settings.JOB_BACKOFF_MAX_SECONDS)
+    return delay * random.uniform(0.5, 1.5)
+
+
+class JobRunner:
+    def __init__(
+            self,
+            workers: int = settings.JOB_WORKERS,
+            executor_kind: str = settings.JOB_EXECUTOR,
+            batch_size: int = settings.JOB_BATCH_SIZE,
+            poll_seconds: float = settings.JOB_POLL_SECONDS,
+            lease_seconds: float = settings.JOB_LEASE_SECONDS,
+    ):
+        self.workers = workers
+        self.executor_kind = executor_kind
+        self.batch_size = batch_size
+        self.poll_seconds = poll_seconds
+        self.lease_seconds = lease_seconds
+        # Claim ahead so workers never wait on the database between jobs
+        self.capacity = max(batch_size, workers * 2)
+        self.worker_id = ""
+        self._executor = None
+        self._in_flight = 0
+        self._claims = itertools.count()
+        self._results: queue.SimpleQueue = queue.SimpleQueue()
+        self._wakeup = threading.Event()
+        self._next_maintenance = 0.0
+        self._next_heartbeat = 0.0
+        # Claim tokens of the jobs submitted and not recorded yet
+        self._held: Counter[str] = Counter()
+        self._next_runs: dict[str, datetime] = {}
+        self._lock = threading.Lock()
+
+        self.run_time = Histogram()
+        self.counters = {"claimed": 0, "succeeded": 0, "retried": 0, "failed": 0, "reclaimed": 0, "scheduled": 0}
+
+    def _count(self, name: str, value: int = 1) -> None:
+        with self._lock:
+            self.counters[name] += value
+
+    def wake(self) -> None:
+        """Look for due jobs now instead of at the next poll"""
+        self._wakeup.set()
+
+    def start(self) -> None:
+        for module in settings.JOB_MODULES:
+            importlib.import_module(module)
+        # Set here rather than in __init__ so forked workers get their own id
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        if self.executor_kind == "process":
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="job")
+
+    def claim(self, limit: int) -> list:
+        """Mark up to `limit` due jobs as running under a fresh claim token and return them"""
+        now = datetime.now()
+        token = f"{self.worker_id}:{next(self._claims)}"
+        query = (
+            select(jobs.c.id)
+            .where(jobs.c.status == QUEUED, jobs.c.run_at <= now)
+            .order_by(jobs.c.priority.desc(), jobs.c.run_at)
+            .limit(limit)
+        )
+        with engine.begin() as connection:
+            if connection.dialect.name in ("mysql", "mariadb", "postgresql"):
+                query = query.with_for_update(skip_locked=True)
+            ids = connection.scalars(query).all()
+            if not ids:
+                return []
+            # The status guard keeps a job from being claimed twice where SKIP LOCKED is unavailable
+            connection.execute(
+                update(jobs)
+                .where(jobs.c.id.in_(ids), jobs.c.status == QUEUED)
+                .values(status=RUNNING, locked_by=token, locked_until=now + timedelta(seconds=self.lease_seconds),
+                        attempts=jobs.c.attempts + 1)
+            )
+            claimed = connection.execute(
+                select(jobs.c.id, jobs.c.name, jobs.c.payload_json, jobs.c.attempts, jobs.c.max_attempts,
+                       jobs.c.locked_by)
+                .where(jobs.c.id.in_(ids), jobs.c.locked_by == token)
+                .order_by(jobs.c.priority.desc(), jobs.c.run_at)
+            ).all()
+        self._count("claimed", len(claimed))
+        return claimed
+
+    def _submit(self, row) -> None:
+        def done(future: Future) -> None:
+            error = future.exception()
+            if error is None:
+                self.run_time.observe(future.result())
+            self._results.put((row, error))
+            self._wakeup.set()
+
+        self._held[row.locked_by] += 1
+        definition = registry.get(row.name)
+        if definition is None:
+            self._results.put((row, LookupError(f"Unknown job {row.name!r}")))
+            return
+        payload = json.loads(row.payload_json) if row.payload_json else {}
+        self._executor.submit(_execute, definition.func, payload).add_done_callback(done)
+
+    def record_results(self, results: list) -> None:
+        """
+        Write the outcome of finished jobs: done, queued again after a backoff, or failed.
+        A job whose lease expired and was claimed again keeps the state of its new run.
+        """
+        now = datetime.now()
+        succeeded, retries, failures = [], [], []
+        for row, error in results:
+            claim = {"job_id": row.id, "token": row.locked_by}
+            if error is None:
+                succeeded.append(claim)
+                continue
+            message = f"{type(error).__name__}: {error}"[:MAX_ERROR_LENGTH]
+            if row.attempts < row.max_attempts:
+                retry_at = now + timedelta(seconds=backoff_seconds(row.attempts))
+                retries.append({**claim, "retry_at": retry_at, "error": message})
+            else:
+                failures.append({**claim, "error": message})
+                logger.error("Job %s (%d) failed after %d attempts: %s", row.name, row.id, row.attempts, message)
+
+        held = update(jobs).where(jobs.c.id == bindparam("job_id"), jobs.c.locked_by == bindparam("token"))
+        released = {"locked_by": None, "locked_until": None}
+        with engine.begin() as connection:
+            if succeeded:
+                connection.execute(held.values(status=SUCCEEDED, finished_at=now, **released), succeeded)
+            if retries:
+                connection.execute(
+                    held.values(status=QUEUED, run_at=bindparam("retry_at"), last_error=bindparam("error"), **released),
+                    retries,
+                )
+            if failures:
+                connection.execute(
+                    held.values(status=FAILED, finished_at=now, last_error=bindparam("error"), **released),
+                    failures,
+                )
+        self._count("succeeded", len(succeeded))
+        self._count("retried", len(retries))
+        self._count("failed", len(failures))
+
+    def extend_leases(self) -> None:
+        """Push back the lease of every job this runner holds, waiting in the pool or running"""
+        tokens = [token for token, count in self._held.items() if count]
+        if not tokens:
+            return
+        with engine.begin() as connection:
+            connection.execute(
+                update(jobs).where(jobs.c.locked_by.in_(tokens), jobs.c.status == RUNNING)
+                .values(locked_until=datetime.now() + timedelta(seconds=self.lease_seconds))
+            )
+
+    def reclaim_expired(self) -> None:
+        """Queue again the jobs whose runner died (lease expired); fail those out of attempts"""
+        now = datetime.now()
+        expired = (jobs.c.status == RUNNING, jobs.c.locked_until < now)
+        released = {"locked_by": None, "locked_until": None, "last_error": "Lease expired"}
+        with engine.begin() as connection:
+            reclaimed = connection.execute(
+                update(jobs).where(*expired, jobs.c.attempts < jobs.c.max_attempts)
+                .values(status=QUEUED, run_at=now, **released)
+            ).rowcount
+            connection.execute(
+                update(jobs).where(*expired, jobs.c.attempts >= jobs.c.max_attempts)
+                .values(status=FAILED, finished_at=now, **released)
+            )
+        if reclaimed:
+            logger.warning("Requeued %d job(s) whose lease expired", reclaimed)
+            self._count("reclaimed", reclaimed)
+
+    def schedule_due(self) -> None:
+        """Queue the scheduled runs that are due; the unique key drops runs another runner queued"""
+        now = datetime.now()
+        for schedule, name in schedules:
+            next_run = self._next_runs.get(name)
+            if next_run is None:
+                next_run = self._next_runs[name] = schedule.next_after(now)
+            if next_run > now:
+                continue
+            try:
+                with engine.begin() as connection:
+                    connection.execute(insert(jobs), [_job_row(
+                        name, run_at=next_run, unique_key=f"cron:{name}:{next_run:%Y%m%d%H%M}"
+                    )])
+                self._count("scheduled")
+            except IntegrityError:
+                pass
+            self._next_runs[name] = schedule.next_after(now)
+
+    def _maintain(self) -> None:
+        if self._in_flight and time.monotonic() >= self._next_heartbeat:
+            self._next_heartbeat = time.monotonic() + self.lease_seconds / 3
+            self.extend_leases()
+        if time.monotonic() < self._next_maintenance:
+            return
+        self._next_maintenance = time.monotonic() + MAINTENANCE_SECONDS
+        self.reclaim_expired()
+        self.schedule_due()
+
+    def _drain_results(self) -> int:
+        results = []
+        while True:
+            try:
+                results.append(self._results.get_nowait())
+            except queue.Empty:
+                break
+        if results:
+            self.record_results(results)
+            self._in_flight -= len(results)
+            for row, _ in results:
+                self._held[row.locked_by] -= 1
+                if not self._held[row.locked_by]:
+                    del self._held[row.locked_by]
+        return len(results)
+
+    def run_once(self) -> int:
+        """Record finished jobs, claim and submit due ones; returns how many of each"""
+        handled = self._drain_results()
+        free = self.capacity - self._in_flight
+        if free > 0:
+            claimed = self.claim(min(free, self.batch_size))
+            for row in claimed:
+                self._in_flight += 1
+                self._submit(row)
+            handled += len(claimed)
+        self._maintain()
+        return handled
+
+    def run_forever(self, stop: threading.Event) -> None:
+        self.start()
+        try:
+            while not stop.is_set():
+                try:
+                    busy = self.run_once()
+                except Exception:
+                    logger.exception("Error running jobs")
+                    busy = 0
+                if not busy:
+                    self._wakeup.wait(self.poll_seconds)
+                    self._wakeup.clear()
+        finally:
+            # Let running jobs finish and record them, so they are not run again after the lease
+            self._executor.shutdown(wait=True)
+            self._drain_results()
+
+    async def run(self) -> None:
+        """Runner loop on its own thread, run as a background task from the app lifespan"""
+        stop = threading.Event()
+        runner = asyncio.ensure_future(asyncio.to_thread(self.run_forever, stop))
+        try:
+            await asyncio.shield(runner)
+        finally:
+            stop.set()
+            self.wake()
+            await runner
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counters = dict(self.counters)
+        db = SessionLocal()
+        try:
+            by_status = dict(db.execute(select(jobs.c.status, func.count()).group_by(jobs.c.status)).all())
+        finally:
+            db.close()
+        return {
+            "worker_id": self.worker_id,
+            "executor": self.executor_kind,
+            "workers": self.workers,
+            "in_flight": self._in_flight,
+            "jobs": by_status,
+            "counters": counters,
+            "run_time_seconds": self.run_time.snapshot(),
+        }
+
+
+# Create a global job runner
+job_runner = JobRunner()
+
+
+@job("jobs.purge", cron="*/15 * * * *")
+def purge_finished_jobs(payload: dict) -> None:
+    """Delete succeeded and failed jobs older than JOB_RETENTION_HOURS, in batches"""
+    cutoff = datetime.now() - timedelta(hours=settings.JOB_RETENTION_HOURS)
+    while True:
+        with engine.begin() as connection:
+            ids = connection.scalars(
+                select(jobs.c.id).where(jobs.c.status.in_((SUCCEEDED, FAILED)), jobs.c.finished_at < cutoff)
+                .limit(PURGE_BATCH_SIZE)
+            ).all()
+            if ids:
+                connection.execute(delete(jobs).where(jobs.c.id.in_(ids)))
+        if len(ids) < PURGE_BATCH_SIZE:
+            return
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run background jobs outside the web workers")
+    parser.add_argument("--workers", type=int, default=settings.JOB_WORKERS)
+    parser.add_argument("--executor", choices=("thread", "process"), default=settings.JOB_EXECUTOR)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    runner = JobRunner(workers=args.workers, executor_kind=args.executor)
+    stop = threading.Event()
+    logger.info("Running jobs with %d %s worker(s)", args.workers, args.executor)
+    try:
+        runner.run_forever(stop)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""
+Application metrics exported at /metrics.
+
+HTTP metrics are updated by MetricsMiddleware; the other subsystems keep
+their own counters and histograms, read by collectors at scrape time.
+"""
+import asyncio
+import logging
+
+from sqlalchemy.pool import QueuePool
+
+from config.settings import settings
+from db.instrumentation import route_sql_stats
+from db.pool import engines, pool_stats
+from middleware.compression import compression_stats
+from middleware.rate_limit import rejected_requests
+from services.hashing import password_hasher
+from services.jobs import job_runner
+from services.outbox import outbox_relay
+from services.routing import CircuitBreaker, routing_client
+from utils.cache import caches
+from utils.deadline import deadline_overruns
+from utils.log import dropped_records
+from utils.metrics import MetricsRegistry, histogram_value
+
+logger = logging.getLogger(__name__)
+
+registry = MetricsRegistry(settings.METRICS_MULTIPROC_DIR)
+
+http_requests = registry.counter(
+    "http_requests_total", "HTTP requests by route template and status", ("method", "route", "status")
+)
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency", ("method", "route")
+)
+http_in_flight = registry.gauge(
+    "http_requests_in_flight", "HTTP requests being served", ("method", "route")
+)
+
+
+def _family(name: str, type: str, help: str, samples: list) -> dict:
+    return {"name": name, "type": type, "help": help, "samples": samples}
+
+
+def collect_db_pools() -> list[dict]:
+    in_use, idle, overflow, waits, counters = [], [], [], [], {}
+    for name, engine in list(engines.items()):
+        labels = [["pool", name]]
+        if isinstance(engine.pool, QueuePool):
+            in_use.append([labels, engine.pool.checkedout()])
+            idle.append([labels, engine.pool.checkedin()])
+            overflow.append([labels, max(engine.pool.overflow(), 0)])
+        stats = pool_stats.get(name)
+        if stats is not None:
+            waits.append([labels, histogram_value(stats.checkout_wait)])
+            for counter, value in stats.snapshot()["counters"].items():
+                counters.setdefault(counter, []).append([labels, value])
+    return [
+        _family("db_pool_connections_in_use", "gauge", "Connections checked out of the pool", in_use),
+        _family("db_pool_connections_idle", "gauge", "Idle connections in the pool", idle),
+        _family("db_pool_overflow", "gauge", "Connections open beyond the pool size", overflow),
+        _family("db_pool_checkout_wait_seconds", "histogram", "Time waited to check out a connection", waits),
+        *(
+            _family(f"db_pool_{counter}_total", "counter", f"Pool {counter}", samples)
+            for counter, samples in counters.items()
+        ),
+    ]
+
+
+def collect_caches() -> list[dict]:
+    hits, misses, sizes = [], [], []
+    for name, cache in list(caches.items()):
+        stats = cache.stats()
+        hits.append([[["cache", name]], stats["hits"]])
+        misses.append([[["cache", name]], stats["misses"]])
+        sizes.append([[["cache", name]], stats["size"]])
+    return [
+        _family("cache_hits_total", "counter", "Cache hits", hits),
+        _family("cache_misses_total", "counter", "Cache misses", misses),
+        _family("cache_entries", "gauge", "Entries held by the cache", sizes),
+    ]
+
+
+def collect_routing() -> list[dict]:
+    snapshot = routing_client.snapshot()
+    return [
+        _family("routing_request_duration_seconds", "histogram", "Latency of calls to the routing provider",
+                [[[], histogram_value(routing_client.latency)]]),
+        _family("routing_events_total", "counter", "Routing client events",
+                [[[["event", name]], value] for name, value in snapshot["counters"].items()]),
+        _family("routing_breaker_open", "gauge", "1 while the routing circuit breaker is not closed",
+                [[[], int(routing_client.breaker.state != CircuitBreaker.CLOSED)]]),
+    ]
+
+
+def collect_password_hashing() -> list[dict]:
+    return [
+        _family("password_hash_total", "counter", "Password hashing events in this worker",
+                [[[["event", name]], value] for name, value in password_hasher.snapshot()["counters"].items()]),
+        _family("password_hash_wait_seconds", "histogram", "Queue wait before a hashing slot",
+                [[[], histogram_value(password_hasher.wait_time)]]),
+        _family("password_hash_run_seconds", "histogram", "Password hashing time",
+                [[[], histogram_value(password_hasher.run_time)]]),
+    ]
+
+
+def collect_jobs() -> list[dict]:
+    return [
+        _family("jobs_total", "counter", "Background job events in this worker",
+                [[[["event", name]], value] for name, value in list(job_runner.counters.items())]),
+        _family("job_run_seconds", "histogram", "Background job run time", [[[], histogram_value(job_runner.run_time)]]),
+    ]
+
+
+def collect_outbox() -> list[dict]:
+    return [
+        _family("outbox_events_total", "counter", "Outbox relay events in this worker",
+                [[[["event", name]], value] for name, value in list(outbox_relay.counters.items())]),
+    ]
+
+
+def collect_rate_limits() -> list[dict]:
+    return [
+        _family("rate_limit_rejected_total", "counter", "Requests rejected by rate limiting",
+                [[[["rule", rule]], count] for rule, count in list(rejected_requests.items())]),
+    ]
+
+
+def collect_compression() -> list[dict]:
+    responses, bytes_in, bytes_out = [], [], []
+    for encoding, (count, before, after) in list(compression_stats.items()):
+        labels = [["encoding", encoding]]
+        responses.append([labels, count])
+        bytes_in.append([labels, before])
+        bytes_out.append([labels, after])
+    return [
+        _family("http_compressed_responses_total", "counter", "Responses compressed by the middleware", responses),
+        _family("http_compression_input_bytes_total", "counter", "Response bytes before compression", bytes_in),
+        _family("http_compression_output_bytes_total", "counter", "Response bytes after compression", bytes_out),
+    ]
+
+
+def collect_deadlines() -> list[dict]:
+    return [
+        _family("request_deadline_overruns_total", "counter", "Requests that ran into their deadline, by stage",
+                [[[["route", route], ["kind", kind]], count] for (route, kind), count in list(deadline_overruns.items())]),
+    ]
+
+
+def collect_logging() -> list[dict]:
+    return [
+        _family("log_records_dropped_total", "counter", "Log records dropped because the logging queue was full",
+                [[[], dropped_records["count"]]]),
+    ]
+
+
+def collect_sql() -> list[dict]:
+    statements, seconds = [], []
+    for route, aggregate in list(route_sql_stats.items()):
+        statements.append([[["route", route]], aggregate.statements])
+        seconds.append([[["route", route]], aggregate.db_seconds])
+    return [
+        _family("db_statements_total", "counter", "SQL statements run by route", statements),
+        _family("db_time_seconds_total", "counter", "Database time spent by route", seconds),
+    ]
+
+
+for _collector in (collect_db_pools, collect_caches, collect_routing, collect_password_hashing, collect_jobs,
+                   collect_outbox, collect_rate_limits, collect_compression, collect_deadlines, collect_logging,
+                   collect_sql):
+    registry.register_collector(_collector)
+
+
+async def run() -> None:
+    """Publish this worker's metrics for aggregation across workers"""
+    try:
+        while True:
+            await asyncio.sleep(settings.METRICS_FLUSH_SECONDS)
+            try:
+                await asyncio.to_thread(registry.write)
+            except Exception:
+                logger.exception("Error writing metrics")
+    finally:
+        registry.write()
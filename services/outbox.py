@@ -0,0 +1,399 @@
+"""
+Transactional outbox and domain events.
+
+Writers record what changed as rows of the `outbox_events` table, in the
+same transaction as the change itself, so an event exists if and only if
+its write was committed:
+
+    db.add(order)
+    db.flush()
+    record_event(db, "order.created", {"order_id": order.id}, key=order.id)
+    db.commit()
+
+An OutboxRelay reads the events in id order, in batches, and hands them to
+the consumers declared with @subscribe:
+
+    @subscribe("comment.*")
+    def refresh_ratings(events: list[Event]) -> None: ...
+
+    @subscribe("menu.*", durable=False)
+    def drop_local_cache(events: list[Event]) -> None: ...
+
+A durable consumer runs once per deployment: its offset (last event id
+handled) is a row of `consumer_offsets`, locked while a worker delivers to
+it. A local consumer (durable=False) runs in every worker, from the events
+written after the worker started, with its offset in memory. Offsets move
+only after the handler returns, so delivery is at least once: a handler
+that fails gets the same events again after a backoff, and handlers must
+tolerate seeing an event twice. Events also go to the broker configured by
+OUTBOX_BROKER, as a durable consumer of every topic.
+
+Event ids are assigned at insert time but become visible at commit, so a
+gap in the ids may be a transaction still committing: consumers stop
+before a gap until it is older than OUTBOX_GAP_SECONDS.
+"""
+import asyncio
+import importlib
+import json
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import defaultdict, deque
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from fnmatch import fnmatchcase
+from typing import Any, Callable
+
+from sqlalchemy import bindparam, delete, event, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from config.settings import settings
+from db import engine
+from db.models import ConsumerOffset, OutboxEvent
+from services.jobs import job
+
+logger = logging.getLogger(__name__)
+
+PURGE_BATCH_SIZE = 1000
+# Events kept by the local broker for inspection
+LOCAL_BROKER_HISTORY = 10000
+
+outbox_events = OutboxEvent.__table__
+consumer_offsets = ConsumerOffset.__table__
+
+
+@dataclass(frozen=True)
+class Event:
+    id: int
+    topic: str
+    key: str | None
+    payload: dict
+    created_at: datetime
+
+
+def record_event(db, topic: str, payload: dict, key: Any = None) -> None:
+    """Add an event to the caller's session; it is written and published only if the session commits"""
+    db.add(OutboxEvent(topic=topic, key=str(key) if key is not None else None,
+                       payload_json=json.dumps(payload, default=str)))
+    db.info["outbox_events"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _wake_relay(session):
+    if session.info.pop("outbox_events", False):
+        outbox_relay.wake()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_events(session):
+    session.info.pop("outbox_events", None)
+
+
+class Broker(ABC):
+    """Message broker the relay publishes every event to; subclass it to bridge to Kafka, NATS..."""
+
+    @abstractmethod
+    def publish(self, events: list[Event]) -> None:
+        """Publish a batch; raising makes the relay retry the whole batch later"""
+
+    def close(self) -> None:
+        pass
+
+
+class LocalBroker(Broker):
+    """In-process stand-in for tests and development: keeps recent events and calls its listeners"""
+
+    def __init__(self, history: int = LOCAL_BROKER_HISTORY):
+        self.published: deque[Event] = deque(maxlen=history)
+        self._listeners: list[Callable[[list[Event]], None]] = []
+        self._lock = threading.Lock()
+
+    def listen(self, listener: Callable[[list[Event]], None]) -> None:
+        self._listeners.append(listener)
+
+    def publish(self, events: list[Event]) -> None:
+        with self._lock:
+            self.published.extend(events)
+        for listener in self._listeners:
+            listener(events)
+
+    def events(self, topic: str | None = None) -> list[Event]:
+        with self._lock:
+            return [e for e in self.published if topic is None or fnmatchcase(e.topic, topic)]
+
+
+def create_broker(spec: str = settings.OUTBOX_BROKER) -> Broker | None:
+    """Broker named by OUTBOX_BROKER: "", "local" or "module:Class" (built without arguments)"""
+    if not spec:
+        return None
+    if spec == "local":
+        return LocalBroker()
+    module, _, name = spec.partition(":")
+    return getattr(importlib.import_module(module), name)()
+
+
+@dataclass
+class Consumer:
+    name: str
+    handler: Callable[[list[Event]], Any]
+    # Topic patterns ("menu.*"); empty matches every topic
+    topics: tuple[str, ...]
+    durable: bool
+    # Local consumers only; durable offsets live in consumer_offsets
+    offset: int = 0
+    failures: int = 0
+    retry_at: float = 0.0
+    delivered: int = 0
+
+    def matches(self, topic: str) -> bool:
+        return not self.topics or any(fnmatchcase(topic, pattern) for pattern in self.topics)
+
+
+consumers: dict[str, Consumer] = {}
+
+
+def subscribe(*topics: str, name: str | None = None, durable: bool = True):
+    """Register a function taking a list of events of the given topic patterns (all topics if none)"""
+    def register(func):
+        consumer_name = name or f"{func.__module__}.{func.__qualname__}"
+        consumers[consumer_name] = Consumer(consumer_name, func, topics, durable)
+        return func
+    return register
+
+
+def _to_event(row) -> Event:
+    return Event(row.id, row.topic, row.key, json.loads(row.payload_json), row.created_at)
+
+
+def _retry_seconds(failures: int) -> float:
+    return min(2 ** (failures - 1), settings.OUTBOX_RETRY_MAX_SECONDS)
+
+
+class OutboxRelay:
+    def __init__(
+            self,
+            batch_size: int = settings.OUTBOX_BATCH_SIZE,
+            poll_seconds: float = settings.OUTBOX_POLL_SECONDS,
+            gap_seconds: float = settings.OUTBOX_GAP_SECONDS,
+    ):
+        self.batch_size = batch_size
+        self.poll_seconds = poll_seconds
+        self.gap_seconds = gap_seconds
+        self.broker: Broker | None = None
+        self._wakeup = threading.Event()
+        # First id of each gap in the event ids -> when the relay first saw it
+        self._gaps: dict[int, float] = {}
+        self._lock = threading.Lock()
+
+        self.counters = {"read": 0, "delivered": 0, "failed": 0}
+
+    def _count(self, name: str, value: int = 1) -> None:
+        with self._lock:
+            self.counters[name] += value
+
+    def wake(self) -> None:
+        """Deliver committed events now instead of at the next poll"""
+        self._wakeup.set()
+
+    def start(self) -> None:
+        for module in settings.JOB_MODULES:
+            importlib.import_module(module)
+        self.broker = create_broker()
+        if self.broker is not None:
+            consumers["broker"] = Consumer("broker", self.broker.publish, (), durable=True)
+
+        with engine.connect() as connection:
+            latest = connection.scalar(select(func.max(outbox_events.c.id))) or 0
+        # Local consumers only see the events written from now on
+        for consumer in consumers.values():
+            if not consumer.durable:
+                consumer.offset = latest
+        self._add_offsets([c.name for c in consumers.values() if c.durable], latest)
+
+    @staticmethod
+    def _add_offsets(names: list[str], start: int) -> None:
+        """Create the offset rows of new durable consumers, starting after the existing events"""
+        with engine.begin() as connection:
+            known = set(connection.scalars(
+                select(consumer_offsets.c.consumer).where(consumer_offsets.c.consumer.in_(names))
+            ))
+        for consumer in names:
+            if consumer in known:
+                continue
+            try:
+                with engine.begin() as connection:
+                    connection.execute(insert(consumer_offsets).values(
+                        consumer=consumer, last_event_id=start, updated_at=datetime.now()
+                    ))
+            except IntegrityError:
+                pass  # added by another worker
+
+    @staticmethod
+    def _lock_offsets(connection, names: list[str]) -> dict[str, int]:
+        """Offsets of the durable consumers no other worker is delivering to, locked until commit"""
+        if not names:
+            return {}
+        query = select(consumer_offsets.c.consumer, consumer_offsets.c.last_event_id).where(
+            consumer_offsets.c.consumer.in_(names)
+        )
+        if connection.dialect.name in ("mysql", "mariadb", "postgresql"):
+            query = query.with_for_update(skip_locked=True)
+        return dict(connection.execute(query).all())
+
+    def fetch(self, connection, offset: int) -> list[Event]:
+        rows = connection.execute(
+            select(outbox_events).where(outbox_events.c.id > offset)
+            .order_by(outbox_events.c.id).limit(self.batch_size)
+        ).all()
+        return self._until_gap([_to_event(row) for row in rows], offset)
+
+    def _until_gap(self, events: list[Event], offset: int) -> list[Event]:
+        """Events up to the first gap in ids that may still be filled by a committing transaction"""
+        now = time.monotonic()
+        expected = offset + 1
+        for index, e in enumerate(events):
+            if e.id != expected:
+                first_seen = self._gaps.setdefault(expected, now)
+                if now - first_seen < self.gap_seconds:
+                    return events[:index]
+                # A rolled back transaction, or one that took too long: the ids will not show up
+            expected = e.id + 1
+        return events
+
+    def _deliver(self, consumer: Consumer, events: list[Event]) -> bool:
+        selected = [e for e in events if consumer.matches(e.topic)]
+        try:
+            if selected:
+                consumer.handler(selected)
+        except Exception:
+            consumer.failures += 1
+            consumer.retry_at = time.monotonic() + _retry_seconds(consumer.failures)
+            logger.exception("Outbox consumer %s failed on events %d-%d (attempt %d)",
+                             consumer.name, events[0].id, events[-1].id, consumer.failures)
+            self._count("failed")
+            return False
+        consumer.failures = 0
+        consumer.delivered += len(selected)
+        self._count("delivered", len(selected))
+        return True
+
+    def relay_once(self) -> int:
+        """Deliver the next batch to every consumer that is not backing off; returns the events read"""
+        now = time.monotonic()
+        due = [consumer for consumer in list(consumers.values()) if consumer.retry_at <= now]
+        if not due:
+            return 0
+
+        read = 0
+        with engine.begin() as connection:
+            offsets = self._lock_offsets(connection, [c.name for c in due if c.durable])
+            offsets.update({c.name: c.offset for c in due if not c.durable})
+            # Consumers that are caught up share one query
+            groups = defaultdict(list)
+            for name, offset in offsets.items():
+                groups[offset].append(consumers[name])
+
+            moved = []
+            for offset, group in sorted(groups.items()):
+                events = self.fetch(connection, offset)
+                if not events:
+                    continue
+                read = max(read, len(events))
+                for consumer in group:
+                    if not self._deliver(consumer, events):
+                        continue
+                    if consumer.durable:
+                        moved.append({"name": consumer.name, "offset": events[-1].id})
+                    else:
+                        consumer.offset = events[-1].id
+            # Written last, so the transaction does not hold write locks while handlers run
+            if moved:
+                connection.execute(
+                    update(consumer_offsets).where(consumer_offsets.c.consumer == bindparam("name"))
+                    .values(last_event_id=bindparam("offset"), updated_at=datetime.now()),
+                    moved,
+                )
+
+        if offsets:
+            low = min(offsets.values())
+            self._gaps = {start: seen for start, seen in self._gaps.items() if start > low}
+        self._count("read", read)
+        return read
+
+    def run_forever(self, stop: threading.Event) -> None:
+        self.start()
+        try:
+            while not stop.is_set():
+                try:
+                    read = self.relay_once()
+                except Exception:
+                    logger.exception("Error relaying outbox events")
+                    read = 0
+                if read < self.batch_size:
+                    self._wakeup.wait(self.poll_seconds)
+                    self._wakeup.clear()
+        finally:
+            if self.broker is not None:
+                self.broker.close()
+
+    async def run(self) -> None:
+        """Relay loop on its own thread, run as a background task from the app lifespan"""
+        stop = threading.Event()
+        relay = asyncio.ensure_future(asyncio.to_thread(self.run_forever, stop))
+        try:
+            await asyncio.shield(relay)
+        finally:
+            stop.set()
+            self.wake()
+            await relay
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counters = dict(self.counters)
+        with engine.connect() as connection:
+            latest = connection.scalar(select(func.max(outbox_events.c.id))) or 0
+            durable = dict(connection.execute(
+                select(consumer_offsets.c.consumer, consumer_offsets.c.last_event_id)
+            ).all())
+        return {
+            "latest_event_id": latest,
+            "broker": type(self.broker).__name__ if self.broker is not None else None,
+            "consumers": {
+                consumer.name: {
+                    "durable": consumer.durable,
+                    "topics": list(consumer.topics),
+                    "lag": latest - (durable.get(consumer.name, 0) if consumer.durable else consumer.offset),
+                    "failures": consumer.failures,
+                    "delivered": consumer.delivered,
+                }
+                for consumer in list(consumers.values())
+            },
+            "counters": counters,
+        }
+
+
+# Create a global outbox relay
+outbox_relay = OutboxRelay()
+
+
+@job("outbox.purge", cron="20 * * * *")
+def purge_delivered_events(payload: dict) -> None:
+    """Delete events older than OUTBOX_RETENTION_HOURS that every durable consumer has handled"""
+    cutoff = datetime.now() - timedelta(hours=settings.OUTBOX_RETENTION_HOURS)
+    with engine.connect() as connection:
+        handled = connection.scalar(select(func.min(consumer_offsets.c.last_event_id)))
+    if handled is None:
+        handled = 2 ** 31  # no durable consumer: only the age counts
+    while True:
+        with engine.begin() as connection:
+            ids = connection.scalars(
+                select(outbox_events.c.id)
+                .where(outbox_events.c.id <= handled, outbox_events.c.created_at < cutoff)
+                .order_by(outbox_events.c.id).limit(PURGE_BATCH_SIZE)
+            ).all()
+            if ids:
+                connection.execute(delete(outbox_events).where(outbox_events.c.id.in_(ids)))
+        if len(ids) < PURGE_BATCH_SIZE:
+            return
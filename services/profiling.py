@@ -0,0 +1,274 @@
+"""
+On-demand profiling of a live worker.
+
+A sampling profiler reads every thread's stack with sys._current_frames()
+at a fixed interval and counts them as collapsed stacks (one
+"thread;outer;...;inner count" line per distinct stack), ready for
+flamegraph.pl or speedscope. Threads blocked in an idle wait (event loop
+select, empty worker queues) are left out. tracemalloc snapshots diffed
+against a baseline show where memory grows.
+
+Profiles are triggered by the admin endpoints in routes.profiling, by
+sending PROFILING_SIGNAL to a worker, or for a single request with a
+signed X-Profile header (see middleware.profiling). Nothing is installed
+and no thread runs unless PROFILING_ENABLED is set and a profile is
+requested. Tokens are minted with:
+
+    python -m services.profiling token --ttl 300 [--admin]
+"""
+import argparse
+import functools
+import hashlib
+import hmac
+import logging
+import os
+import signal
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import Counter, OrderedDict
+
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# (file name, function) of leaf frames where a thread waits for work
+IDLE_LEAVES = {
+    ("threading.py", "wait"),
+    ("selectors.py", "select"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+    ("core.py", "_connection_worker_thread"),  # aiosqlite
+    ("profiling.py", "profile_for"),  # the thread waiting for its own profile
+}
+RECENT_PROFILES = 20
+
+
+def sign(purpose: str, expires: int) -> str:
+    message = f"{purpose}:{expires}".encode()
+    return hmac.new(settings.SECRET_KEY.encode(), message, hashlib.sha256).hexdigest()
+
+
+def create_token(purpose: str, ttl: int) -> str:
+    """Token for `purpose` ("request" or "admin") valid for `ttl` seconds"""
+    expires = int(time.time()) + ttl
+    return f"{expires}.{sign(purpose, expires)}"
+
+
+def verify_token(token: str, purpose: str) -> bool:
+    expires, _, signature = token.partition(".")
+    if not expires.isdigit() or int(expires) < time.time():
+        return False
+    return hmac.compare_digest(signature, sign(purpose, int(expires)))
+
+
+@functools.lru_cache(maxsize=8192)
+def _frame_label(code) -> str:
+    path = code.co_filename
+    if path.startswith(PROJECT_DIR):
+        path = os.path.relpath(path, PROJECT_DIR)
+    else:
+        path = os.path.basename(path)
+    return f"{code.co_name} ({path}:{code.co_firstlineno})"
+
+
+def _is_idle(frame) -> bool:
+    code = frame.f_code
+    return (os.path.basename(code.co_filename), code.co_name) in IDLE_LEAVES
+
+
+class SamplingProfiler:
+    def __init__(self, interval: float = settings.PROFILING_INTERVAL_SECONDS, include_idle: bool = False):
+        self.interval = interval
+        self.include_idle = include_idle
+        self.stacks: Counter[str] = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def _sample(self) -> None:
+        own = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own or (not self.include_idle and _is_idle(frame)):
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            stack.append(names.get(ident, str(ident)))
+            self.stacks[";".join(reversed(stack))] += 1
+        self.samples += 1
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "SamplingProfiler":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+# One long-running profile at a time per worker
+profile_lock = threading.Lock()
+
+
+def profile_for(seconds: float, interval: float = settings.PROFILING_INTERVAL_SECONDS) -> str:
+    """Collapsed stacks of all busy threads over the next `seconds`"""
+    with SamplingProfiler(interval) as profiler:
+        time.sleep(seconds)
+    return profiler.collapsed()
+
+
+class MemoryTracker:
+    """tracemalloc snapshots compared to a baseline taken at start()"""
+
+    def __init__(self):
+        self._baseline: tracemalloc.Snapshot | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def tracing(self) -> bool:
+        return self._baseline is not None
+
+    @staticmethod
+    def _snapshot() -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+
+    def start(self, frames: int = settings.PROFILING_TRACEMALLOC_FRAMES) -> None:
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(frames)
+            self._baseline = self._snapshot()
+
+    def diff(self, limit: int = 25, key_type: str = "lineno", reset: bool = False) -> list[dict]:
+        """Largest allocation changes since the baseline (or the last reset)"""
+        with self._lock:
+            if self._baseline is None:
+                raise RuntimeError("Memory tracking is not started")
+            snapshot = self._snapshot()
+            stats = snapshot.compare_to(self._baseline, key_type)
+            if reset:
+                self._baseline = snapshot
+        return [
+            {
+                "location": [f"{frame.filename}:{frame.lineno}" for frame in stat.traceback],
+                "size_diff": stat.size_diff,
+                "size": stat.size,
+                "count_diff": stat.count_diff,
+                "count": stat.count,
+            }
+            for stat in stats[:limit]
+        ]
+
+    def stop(self) -> None:
+        with self._lock:
+            self._baseline = None
+            tracemalloc.stop()
+
+
+memory_tracker = MemoryTracker()
+
+
+class ProfileStore:
+    """Last collapsed profiles of this worker, by id"""
+
+    def __init__(self, maxsize: int = RECENT_PROFILES):
+        self.maxsize = maxsize
+        self._profiles: OrderedDict[str, str] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, profile_id: str, collapsed: str) -> None:
+        with self._lock:
+            self._profiles[profile_id] = collapsed
+            while len(self._profiles) > self.maxsize:
+                self._profiles.popitem(last=False)
+
+    def get(self, profile_id: str) -> str | None:
+        with self._lock:
+            return self._profiles.get(profile_id)
+
+    def ids(self) -> list[str]:
+        with self._lock:
+            return list(self._profiles)
+
+
+profile_store = ProfileStore()
+
+
+def _profile_to_file(seconds: float) -> None:
+    if not profile_lock.acquire(blocking=False):
+        logger.warning("Profiling signal ignored: a profile is already running")
+        return
+    try:
+        collapsed = profile_for(seconds)
+    finally:
+        profile_lock.release()
+
+    output_dir = settings.PROFILING_OUTPUT_DIR or tempfile.gettempdir()
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    path = os.path.join(output_dir, f"profile-{os.getpid()}-{stamp}.collapsed")
+    with open(path, "w") as file:
+        file.write(collapsed)
+    profile_store.add(f"signal-{stamp}", collapsed)
+    logger.warning("Wrote %gs profile of worker %d to %s", seconds, os.getpid(), path)
+
+    if memory_tracker.tracing:
+        path = os.path.join(output_dir, f"memory-{os.getpid()}-{stamp}.txt")
+        with open(path, "w") as file:
+            for stat in memory_tracker.diff():
+                file.write(f"{stat['size_diff']:+d} B {stat['count_diff']:+d} blocks {stat['location'][0]}\n")
+        logger.warning("Wrote memory growth of worker %d to %s", os.getpid(), path)
+
+
+def install_signal_handler() -> None:
+    """Profile for PROFILING_SIGNAL_SECONDS when the worker receives PROFILING_SIGNAL"""
+    if not settings.PROFILING_SIGNAL:
+        return
+
+    def handle(signum, frame):
+        threading.Thread(
+            target=_profile_to_file, args=(settings.PROFILING_SIGNAL_SECONDS,), name="profile-signal", daemon=True
+        ).start()
+
+    try:
+        signal.signal(getattr(signal, settings.PROFILING_SIGNAL), handle)
+    except (AttributeError, ValueError) as e:
+        # Unknown signal on this platform, or not running in the main thread
+        logger.warning("Profiling signal %s not installed: %s", settings.PROFILING_SIGNAL, e)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Mint profiling tokens signed with SECRET_KEY")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    token = subparsers.add_parser("token", help="print a token for the X-Profile or X-Profile-Token header")
+    token.add_argument("--ttl", type=int, default=300, help="validity in seconds")
+    token.add_argument("--admin", action="store_true", help="token for the /debug endpoints")
+    args = parser.parse_args()
+
+    print(create_token("admin" if args.admin else "request", args.ttl))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Readiness of this worker to take traffic, for orchestrator probes.
+
+The checks (database reachable, primary pool not saturated, migration
+revision at the scripts' head, routing breaker state) run at most once per
+READINESS_CACHE_SECONDS per worker; probes in between get the cached
+result, so probing adds no database load. An open routing breaker is
+reported but does not fail readiness: estimates still answer and every
+worker shares the provider, so failing would empty the whole service.
+"""
+import functools
+import threading
+import time
+
+from sqlalchemy import text
+from sqlalchemy.pool import QueuePool
+
+from config.settings import settings
+from db import engine, migrate
+from services.routing import CircuitBreaker, routing_client
+
+
+@functools.cache
+def script_heads() -> frozenset[str]:
+    # Scripts do not change while the process runs
+    return frozenset(migrate.script_heads())
+
+
+def check_pool() -> dict:
+    pool = engine.pool
+    if not isinstance(pool, QueuePool):
+        return {"ok": True}
+    capacity = pool.size() + max(settings.DB_MAX_OVERFLOW, 0)
+    in_use = pool.checkedout()
+    return {
+        "ok": capacity <= 0 or in_use / capacity < settings.READINESS_POOL_SATURATION,
+        "in_use": in_use,
+        "capacity": capacity,
+    }
+
+
+def check_database() -> tuple[dict, dict]:
+    """Reachability and migration revision, on a single connection"""
+    try:
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+            current = migrate.database_heads(connection)
+    except Exception as e:
+        return {"ok": False, "error": str(e)}, {"ok": False}
+
+    heads = script_heads()
+    migrations = {
+        "ok": current == heads or not settings.READINESS_CHECK_MIGRATIONS,
+        "database": sorted(current),
+        "head": sorted(heads),
+    }
+    return {"ok": True}, migrations
+
+
+def check_routing() -> dict:
+    state = routing_client.breaker.state
+    return {"ok": True, "breaker": state, "degraded": state != CircuitBreaker.CLOSED}
+
+
+class Readiness:
+    def __init__(self, cache_seconds: float = settings.READINESS_CACHE_SECONDS):
+        self.cache_seconds = cache_seconds
+        self._result: tuple[bool, dict] | None = None
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+
+    def _run_checks(self) -> tuple[bool, dict]:
+        # Pool first: the database check holds a connection itself, and would
+        # wait up to the pool timeout for one while every caller queues on the lock
+        checks = {"pool": check_pool()}
+        if checks["pool"]["ok"]:
+            checks["database"], checks["migrations"] = check_database()
+        else:
+            skipped = {"ok": False, "skipped": "pool saturated"}
+            checks["database"], checks["migrations"] = skipped, dict(skipped)
+        checks["routing"] = check_routing()
+        ready = all(check["ok"] for check in checks.values())
+        return ready, {"status": "ready" if ready else "not ready", "checks": checks}
+
+    def result(self) -> tuple[bool, dict]:
+        """(ready, report), refreshed by one caller at a time when the cache expires"""
+        with self._lock:
+            if self._result is None or time.monotonic() >= self._expires_at:
+                self._result = self._run_checks()
+                self._expires_at = time.monotonic() + self.cache_seconds
+            return self._result
+
+
+# Create a global readiness probe
+readiness = Readiness()
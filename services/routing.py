@@ -0,0 +1,280 @@
+"""
+Resilient client for the OSRM routing backend.
+
+Every route request goes through a circuit breaker. While the breaker is
+closed, a duplicate (hedged) request is sent when the first one has not
+answered after the recent p95 latency, and the timeout adapts to the recent
+p99. Timed-out calls count as samples of their timeout, so the timeout grows
+when the provider slows down. When the provider fails, times out or the breaker is open, callers get
+a distance-based estimate instead of waiting on a degraded backend; a single
+probe request is let through after ROUTING_BREAKER_RESET_SECONDS to decide
+whether to close the breaker again, with the longest timeout allowed.
+Unroutable trips are answered by a healthy provider and never count as
+failures; only 5xx answers, timeouts and transport errors do.
+"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import requests
+from fastapi import HTTPException, status
+
+from config.settings import settings
+from utils.deadline import record_overrun, remaining_time
+from utils.geo import haversine_km
+from utils.metrics import Histogram
+
+OSRM_ROUTE_URL = f"{settings.OSRM_URL}/route/v1/bike"
+MIN_SAMPLES_FOR_ADAPTATION = 20
+# Below this much time left before the request deadline, answer with the estimate
+MIN_DEADLINE_BUDGET_SECONDS = 0.05
+
+
+class RouteNotFoundError(Exception):
+    """The provider answered, but has no route between the two points"""
+
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+            self,
+            failure_threshold: int = settings.ROUTING_BREAKER_FAILURE_THRESHOLD,
+            reset_seconds: float = settings.ROUTING_BREAKER_RESET_SECONDS,
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.reset_seconds:
+                    return False
+                self.state = self.HALF_OPEN
+            # Half-open: let exactly one probe through at a time
+            if self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+            self._probe_in_flight = False
+
+    def release_probe(self) -> None:
+        """The call ended without telling whether the provider recovered"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.consecutive_failures += 1
+            self._probe_in_flight = False
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.times_opened += 1
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def snapshot(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "times_opened": self.times_opened,
+        }
+
+
+def estimate_route(origin: tuple[float, float], destination: tuple[float, float]) -> dict:
+    """Distance-based stand-in for a routed trip, in the OSRM route format"""
+    distance_m = haversine_km(*origin, *destination) * 1000 * settings.ROUTING_FALLBACK_DETOUR_FACTOR
+    duration_s = distance_m / (settings.ROUTING_FALLBACK_SPEED_KMH / 3.6)
+    return {"distance": distance_m, "duration": duration_s, "fallback": True}
+
+
+class RoutingClient:
+    def __init__(self, base_url: str = OSRM_ROUTE_URL, breaker: CircuitBreaker | None = None):
+        self.base_url = base_url
+        self.breaker = breaker or CircuitBreaker()
+        self.latency = Histogram()
+        self._recent = deque(maxlen=256)
+        self._session = requests.Session()
+        self._executor = ThreadPoolExecutor(
+            max_workers=settings.ROUTING_MAX_CONCURRENCY, thread_name_prefix="routing"
+        )
+        self._lock = threading.Lock()
+        self.counters = {
+            "requests": 0,
+            "successes": 0,
+            "failures": 0,
+            "fallbacks": 0,
+            "hedges": 0,
+            "hedge_wins": 0,
+            "deadline_fallbacks": 0,
+        }
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self.counters[name] += 1
+
+    def _quantile(self, q: float) -> float | None:
+        with self._lock:
+            samples = sorted(self._recent)
+        if len(samples) < MIN_SAMPLES_FOR_ADAPTATION:
+            return None
+        return samples[min(int(q * len(samples)), len(samples) - 1)]
+
+    def current_timeout(self) -> float:
+        p99 = self._quantile(0.99)
+        if p99 is None:
+            return settings.ROUTING_TIMEOUT_MAX_SECONDS
+        timeout = p99 * settings.ROUTING_TIMEOUT_P99_MULTIPLIER
+        return min(max(timeout, settings.ROUTING_TIMEOUT_MIN_SECONDS), settings.ROUTING_TIMEOUT_MAX_SECONDS)
+
+    def hedge_delay(self) -> float | None:
+        if not settings.ROUTING_HEDGING_ENABLED:
+            return None
+        p95 = self._quantile(0.95)
+        if p95 is None:
+            return None
+        return max(p95, settings.ROUTING_HEDGE_MIN_DELAY_SECONDS)
+
+    def _record_latency(self, elapsed: float) -> None:
+        self.latency.observe(elapsed)
+        with self._lock:
+            self._recent.append(elapsed)
+
+    def _fetch(self, url: str, timeout: float) -> dict:
+        started = time.perf_counter()
+        response = self._session.get(
+            url,
+            params={"overview": "false", "alternatives": "false", "annotations": "false"},
+            timeout=timeout,
+        )
+        if 400 <= response.status_code < 500:
+            # OSRM answers unroutable trips ("NoRoute", "NoSegment"...) with a 4xx and a JSON code
+            try:
+                code = response.json().get("code")
+            except ValueError:
+                code = None
+            if code is not None:
+                self._record_latency(time.perf_counter() - started)
+                raise RouteNotFoundError(code)
+        response.raise_for_status()
+        data = response.json()
+        self._record_latency(time.perf_counter() - started)
+
+        if data["code"] != "Ok":
+            raise RouteNotFoundError(data["code"])
+        return data["routes"][0]
+
+    def _hedged_fetch(self, url: str, timeout: float) -> dict:
+        deadline = time.monotonic() + timeout
+        primary = self._executor.submit(self._fetch, url, timeout)
+        pending = {primary}
+
+        hedge_delay = self.hedge_delay()
+        if hedge_delay is not None and hedge_delay < timeout and self.breaker.state == CircuitBreaker.CLOSED:
+            done, _ = wait(pending, timeout=hedge_delay)
+            if not done:
+                pending.add(self._executor.submit(self._fetch, url, max(deadline - time.monotonic(), 0.01)))
+                self._count("hedges")
+
+        errors = []
+        while pending:
+            done, pending = wait(pending, timeout=max(deadline - time.monotonic(), 0), return_when=FIRST_COMPLETED)
+            if not done:
+                raise TimeoutError(f"Routing request exceeded {timeout:.2f}s")
+            for future in done:
+                error = future.exception()
+                if error is None:
+                    if future is not primary:
+                        self._count("hedge_wins")
+                    return future.result()
+                if isinstance(error, RouteNotFoundError):
+                    raise error
+                errors.append(error)
+        raise errors[0]
+
+    def get_route(self, origin: tuple[float, float], destination: tuple[float, float]) -> dict:
+        """
+        Route between two (latitude, longitude) points.
+        Returns the OSRM route dict, or a distance-based estimate flagged with
+        `fallback` when the provider is unavailable.
+        """
+        self._count("requests")
+        if not self.breaker.allow_request():
+            self._count("fallbacks")
+            return estimate_route(origin, destination)
+
+        # A half-open probe must not fail on a timeout learned before the provider slowed down
+        if self.breaker.state == CircuitBreaker.HALF_OPEN:
+            timeout = settings.ROUTING_TIMEOUT_MAX_SECONDS
+        else:
+            timeout = self.current_timeout()
+        # Never wait on the provider past the request deadline
+        remaining = remaining_time()
+        limited_by_deadline = remaining is not None and remaining < timeout
+        if limited_by_deadline:
+            if remaining < MIN_DEADLINE_BUDGET_SECONDS:
+                self.breaker.release_probe()
+                record_overrun("routing")
+                self._count("deadline_fallbacks")
+                return estimate_route(origin, destination)
+            timeout = remaining
+
+        url = f"{self.base_url}/{origin[1]},{origin[0]};{destination[1]},{destination[0]}"
+        try:
+            route = self._hedged_fetch(url, timeout)
+        except RouteNotFoundError:
+            # The provider is healthy, the trip is just not routable
+            self.breaker.record_success()
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Could not calculate route"
+            )
+        except Exception as exc:
+            if limited_by_deadline and isinstance(exc, (TimeoutError, requests.Timeout)):
+                # Cut short by the request deadline, not a provider failure
+                self.breaker.release_probe()
+                record_overrun("routing")
+                self._count("deadline_fallbacks")
+            else:
+                if isinstance(exc, (TimeoutError, requests.Timeout)):
+                    # The call took at least this long: without the sample the timeout could never grow
+                    self._record_latency(timeout)
+                self.breaker.record_failure()
+                self._count("failures")
+                self._count("fallbacks")
+            return estimate_route(origin, destination)
+
+        self.breaker.record_success()
+        self._count("successes")
+        return route
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counters = dict(self.counters)
+        return {
+            "breaker": self.breaker.snapshot(),
+            "timeout_seconds": round(self.current_timeout(), 3),
+            "hedge_delay_seconds": self.hedge_delay(),
+            "counters": counters,
+            "latency_seconds": self.latency.snapshot(),
+        }
+
+
+# Create a global routing client
+routing_client = RoutingClient()
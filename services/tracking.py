@@ -0,0 +1,253 @@
+"""
+Shipper location tracking.
+
+GPS pings are kept in memory: the latest position of each shipper lives in
+parallel `array` columns indexed by a per-shipper slot, and the stored track
+is downsampled (a point is kept only after the shipper moved or enough time
+passed) and written to `shipper_locations` in periodic bulk inserts. Points
+of shippers deleted meanwhile are dropped, and points kept for a retry after
+a failed insert are capped at TRACKING_BUFFER_MAX_POINTS.
+Customers watching a shipment are notified through a hub that coalesces
+updates and pushes at most one position per interval to each subscriber.
+"""
+import asyncio
+import logging
+import threading
+import time
+from array import array
+from dataclasses import dataclass
+from datetime import datetime
+
+from sqlalchemy import event, insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from config.settings import settings
+from db import SessionLocal
+from db.models import Shipper, ShipperLocation
+from utils.geo import haversine_km
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Position:
+    shipper_id: int
+    latitude: float
+    longitude: float
+    timestamp: float
+
+    def as_dict(self) -> dict:
+        return {
+            "shipper_id": self.shipper_id,
+            "latitude": self.latitude,
+            "longitude": self.longitude,
+            "recorded_at": datetime.fromtimestamp(self.timestamp).isoformat(),
+        }
+
+
+class LocationStore:
+    """
+    Latest position per shipper plus a downsampled track buffer.
+    Positions are stored in compact float arrays rather than one object per
+    shipper, and out-of-order pings are ignored.
+    """
+
+    def __init__(
+            self,
+            min_distance_m: float = settings.TRACKING_MIN_DISTANCE_M,
+            min_interval_seconds: float = settings.TRACKING_MIN_INTERVAL_SECONDS,
+            max_buffered_points: int = settings.TRACKING_BUFFER_MAX_POINTS,
+    ):
+        self.min_distance_km = min_distance_m / 1000
+        self.min_interval_seconds = min_interval_seconds
+        self.max_buffered_points = max_buffered_points
+        # Shipper ids already checked against the database
+        self.known_shippers: set[int] = set()
+        self.dropped_points = 0
+
+        self._lock = threading.Lock()
+        self._slots: dict[int, int] = {}
+        self._latitude = array('d')
+        self._longitude = array('d')
+        self._timestamp = array('d')
+        # Last point kept in the persisted track, per slot
+        self._kept_latitude = array('d')
+        self._kept_longitude = array('d')
+        self._kept_timestamp = array('d')
+        self._track_buffer: list[dict] = []
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def update(self, shipper_id: int, latitude: float, longitude: float, timestamp: float) -> bool:
+        """Record a ping; returns False if it is older than the current position"""
+        # Never store a future time: later real pings would all look older
+        timestamp = min(timestamp, time.time())
+        with self._lock:
+            slot = self._slots.get(shipper_id)
+            if slot is None:
+                slot = len(self._slots)
+                self._slots[shipper_id] = slot
+                for column in (self._latitude, self._longitude, self._timestamp,
+                               self._kept_latitude, self._kept_longitude):
+                    column.append(0.0)
+                self._kept_timestamp.append(float("-inf"))
+            elif timestamp <= self._timestamp[slot]:
+                return False
+
+            self._latitude[slot] = latitude
+            self._longitude[slot] = longitude
+            self._timestamp[slot] = timestamp
+
+            moved = haversine_km(
+                self._kept_latitude[slot], self._kept_longitude[slot], latitude, longitude
+            ) >= self.min_distance_km
+            if moved or timestamp - self._kept_timestamp[slot] >= self.min_interval_seconds:
+                self._kept_latitude[slot] = latitude
+                self._kept_longitude[slot] = longitude
+                self._kept_timestamp[slot] = timestamp
+                self._track_buffer.append({
+                    "shipper_id": shipper_id,
+                    "latitude": latitude,
+                    "longitude": longitude,
+                    "recorded_at": datetime.fromtimestamp(timestamp),
+                })
+            return True
+
+    def get(self, shipper_id: int) -> Position | None:
+        with self._lock:
+            slot = self._slots.get(shipper_id)
+            if slot is None:
+                return None
+            return Position(shipper_id, self._latitude[slot], self._longitude[slot], self._timestamp[slot])
+
+    def drain_track(self) -> list[dict]:
+        with self._lock:
+            rows, self._track_buffer = self._track_buffer, []
+        return rows
+
+    def forget(self, shipper_ids) -> None:
+        """Make the next ping of these shippers be checked against the database again"""
+        self.known_shippers.difference_update(shipper_ids)
+
+    def _without_deleted_shippers(self, db, rows: list[dict]) -> list[dict]:
+        shipper_ids = {row["shipper_id"] for row in rows}
+        existing = set(db.scalars(select(Shipper.id).where(Shipper.id.in_(shipper_ids))))
+        deleted = shipper_ids - existing
+        if not deleted:
+            return rows
+        self.forget(deleted)
+        kept = [row for row in rows if row["shipper_id"] in existing]
+        self.dropped_points += len(rows) - len(kept)
+        logger.warning("Dropped %d track points of deleted shippers %s", len(rows) - len(kept), sorted(deleted))
+        return kept
+
+    def _rebuffer(self, rows: list[dict]) -> None:
+        """Put the points back so the next flush retries them, oldest dropped past the cap"""
+        with self._lock:
+            self._track_buffer[:0] = rows
+            excess = len(self._track_buffer) - self.max_buffered_points
+            if excess > 0:
+                del self._track_buffer[:excess]
+                self.dropped_points += excess
+        if excess > 0:
+            logger.warning("Track buffer full, dropped the %d oldest points", excess)
+
+    def flush(self, session_factory=SessionLocal) -> int:
+        """Write the buffered track points in one bulk insert"""
+        rows = self.drain_track()
+        if not rows:
+            return 0
+
+        db = session_factory()
+        try:
+            try:
+                db.execute(insert(ShipperLocation), rows)
+                db.commit()
+            except IntegrityError:
+                # Most likely a shipper deleted since its pings were accepted
+                db.rollback()
+                rows = self._without_deleted_shippers(db, rows)
+                if rows:
+                    db.execute(insert(ShipperLocation), rows)
+                    db.commit()
+        except Exception:
+            db.rollback()
+            self._rebuffer(rows)
+            raise
+        finally:
+            db.close()
+        return len(rows)
+
+    async def run(self, interval_seconds: float = settings.TRACKING_FLUSH_SECONDS) -> None:
+        """Periodic flush loop, run as a background task from the app lifespan"""
+        try:
+            while True:
+                await asyncio.sleep(interval_seconds)
+                try:
+                    await asyncio.to_thread(self.flush)
+                except Exception:
+                    logger.exception("Error persisting shipper locations")
+        finally:
+            try:
+                await asyncio.to_thread(self.flush)
+            except Exception:
+                logger.exception("Error persisting shipper locations")
+
+
+class Subscription:
+    """A single watcher; only the most recent position is kept between pushes"""
+
+    def __init__(self, shipper_id: int):
+        self.shipper_id = shipper_id
+        self.latest: Position | None = None
+        self.event = asyncio.Event()
+
+    def offer(self, position: Position) -> None:
+        self.latest = position
+        self.event.set()
+
+    async def next(self) -> Position:
+        await self.event.wait()
+        self.event.clear()
+        return self.latest
+
+
+class TrackingHub:
+    """Fan-out of shipper positions to the customers watching them"""
+
+    def __init__(self):
+        self._subscriptions: dict[int, set[Subscription]] = {}
+
+    def subscriber_count(self) -> int:
+        return sum(len(subscriptions) for subscriptions in self._subscriptions.values())
+
+    def subscribe(self, shipper_id: int) -> Subscription:
+        subscription = Subscription(shipper_id)
+        self._subscriptions.setdefault(shipper_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscriptions = self._subscriptions.get(subscription.shipper_id)
+        if subscriptions is None:
+            return
+        subscriptions.discard(subscription)
+        if not subscriptions:
+            del self._subscriptions[subscription.shipper_id]
+
+    def publish(self, position: Position) -> None:
+        """Must be called from the event loop thread"""
+        for subscription in self._subscriptions.get(position.shipper_id, ()):
+            subscription.offer(position)
+
+
+# Create global tracking objects
+location_store = LocationStore()
+tracking_hub = TrackingHub()
+
+
+@event.listens_for(Session, "after_flush")
+def _forget_deleted_shippers(session, flush_context):
+    # Deletions made elsewhere are caught by flush() when their points are rejected
+    location_store.forget(obj.id for obj in session.deleted if isinstance(obj, Shipper))
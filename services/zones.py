@@ -0,0 +1,179 @@
+"""
+Delivery zone index.
+
+All restaurant delivery zones are loaded into NumPy arrays: one bounding box
+per zone, radius zones as center + radius, and polygon edges concatenated
+and grouped by zone. A lookup first filters zones by bounding box, then runs
+the radius check and an even-odd ray casting test over the edges of the
+remaining polygons in one vectorized pass, so out-of-zone addresses are
+rejected before any routing or database work.
+
+Restaurants without an explicit zone deliver anywhere, unless
+DELIVERY_ZONE_DEFAULT_RADIUS_KM gives them a radius zone around their
+location.
+"""
+import math
+import threading
+import time
+
+import numpy as np
+
+from config.settings import settings
+from db import SessionLocal
+from db.models import DeliveryZone, Restaurant
+from services.outbox import subscribe
+from utils.geo import KM_PER_DEGREE_LAT
+
+
+class ZoneIndex:
+    """Immutable snapshot of every delivery zone"""
+
+    def __init__(self, restaurants: list[tuple[int, float, float]], zones: list[tuple[int, float | None, list | None]]):
+        centers = {restaurant_id: (lat, lng) for restaurant_id, lat, lng in restaurants}
+        explicit = {restaurant_id for restaurant_id, _, _ in zones if restaurant_id in centers}
+        zones = [zone for zone in zones if zone[0] in centers]
+        if settings.DELIVERY_ZONE_DEFAULT_RADIUS_KM > 0:
+            zones += [(restaurant_id, settings.DELIVERY_ZONE_DEFAULT_RADIUS_KM, None)
+                      for restaurant_id in centers if restaurant_id not in explicit]
+            self.unrestricted: set[int] = set()
+        else:
+            self.unrestricted = set(centers) - explicit
+
+        count = len(zones)
+        self.zone_restaurant = np.empty(count, dtype=np.int64)
+        self.bbox = np.empty((count, 4), dtype=np.float64)  # min_lat, max_lat, min_lng, max_lng
+        self.radius_km = np.full(count, np.nan)
+        self.center = np.zeros((count, 2), dtype=np.float64)
+
+        edge_rows = []
+        edge_zone = []
+        for i, (restaurant_id, radius_km, polygon) in enumerate(zones):
+            self.zone_restaurant[i] = restaurant_id
+            if polygon:
+                vertices = np.asarray(polygon, dtype=np.float64)
+                closed = np.vstack([vertices, vertices[:1]])
+                edge_rows.append(np.hstack([closed[:-1], closed[1:]]))  # lat1, lng1, lat2, lng2
+                edge_zone.append(np.full(len(vertices), i, dtype=np.int64))
+                self.bbox[i] = (vertices[:, 0].min(), vertices[:, 0].max(),
+                                vertices[:, 1].min(), vertices[:, 1].max())
+            else:
+                lat, lng = centers[restaurant_id]
+                d_lat = radius_km / KM_PER_DEGREE_LAT
+                d_lng = radius_km / (KM_PER_DEGREE_LAT * max(math.cos(math.radians(lat)), 0.01))
+                self.radius_km[i] = radius_km
+                self.center[i] = (lat, lng)
+                self.bbox[i] = (lat - d_lat, lat + d_lat, lng - d_lng, lng + d_lng)
+
+        self.edges = np.vstack(edge_rows) if edge_rows else np.empty((0, 4))
+        self.edge_zone = np.concatenate(edge_zone) if edge_zone else np.empty(0, dtype=np.int64)
+
+    def _zones_containing(self, latitude: float, longitude: float, zone_mask: np.ndarray | None = None) -> np.ndarray:
+        bbox = self.bbox
+        mask = (bbox[:, 0] <= latitude) & (latitude <= bbox[:, 1]) & \
+               (bbox[:, 2] <= longitude) & (longitude <= bbox[:, 3])
+        if zone_mask is not None:
+            mask &= zone_mask
+        candidates = np.flatnonzero(mask)
+        if not len(candidates):
+            return candidates
+
+        inside = np.zeros(len(self.zone_restaurant), dtype=bool)
+
+        # Radius zones (equirectangular distance, accurate at delivery scale)
+        radius_zones = candidates[~np.isnan(self.radius_km[candidates])]
+        if len(radius_zones):
+            center = self.center[radius_zones]
+            dy = (center[:, 0] - latitude) * KM_PER_DEGREE_LAT
+            dx = (center[:, 1] - longitude) * KM_PER_DEGREE_LAT * math.cos(math.radians(latitude))
+            inside[radius_zones] = dx * dx + dy * dy <= self.radius_km[radius_zones] ** 2
+
+        # Polygon zones: even-odd rule over the edges of the candidate polygons
+        if len(self.edge_zone):
+            is_candidate = np.zeros(len(self.zone_restaurant), dtype=bool)
+            is_candidate[candidates] = True
+            edge_mask = is_candidate[self.edge_zone]
+            if edge_mask.any():
+                lat1, lng1, lat2, lng2 = self.edges[edge_mask].T
+                straddles = (lat1 > latitude) != (lat2 > latitude)
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    crossing_lng = lng1 + (latitude - lat1) * (lng2 - lng1) / (lat2 - lat1)
+                crosses = straddles & (longitude < crossing_lng)
+                counts = np.bincount(self.edge_zone[edge_mask][crosses], minlength=len(inside))
+                polygon_zones = np.unique(self.edge_zone[edge_mask])
+                inside[polygon_zones] = counts[polygon_zones] % 2 == 1
+
+        return np.flatnonzero(inside)
+
+    def restaurants_serving(self, latitude: float, longitude: float) -> set[int]:
+        zones = self._zones_containing(latitude, longitude)
+        return set(self.zone_restaurant[zones].tolist()) | self.unrestricted
+
+    def serves(self, restaurant_id: int, latitude: float, longitude: float) -> bool:
+        """
+        Whether the restaurant delivers to the point.
+        Restaurants without a zone, or missing from the snapshot (e.g. created
+        by another worker since it was built), are not rejected here.
+        """
+        zone_mask = self.zone_restaurant == restaurant_id
+        if not zone_mask.any():
+            return True
+        return len(self._zones_containing(latitude, longitude, zone_mask)) > 0
+
+
+def load_zone_index(session_factory=SessionLocal) -> ZoneIndex:
+    db = session_factory()
+    try:
+        restaurants = db.query(Restaurant.id, Restaurant.latitude, Restaurant.longitude).all()
+        zones = [
+            (zone.restaurant_id, zone.radius_km, zone.polygon)
+            for zone in db.query(DeliveryZone).all()
+        ]
+    finally:
+        db.close()
+    return ZoneIndex(restaurants, zones)
+
+
+class ZoneIndexHolder:
+    """
+    Lazily (re)built zone index.
+    Local writes invalidate it immediately; changes made by other workers are
+    picked up after DELIVERY_ZONE_INDEX_TTL_SECONDS.
+    """
+
+    def __init__(self, ttl_seconds: float = settings.DELIVERY_ZONE_INDEX_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._index: ZoneIndex | None = None
+        self._loaded_at = 0.0
+
+    def invalidate(self) -> None:
+        self._index = None
+
+    def get(self) -> ZoneIndex:
+        index = self._index
+        if index is not None and time.monotonic() - self._loaded_at < self.ttl_seconds:
+            return index
+
+        with self._lock:
+            index = self._index
+            if index is None or time.monotonic() - self._loaded_at >= self.ttl_seconds:
+                index = load_zone_index()
+                self._index = index
+                self._loaded_at = time.monotonic()
+            return index
+
+    def restaurants_serving(self, latitude: float, longitude: float) -> set[int]:
+        return self.get().restaurants_serving(latitude, longitude)
+
+    def serves(self, restaurant_id: int, latitude: float, longitude: float) -> bool:
+        return self.get().serves(restaurant_id, latitude, longitude)
+
+
+# Create a global zone index
+zone_index = ZoneIndexHolder()
+
+
+@subscribe("restaurant.*", "delivery_zone.*", name="zones.invalidate", durable=False)
+def _invalidate_zones(events) -> None:
+    # Writes in other workers; this worker's own writes already invalidated the index
+    zone_index.invalidate()
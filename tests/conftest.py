@@ -0,0 +1,86 @@
+"""
+Test suite, run on its own so the app is configured here first (pytest.ini
+limits a bare `python -m pytest` to this directory):
+
+    python -m pytest
+
+The app runs in process through httpx against throwaway SQLite databases
+(the async routes through aiosqlite): a primary and one read replica seeded
+with the same rows. Background tasks, migrations and rate limiting are off.
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+if "config.settings" in sys.modules:
+    raise pytest.UsageError("the settings were loaded before tests/conftest.py, run `python -m pytest tests`")
+
+DATA_DIR = tempfile.mkdtemp()
+# Always a throwaway database, whatever DATABASE_URL the shell has
+os.environ["DATABASE_URL"] = f"sqlite:///{DATA_DIR}/primary.db"
+os.environ["DATABASE_REPLICA_URLS"] = f"sqlite:///{DATA_DIR}/replica.db"
+for _name, _value in (("RATE_LIMIT_ENABLED", "false"), ("DISPATCH_ENABLED", "false"),
+                      ("ISOCHRONE_REFRESH_ENABLED", "false"), ("MIGRATIONS_ON_STARTUP", "off"),
+                      ("JOBS_ENABLED", "false"), ("OUTBOX_RELAY_ENABLED", "false"),
+                      ("ACCESS_LOG_ENABLED", "false")):
+    os.environ[_name] = _value
+
+import httpx
+from sqlalchemy import insert
+
+from db import Base, dispose_async_engine, engine
+from db.models import Comment, Menu, Restaurant, User
+from db.replicas import replica_set
+from main import app
+from services.catalog_cache import catalog_cache
+
+RESTAURANTS = 2
+MENUS_PER_RESTAURANT = 3
+# Ratings left on each menu, menu 6 has none
+RATINGS = {1: (4, 5), 2: (2, 3), 3: (5, 5), 4: (1, 2), 5: (3, 4)}
+
+
+def seed(bind) -> None:
+    """Two restaurants with three menus each, prepared in 10, 20 and 30 minutes, rated as in RATINGS"""
+    Base.metadata.create_all(bind)
+    with bind.begin() as conn:
+        conn.execute(insert(User), [{
+            "email": "client@example.com", "first_name": "Test", "last_name": "Client",
+            "phone_number": "0000000000", "password_hash": "x",
+        }])
+        conn.execute(insert(Restaurant), [{
+            "name": f"Restaurant {i + 1}", "address": "Test street", "phone_number": "0000000000",
+            "latitude": 4.05, "longitude": 9.7,
+        } for i in range(RESTAURANTS)])
+        conn.execute(insert(Menu), [{
+            "restaurant_id": r + 1, "name": f"Menu {r + 1}-{m + 1}", "price": 1000 + m,
+            "description": "Test menu", "preparation_time": 10 * (m + 1),
+        } for r in range(RESTAURANTS) for m in range(MENUS_PER_RESTAURANT)])
+        conn.execute(insert(Comment), [{
+            "menu_id": menu_id, "client_id": 1, "comment": "ok", "rating": rating,
+        } for menu_id, ratings in RATINGS.items() for rating in ratings])
+
+
+@pytest.fixture(scope="session", autouse=True)
+def database():
+    seed(engine)
+    for replica in replica_set.replicas:
+        seed(replica.engine)
+    yield engine
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def client():
+    catalog_cache.invalidate()
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+    # Pooled aiosqlite connections belong to this test's event loop
+    await dispose_async_engine()
+    await replica_set.dispose()
@@ -0,0 +1,36 @@
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import db
+from db import get_async_db, get_async_database_url
+from db.models import Menu
+
+pytestmark = pytest.mark.anyio
+
+
+def test_async_url_uses_aiosqlite():
+    assert get_async_database_url().startswith("sqlite+aiosqlite:///")
+
+
+async def test_get_async_db_yields_a_session_on_the_primary():
+    dependency = get_async_db()
+    session = await anext(dependency)
+    try:
+        assert isinstance(session, AsyncSession)
+        assert await session.scalar(select(func.count(Menu.id))) == 6
+    finally:
+        await dependency.aclose()
+    assert not session.in_transaction()
+    await db.dispose_async_engine()
+
+
+async def test_get_async_db_returns_connections_to_the_pool():
+    for _ in range(3):
+        dependency = get_async_db()
+        session = await anext(dependency)
+        await session.scalar(select(Menu.id).limit(1))
+        await dependency.aclose()
+    assert db.async_engine.pool.checkedout() == 0
+    await db.dispose_async_engine()
+    assert db.async_engine is None
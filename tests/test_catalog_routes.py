@@ -0,0 +1,117 @@
+"""Read routes of the catalog, served from async sessions (see tests/conftest.py for the data)"""
+import pytest
+from sqlalchemy.exc import OperationalError
+
+import routes.menus
+from config.settings import settings
+from main import app
+from middleware.routes import RouteResolver
+from utils.cache import caches
+from utils.exceptions import DeadlineExceededError
+
+pytestmark = pytest.mark.anyio
+
+AVERAGE_RATINGS = {1: 4.5, 2: 2.5, 3: 5.0, 4: 1.5, 5: 3.5, 6: None}
+
+
+async def test_list_menus(client):
+    response = await client.get("/menus")
+    assert response.status_code == 200
+    menus = response.json()
+    assert {menu["id"]: menu["average_rating"] for menu in menus} == AVERAGE_RATINGS
+    assert all(menu["restaurant"]["id"] == menu["restaurant_id"] for menu in menus)
+
+
+async def test_repeat_reads_served_precompressed_from_the_cache(client):
+    stats = caches["catalog"].stats
+    first = await client.get("/menus", headers={"accept-encoding": "gzip"})
+    assert first.status_code == 200
+    assert stats()["size"] == 1
+
+    hits = stats()["hits"]
+    second = await client.get("/menus", headers={"accept-encoding": "gzip"})
+    assert stats()["hits"] == hits + 1
+    assert second.headers["content-encoding"] == "gzip"
+    assert second.json() == first.json()
+
+
+async def test_list_menus_of_one_restaurant(client):
+    response = await client.get("/menus", params={"restaurant_id": 2, "limit": 2})
+    assert response.status_code == 200
+    assert [menu["id"] for menu in response.json()] == [4, 5]
+
+
+async def test_quick_service_menus(client):
+    response = await client.get("/menus/quick-service", params={"max_preparation_time": 20})
+    assert response.status_code == 200
+    assert sorted(menu["id"] for menu in response.json()) == [1, 2, 4, 5]
+
+
+async def test_get_menu(client):
+    response = await client.get("/menus/3")
+    assert response.status_code == 200
+    assert response.json()["average_rating"] == 5.0
+
+
+async def test_get_missing_menu(client):
+    response = await client.get("/menus/999")
+    assert response.status_code == 404
+
+
+async def test_most_rated_menus(client):
+    response = await client.get("/menus/most-rated")
+    assert response.status_code == 200
+    assert [menu["id"] for menu in response.json()] == [3, 1, 5, 2, 4]
+
+
+def test_most_rated_menus_get_their_own_deadline():
+    scope = {"type": "http", "method": "GET", "path": "/menus/most-rated", "root_path": "", "app": app}
+    assert RouteResolver()(scope) == "/menus/most-rated"
+    assert settings.REQUEST_DEADLINE_ROUTES["GET /menus/most-rated"] == 3
+
+
+async def test_restaurant_menus(client):
+    response = await client.get("/restaurants/1/menus")
+    assert response.status_code == 200
+    assert [(menu["id"], menu["average_rating"]) for menu in response.json()] == [(1, 4.5), (2, 2.5), (3, 5.0)]
+
+
+async def test_restaurant_menus_of_missing_restaurant(client):
+    response = await client.get("/restaurants/999/menus")
+    assert response.status_code == 404
+    assert response.json() == {"detail": "Restaurant not found"}
+
+
+async def test_restaurant_menus_past_the_deadline(client, monkeypatch):
+    async def expired(db, menus):
+        raise DeadlineExceededError()
+
+    monkeypatch.setattr(routes.menus, "populate_average_ratings", expired)
+    response = await client.get("/restaurants/1/menus")
+    assert response.status_code == 504
+
+
+async def test_restaurant_menus_interrupted_by_the_server(client, monkeypatch):
+    async def interrupted(db, menus):
+        raise OperationalError("SELECT ...", {}, Exception(1969, "Query execution was interrupted"))
+
+    monkeypatch.setattr(routes.menus, "populate_average_ratings", interrupted)
+    response = await client.get("/restaurants/1/menus")
+    assert response.status_code == 504
+
+
+async def test_list_restaurants(client):
+    response = await client.get("/restaurants")
+    assert response.status_code == 200
+    assert [restaurant["name"] for restaurant in response.json()] == ["Restaurant 1", "Restaurant 2"]
+
+
+async def test_get_restaurant(client):
+    response = await client.get("/restaurants/2")
+    assert response.status_code == 200
+    assert response.json()["id"] == 2
+
+
+async def test_get_missing_restaurant(client):
+    response = await client.get("/restaurants/999")
+    assert response.status_code == 404
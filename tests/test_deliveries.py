@@ -0,0 +1,38 @@
+import pytest
+from sqlalchemy.exc import OperationalError
+
+import routes.deliveries
+from utils.deadline import deadline_overruns
+
+pytestmark = pytest.mark.anyio
+
+ESTIMATE = {
+    "restaurant_id": 1,
+    "delivery_location": {"latitude": 4.06, "longitude": 9.71, "address": "Test street"},
+    "menu_items": {"1": 2},
+}
+
+
+@pytest.fixture
+def deliverable(monkeypatch):
+    monkeypatch.setattr(routes.deliveries.zone_index, "serves", lambda restaurant_id, latitude, longitude: True)
+
+
+async def test_estimate_interrupted_at_the_deadline(client, monkeypatch, deliverable):
+    def interrupted(*args):
+        raise OperationalError("SELECT ...", {}, Exception(1969, "Query execution was interrupted"))
+
+    monkeypatch.setattr(routes.deliveries.isochrone_store, "lookup", interrupted)
+    overruns = sum(count for (_, kind), count in deadline_overruns.items() if kind == "statement")
+    response = await client.post("/delivery-estimate", json=ESTIMATE)
+    assert response.status_code == 504
+    assert response.json() == {"detail": "Request deadline exceeded"}
+    assert sum(count for (_, kind), count in deadline_overruns.items() if kind == "statement") == overruns + 1
+
+
+async def test_estimate_from_the_grid(client, monkeypatch, deliverable):
+    monkeypatch.setattr(routes.deliveries.isochrone_store, "lookup", lambda *args: (600.0, 3000.0))
+    response = await client.post("/delivery-estimate", json=ESTIMATE)
+    assert response.status_code == 200
+    assert response.json()["distance_km"] == 3.0
+    assert response.json()["total_order_price"] == 2000.0
@@ -0,0 +1,56 @@
+import pytest
+
+from config.settings import settings
+from middleware.rate_limit import InMemoryStore, RateLimitMiddleware, RateLimitRule
+
+pytestmark = pytest.mark.anyio
+
+
+async def ok(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def call(middleware, *forwarded_for: str) -> int:
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    headers = [(b"x-forwarded-for", value.encode()) for value in forwarded_for]
+    scope = {"type": "http", "method": "POST", "path": "/auth/login", "headers": headers, "client": ("10.0.0.1", 1)}
+    await middleware(scope, None, send)
+    return messages[0]["status"]
+
+
+@pytest.fixture
+def middleware(monkeypatch):
+    monkeypatch.setattr(settings, "RATE_LIMIT_TRUST_FORWARDED_FOR", True)
+    return RateLimitMiddleware(ok, [RateLimitRule("login", "POST", "/auth/login", 2, 60)], InMemoryStore())
+
+
+def test_client_is_the_entry_added_by_the_trusted_proxies(monkeypatch):
+    monkeypatch.setattr(settings, "RATE_LIMIT_TRUST_FORWARDED_FOR", True)
+    scope = {"headers": [(b"x-forwarded-for", b"6.6.6.6, 1.2.3.4"), (b"x-forwarded-for", b"10.0.0.2")], "client": None}
+    monkeypatch.setattr(settings, "RATE_LIMIT_TRUSTED_PROXIES", 1)
+    assert RateLimitMiddleware._client_ip(scope) == "10.0.0.2"
+    monkeypatch.setattr(settings, "RATE_LIMIT_TRUSTED_PROXIES", 2)
+    assert RateLimitMiddleware._client_ip(scope) == "1.2.3.4"
+    monkeypatch.setattr(settings, "RATE_LIMIT_TRUSTED_PROXIES", 5)
+    assert RateLimitMiddleware._client_ip(scope) == "6.6.6.6"
+
+
+async def test_spoofed_entries_do_not_reset_the_limit(middleware):
+    statuses = [await call(middleware, f"203.0.113.{i}, 198.51.100.7") for i in range(4)]
+    assert statuses == [200, 200, 429, 429]
+
+
+async def test_rejected_requests_are_refunded_to_earlier_rules():
+    rules = [
+        RateLimitRule("per_client", "POST", "/auth/login", 10, 60),
+        RateLimitRule("global", "POST", "/auth/login", 2, 60, key="route", algorithm="sliding_window"),
+    ]
+    middleware = RateLimitMiddleware(ok, rules, InMemoryStore())
+    assert [await call(middleware) for _ in range(6)] == [200, 200, 429, 429, 429, 429]
+    allowed, _ = await middleware.store.token_bucket("per_client:10.0.0.1", 10, 10 / 60, cost=8)
+    assert allowed
@@ -0,0 +1,95 @@
+"""Read routing between the primary and the replica (see tests/conftest.py)"""
+import time
+
+import pytest
+from sqlalchemy import create_engine, update
+
+from config.settings import settings
+from db.models import Restaurant
+from db.replicas import READ_YOUR_WRITES_COOKIE, replica_set
+
+pytestmark = pytest.mark.anyio
+
+PRIMARY_NAME = "Restaurant 1"
+REPLICA_NAME = "Restaurant 1 (replica)"
+
+
+@pytest.fixture
+def replica():
+    """The replica, with restaurant 1 renamed there only so responses tell which database served them"""
+    replica = replica_set.replicas[0]
+    with replica.engine.begin() as conn:
+        conn.execute(update(Restaurant).where(Restaurant.id == 1).values(name=REPLICA_NAME))
+    yield replica
+    replica.record_success()
+    with replica.engine.begin() as conn:
+        conn.execute(update(Restaurant).where(Restaurant.id == 1).values(name=PRIMARY_NAME))
+
+
+async def restaurant_name(client) -> str:
+    response = await client.get("/restaurants/1")
+    assert response.status_code == 200
+    return response.json()["name"]
+
+
+async def test_reads_go_to_the_replica(client, replica):
+    assert await restaurant_name(client) == REPLICA_NAME
+
+
+async def test_writes_keep_the_client_on_the_primary(client, replica):
+    response = await client.post("/restaurants", json={
+        "name": "New restaurant", "address": "Test street", "phone_number": "0000000000",
+        "latitude": 4.05, "longitude": 9.7,
+    })
+    assert response.status_code == 201
+    restaurant_id = response.json()["id"]
+    assert READ_YOUR_WRITES_COOKIE in response.cookies
+    try:
+        # Only the primary has the new row
+        assert (await client.get(f"/restaurants/{restaurant_id}")).status_code == 200
+        assert await restaurant_name(client) == PRIMARY_NAME
+
+        client.cookies.clear()
+        assert (await client.get(f"/restaurants/{restaurant_id}")).status_code == 404
+        assert await restaurant_name(client) == REPLICA_NAME
+    finally:
+        assert (await client.delete(f"/restaurants/{restaurant_id}")).status_code == 204
+
+
+@pytest.mark.parametrize("until", ["inf", "nan", "1e300", "not a time"])
+async def test_forged_cookies_do_not_pin_reads_to_the_primary(client, replica, until):
+    client.cookies.set(READ_YOUR_WRITES_COOKIE, until)
+    assert await restaurant_name(client) == REPLICA_NAME
+
+
+async def test_cookie_within_the_window_reads_from_the_primary(client, replica):
+    client.cookies.set(READ_YOUR_WRITES_COOKIE, f"{time.time() + settings.READ_YOUR_WRITES_SECONDS:.0f}")
+    assert await restaurant_name(client) == PRIMARY_NAME
+
+
+async def test_failed_writes_do_not_set_the_cookie(client, replica):
+    response = await client.delete("/restaurants/999")
+    assert response.status_code == 404
+    assert READ_YOUR_WRITES_COOKIE not in response.cookies
+    assert await restaurant_name(client) == REPLICA_NAME
+
+
+async def test_replica_ejected_after_failed_probes_and_readmitted(client, replica, monkeypatch, tmp_path):
+    # The directory does not exist, so connecting fails
+    monkeypatch.setattr(replica, "engine", create_engine(f"sqlite:///{tmp_path}/missing/replica.db"))
+    times_ejected = replica.times_ejected
+    for _ in range(settings.REPLICA_FAILURE_THRESHOLD - 1):
+        replica_set.check()
+    assert replica.healthy
+    assert await restaurant_name(client) == REPLICA_NAME
+
+    replica_set.check()
+    assert not replica.healthy
+    assert replica.times_ejected == times_ejected + 1
+    assert replica_set.choose() is None
+    assert await restaurant_name(client) == PRIMARY_NAME
+
+    monkeypatch.undo()
+    replica_set.check()
+    assert replica.healthy
+    assert await restaurant_name(client) == REPLICA_NAME
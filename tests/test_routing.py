@@ -0,0 +1,52 @@
+import json
+
+import pytest
+import requests
+from fastapi import HTTPException
+
+from services.routing import CircuitBreaker, RoutingClient
+
+ORIGIN = (4.05, 9.7)
+DESTINATION = (4.06, 9.71)
+
+
+def osrm_response(status_code: int, body: dict | None) -> requests.Response:
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = json.dumps(body).encode() if body is not None else b"Bad Gateway"
+    return response
+
+
+@pytest.fixture
+def client():
+    client = RoutingClient(base_url="http://osrm.test/route/v1/bike", breaker=CircuitBreaker(failure_threshold=3))
+    yield client
+    client._executor.shutdown(wait=False)
+
+
+def answer_with(client, monkeypatch, response: requests.Response) -> None:
+    monkeypatch.setattr(client._session, "get", lambda url, params, timeout: response)
+
+
+def test_unroutable_trips_do_not_open_the_breaker(client, monkeypatch):
+    answer_with(client, monkeypatch, osrm_response(400, {"code": "NoRoute", "message": "Impossible route"}))
+    for _ in range(client.breaker.failure_threshold + 1):
+        with pytest.raises(HTTPException) as excinfo:
+            client.get_route(ORIGIN, DESTINATION)
+        assert excinfo.value.status_code == 400
+    assert client.breaker.state == CircuitBreaker.CLOSED
+    assert client.counters["failures"] == 0
+
+
+def test_server_errors_open_the_breaker(client, monkeypatch):
+    answer_with(client, monkeypatch, osrm_response(502, None))
+    for _ in range(client.breaker.failure_threshold):
+        assert client.get_route(ORIGIN, DESTINATION)["fallback"]
+    assert client.breaker.state == CircuitBreaker.OPEN
+    assert client.counters["failures"] == client.breaker.failure_threshold
+
+
+def test_routed_trip(client, monkeypatch):
+    answer_with(client, monkeypatch, osrm_response(200, {"code": "Ok", "routes": [{"distance": 1500.0, "duration": 300.0}]}))
+    assert client.get_route(ORIGIN, DESTINATION) == {"distance": 1500.0, "duration": 300.0}
+    assert client.counters["successes"] == 1
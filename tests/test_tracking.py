@@ -0,0 +1,63 @@
+import time
+
+import pytest
+from sqlalchemy import create_engine, delete, event, func, insert, select
+from sqlalchemy.orm import sessionmaker
+
+from db import Base
+from db.models import Shipper, ShipperLocation
+from services.tracking import LocationStore
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    """A database enforcing foreign keys, which SQLite only does when asked"""
+    engine = create_engine(f"sqlite:///{tmp_path}/tracking.db")
+    event.listen(engine, "connect", lambda connection, record: connection.execute("PRAGMA foreign_keys=ON"))
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(Shipper), [{"name": f"Shipper {i}", "email": f"shipper{i}@example.com"} for i in (1, 2)])
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+def stored_points(session_factory) -> dict[int, int]:
+    with session_factory() as db:
+        rows = db.execute(select(ShipperLocation.shipper_id, func.count()).group_by(ShipperLocation.shipper_id))
+        return dict(rows.all())
+
+
+def test_points_of_deleted_shippers_are_dropped(session_factory):
+    store = LocationStore(min_interval_seconds=0)
+    store.known_shippers.update({1, 2})
+    now = time.time()
+    for shipper_id in (1, 2):
+        store.update(shipper_id, 4.05, 9.7, now - 10)
+        store.update(shipper_id, 4.06, 9.71, now - 5)
+    with session_factory() as db:
+        db.execute(delete(Shipper).where(Shipper.id == 2))
+        db.commit()
+
+    assert store.flush(session_factory) == 2
+    assert stored_points(session_factory) == {1: 2}
+    assert store.dropped_points == 2
+    assert store.known_shippers == {1}
+
+    # Later flushes are not blocked by the dropped points
+    store.update(1, 4.07, 9.72, now)
+    assert store.flush(session_factory) == 1
+    assert stored_points(session_factory) == {1: 3}
+
+
+def test_points_kept_for_a_retry_are_capped(tmp_path):
+    store = LocationStore(min_interval_seconds=0, max_buffered_points=3)
+    now = time.time()
+    for i in range(5):
+        store.update(1, 4.05 + i / 100, 9.7, now - 10 + i)
+
+    # The directory does not exist, so connecting fails
+    unavailable = sessionmaker(bind=create_engine(f"sqlite:///{tmp_path}/missing/tracking.db"))
+    with pytest.raises(Exception):
+        store.flush(unavailable)
+    assert [point["latitude"] for point in store.drain_track()] == pytest.approx([4.07, 4.08, 4.09])
+    assert store.dropped_points == 2
@@ -0,0 +1,53 @@
+"""
+Request deadlines.
+
+DeadlineMiddleware stores the deadline of the current request in a context
+variable (copied into threadpool calls). Code that starts slow work reads
+the remaining time from it: SELECTs get a server-side statement timeout on
+MariaDB/MySQL, routing calls shorten their timeout, and work that would
+start past the deadline raises DeadlineExceededError (504) instead.
+"""
+import contextvars
+import time
+from dataclasses import dataclass
+
+from utils.exceptions import DeadlineExceededError
+
+
+@dataclass(frozen=True)
+class Deadline:
+    route: str
+    expires_at: float  # time.monotonic()
+
+    def remaining(self) -> float:
+        return self.expires_at - time.monotonic()
+
+
+current_deadline: contextvars.ContextVar[Deadline | None] = contextvars.ContextVar("current_deadline", default=None)
+
+# Overruns per (route, kind): "request", "statement", "pool" or "routing"
+deadline_overruns: dict[tuple[str, str], int] = {}
+
+
+def record_overrun(kind: str, deadline: Deadline | None = None) -> None:
+    deadline = deadline or current_deadline.get()
+    key = (deadline.route if deadline is not None else "unknown", kind)
+    deadline_overruns[key] = deadline_overruns.get(key, 0) + 1
+
+
+def remaining_time() -> float | None:
+    """Seconds left before the current request's deadline, None outside a request"""
+    deadline = current_deadline.get()
+    return deadline.remaining() if deadline is not None else None
+
+
+def check_deadline(kind: str) -> float | None:
+    """Remaining time, or DeadlineExceededError when the deadline has already passed"""
+    deadline = current_deadline.get()
+    if deadline is None:
+        return None
+    remaining = deadline.remaining()
+    if remaining <= 0:
+        record_overrun(kind, deadline)
+        raise DeadlineExceededError()
+    return remaining
@@ -43,4 +43,9 @@ class ForbiddenError(APIError):
 class DatabaseError(APIError):
     """Database error"""
     def __init__(self, detail: str = "Database error"):
-        super().__init__(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=detail)
\ No newline at end of file
+        super().__init__(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=detail)
+
+class DeadlineExceededError(APIError):
+    """Request deadline exceeded"""
+    def __init__(self, detail: str = "Request deadline exceeded"):
+        super().__init__(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail=detail)
@@ -0,0 +1,91 @@
+import heapq
+import math
+from typing import Hashable, Iterator
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE_LAT = 111.32
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance in kilometres between two points"""
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+class GridIndex:
+    """
+    Uniform latitude/longitude grid bucketing points for fast radius lookups.
+    Each cell is roughly `cell_km` wide; a radius query only visits the cells
+    overlapping the search square instead of every indexed point.
+    """
+
+    def __init__(self, cell_km: float = 1.0):
+        self.cell_deg = cell_km / KM_PER_DEGREE_LAT
+        self._cells: dict[tuple[int, int], dict[Hashable, tuple[float, float]]] = {}
+        self._positions: dict[Hashable, tuple[int, int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._positions
+
+    def _cell(self, lat: float, lng: float) -> tuple[int, int]:
+        return int(math.floor(lat / self.cell_deg)), int(math.floor(lng / self.cell_deg))
+
+    def insert(self, key: Hashable, lat: float, lng: float) -> None:
+        self.remove(key)
+        cell = self._cell(lat, lng)
+        self._cells.setdefault(cell, {})[key] = (lat, lng)
+        self._positions[key] = cell
+
+    def remove(self, key: Hashable) -> None:
+        cell = self._positions.pop(key, None)
+        if cell is None:
+            return
+        bucket = self._cells[cell]
+        bucket.pop(key, None)
+        if not bucket:
+            del self._cells[cell]
+
+    def items(self) -> Iterator[tuple[Hashable, float, float]]:
+        for bucket in self._cells.values():
+            for key, (lat, lng) in bucket.items():
+                yield key, lat, lng
+
+    def nearby(self, lat: float, lng: float, radius_km: float, limit: int | None = None) -> list[tuple[Hashable, float]]:
+        """
+        Return (key, distance_km) pairs within `radius_km`, nearest first.
+        """
+        lat_span = int(math.ceil(radius_km / KM_PER_DEGREE_LAT / self.cell_deg))
+        # Longitude degrees shrink towards the poles, widen the scan accordingly
+        cos_lat = max(math.cos(math.radians(lat)), 0.01)
+        lng_span = int(math.ceil(radius_km / (KM_PER_DEGREE_LAT * cos_lat) / self.cell_deg))
+        row, col = self._cell(lat, lng)
+
+        # Equirectangular distance is accurate to well under 1% at city scale
+        # and much cheaper than haversine, so filter and rank with it first
+        km_per_deg_lng = KM_PER_DEGREE_LAT * cos_lat
+        radius_sq = radius_km * radius_km
+        found = []
+        for r in range(row - lat_span, row + lat_span + 1):
+            for c in range(col - lng_span, col + lng_span + 1):
+                bucket = self._cells.get((r, c))
+                if not bucket:
+                    continue
+                for key, (p_lat, p_lng) in bucket.items():
+                    dy = (p_lat - lat) * KM_PER_DEGREE_LAT
+                    dx = (p_lng - lng) * km_per_deg_lng
+                    distance_sq = dx * dx + dy * dy
+                    if distance_sq <= radius_sq:
+                        found.append((distance_sq, key, p_lat, p_lng))
+
+        if limit is not None and len(found) > limit:
+            found = heapq.nsmallest(limit, found, key=lambda item: item[0])
+        else:
+            found.sort(key=lambda item: item[0])
+        return [(key, haversine_km(lat, lng, p_lat, p_lng)) for _, key, p_lat, p_lng in found]
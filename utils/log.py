@@ -0,0 +1,149 @@
+"""
+Non-blocking application logging.
+
+configure_logging() routes every record of the root logger through a
+bounded queue to a listener thread that formats (JSON by default) and
+writes them, so logging from the event loop or the threadpool never waits
+on stderr. When the queue is full, records are dropped and counted rather
+than blocking. Each forked worker gets its own queue and listener.
+
+Access log records carry the route template, status, duration, SQL
+statement count and user id of each request (see middleware.access_log);
+the user id is noted by the authentication dependency through
+set_request_user().
+"""
+import atexit
+import contextvars
+import copy
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+from config.settings import settings
+
+# LogRecord attributes that are not extra fields
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+# Libraries that log every statement, pool event or client request at INFO
+QUIET_LOGGERS = ("sqlalchemy", "db.pool", "httpx")
+
+dropped_records = {"count": 0}
+
+
+class RequestLogContext:
+    __slots__ = ("user_id",)
+
+    def __init__(self):
+        self.user_id: int | None = None
+
+
+current_log_context: contextvars.ContextVar[RequestLogContext | None] = contextvars.ContextVar(
+    "current_log_context", default=None
+)
+
+
+def set_request_user(user_id: int) -> None:
+    """Attach the authenticated user to the current request's access log record"""
+    context = current_log_context.get()
+    if context is not None:
+        context.user_id = user_id
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, extra fields and traceback"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler that drops records when the queue is full instead of raising"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Keep message and traceback apart for the formatter; only merge the arguments here
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            dropped_records["count"] += 1
+
+
+_handler: DroppingQueueHandler | None = None
+_listener: QueueListener | None = None
+_lock = threading.Lock()
+
+
+def _output_handler() -> logging.Handler:
+    handler = logging.StreamHandler(sys.stderr)
+    if settings.LOG_FORMAT == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    return handler
+
+
+def _start_listener() -> None:
+    global _listener
+    _listener = QueueListener(_handler.queue, _output_handler(), respect_handler_level=True)
+    _listener.start()
+
+
+def configure_logging() -> None:
+    """Send root logger records through the queue; safe to call more than once"""
+    global _handler
+    with _lock:
+        if _handler is not None:
+            return
+        _handler = DroppingQueueHandler(queue.Queue(settings.LOG_QUEUE_SIZE))
+        root = logging.getLogger()
+        root.handlers = [_handler]
+        root.setLevel(settings.LOG_LEVEL.upper())
+        for name in QUIET_LOGGERS:
+            logging.getLogger(name).setLevel(logging.WARNING)
+        _start_listener()
+        atexit.register(stop_logging)
+
+
+def stop_logging() -> None:
+    """Write out the queued records and stop the listener"""
+    global _listener
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+def _after_fork_in_child() -> None:
+    # The parent's listener thread did not survive the fork, and its queue may hold a lock
+    if _handler is not None:
+        _handler.queue = queue.Queue(settings.LOG_QUEUE_SIZE)
+        _start_listener()
+
+
+os.register_at_fork(after_in_child=_after_fork_in_child)
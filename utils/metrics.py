@@ -0,0 +1,312 @@
+import bisect
+import json
+import os
+import threading
+
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Thread-safe cumulative histogram with fixed upper bounds"""
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counts = list(self._counts)
+            total, count = self._sum, self._count
+
+        cumulative = []
+        running = 0
+        for bound, bucket_count in zip((*self.buckets, float("inf")), counts):
+            running += bucket_count
+            cumulative.append(("+Inf" if bound == float("inf") else bound, running))
+        return {"buckets": cumulative, "sum": total, "count": count}
+
+    def raw(self) -> tuple[tuple[float, ...], list[int], float]:
+        """Bucket bounds, per-bucket (non-cumulative) counts including +Inf, and sum"""
+        with self._lock:
+            return self.buckets, list(self._counts), self._sum
+
+
+# Prometheus-style metrics
+#
+# Values live in per-thread cells: a thread only ever writes its own cell, so
+# updates take no lock, and a scrape sums the cells of every thread. Families
+# are exchanged as plain dicts so snapshots from several worker processes can
+# be merged (see MetricsRegistry.collect).
+
+
+class _Cells:
+    def __init__(self, size: int):
+        self.size = size
+        self._local = threading.local()
+        self._cells: list[list] = []
+        self._lock = threading.Lock()
+
+    def cell(self) -> list:
+        cell = getattr(self._local, "cell", None)
+        if cell is None:
+            cell = [0] * self.size
+            with self._lock:
+                self._cells.append(cell)
+            self._local.cell = cell
+        return cell
+
+    def totals(self) -> list:
+        with self._lock:
+            cells = list(self._cells)
+        return [sum(values) for values in zip(*cells)] if cells else [0] * self.size
+
+
+class _Metric:
+    type = ""
+    size = 1
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._children: dict[tuple, _Cells] = {}
+        self._lock = threading.Lock()
+
+    def _cells(self, labels: tuple) -> _Cells:
+        cells = self._children.get(labels)
+        if cells is None:
+            with self._lock:
+                cells = self._children.setdefault(labels, _Cells(self.size))
+        return cells
+
+    def _value(self, totals: list):
+        return totals[0]
+
+    def family(self) -> dict:
+        return {
+            "name": self.name,
+            "type": self.type,
+            "help": self.help,
+            "samples": [
+                [list(zip(self.labelnames, labels)), self._value(cells.totals())]
+                for labels, cells in list(self._children.items())
+            ],
+        }
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, labels: tuple = (), amount: float = 1) -> None:
+        self._cells(labels).cell()[0] += amount
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def dec(self, labels: tuple = (), amount: float = 1) -> None:
+        self._cells(labels).cell()[0] -= amount
+
+
+class LabeledHistogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = (),
+                 buckets: tuple[float, ...] = DEFAULT_LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.size = len(self.buckets) + 2  # bucket counts, +Inf, sum
+
+    def observe(self, labels: tuple, value: float) -> None:
+        cell = self._cells(labels).cell()
+        cell[bisect.bisect_left(self.buckets, value)] += 1
+        cell[-1] += value
+
+    def _value(self, totals: list) -> dict:
+        return {"bounds": list(self.buckets), "counts": totals[:-1], "sum": totals[-1]}
+
+
+def histogram_value(histogram: Histogram) -> dict:
+    """Sample value of a (locked) Histogram, for collectors"""
+    bounds, counts, total = histogram.raw()
+    return {"bounds": list(bounds), "counts": counts, "sum": total}
+
+
+def merge_families(snapshots: list[list[dict]]) -> list[dict]:
+    """Sum samples with the same name and labels across snapshots"""
+    merged: dict[str, dict] = {}
+    for families in snapshots:
+        for family in families:
+            target = merged.setdefault(family["name"], {**family, "samples": {}})
+            for labels, value in family["samples"]:
+                key = tuple(tuple(pair) for pair in labels)
+                current = target["samples"].get(key)
+                if current is None:
+                    target["samples"][key] = value
+                elif isinstance(value, dict):
+                    target["samples"][key] = {
+                        "bounds": value["bounds"],
+                        "counts": [a + b for a, b in zip(current["counts"], value["counts"])],
+                        "sum": current["sum"] + value["sum"],
+                    }
+                else:
+                    target["samples"][key] = current + value
+    return [
+        {**family, "samples": [[list(key), value] for key, value in family["samples"].items()]}
+        for family in merged.values()
+    ]
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", r"\\").replace("\n", r"\n").replace('"', r"\"")
+
+
+def _labels(pairs, extra: tuple = ()) -> str:
+    pairs = [*pairs, *extra]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_prometheus(families: list[dict]) -> str:
+    """Prometheus text exposition format (version 0.0.4)"""
+    lines = []
+    for family in sorted(families, key=lambda family: family["name"]):
+        name = family["name"]
+        lines.append(f"# HELP {name} {family['help']}")
+        lines.append(f"# TYPE {name} {family['type']}")
+        for labels, value in family["samples"]:
+            if family["type"] != "histogram":
+                lines.append(f"{name}{_labels(labels)} {_number(value)}")
+                continue
+            running = 0
+            for bound, count in zip((*value["bounds"], float("inf")), value["counts"]):
+                running += count
+                lines.append(f"{name}_bucket{_labels(labels, (('le', _number(bound)),))} {running}")
+            lines.append(f"{name}_sum{_labels(labels)} {_number(value['sum'])}")
+            lines.append(f"{name}_count{_labels(labels)} {running}")
+    return "\n".join(lines) + "\n"
+
+
+class MetricsRegistry:
+    """
+    Metrics of this worker, plus optional aggregation across workers.
+    With a multiprocess directory, each worker periodically writes its
+    snapshot to <dir>/<pid>.json and a scrape merges every file. Gauges of
+    workers that exited are dropped; their counters are folded into
+    <dir>/archive.json so totals never go backwards.
+    """
+
+    def __init__(self, multiprocess_dir: str = ""):
+        self.multiprocess_dir = multiprocess_dir
+        self._metrics: list[_Metric] = []
+        self._collectors = []
+
+    def counter(self, name: str, help: str, labelnames: tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, help, labelnames))
+
+    def gauge(self, name: str, help: str, labelnames: tuple[str, ...] = ()) -> Gauge:
+        return self._register(Gauge(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: tuple[str, ...] = (),
+                  buckets: tuple[float, ...] = DEFAULT_LATENCY_BUCKETS) -> LabeledHistogram:
+        return self._register(LabeledHistogram(name, help, labelnames, buckets))
+
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector) -> None:
+        """`collector()` returns a list of families computed at scrape time"""
+        self._collectors.append(collector)
+
+    def snapshot(self) -> list[dict]:
+        families = [metric.family() for metric in self._metrics]
+        for collector in self._collectors:
+            families.extend(collector())
+        return families
+
+    def _path(self, name) -> str:
+        return os.path.join(self.multiprocess_dir, f"{name}.json")
+
+    def write(self) -> None:
+        """Publish this worker's snapshot to the multiprocess directory"""
+        if not self.multiprocess_dir:
+            return
+        os.makedirs(self.multiprocess_dir, exist_ok=True)
+        path = self._path(os.getpid())
+        temporary = f"{path}.{threading.get_ident()}.tmp"
+        with open(temporary, "w") as file:
+            json.dump(self.snapshot(), file)
+        os.replace(temporary, path)
+
+    def collect(self) -> list[dict]:
+        """Families of this worker, or of every worker when running multiprocess"""
+        if not self.multiprocess_dir:
+            return self.snapshot()
+
+        import fcntl
+
+        self.write()
+        with open(os.path.join(self.multiprocess_dir, ".lock"), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            archive, live, dead = [], [], []
+            for entry in os.scandir(self.multiprocess_dir):
+                stem, extension = os.path.splitext(entry.name)
+                if extension != ".json":
+                    continue
+                try:
+                    with open(entry.path) as file:
+                        families = json.load(file)
+                except (OSError, ValueError):
+                    continue
+                if stem == "archive":
+                    archive = [families]
+                elif stem.isdigit() and _process_alive(int(stem)):
+                    live.append(families)
+                else:
+                    dead.append((entry.path, [family for family in families if family["type"] != "gauge"]))
+
+            if dead:
+                archive = [merge_families(archive + [families for _, families in dead])]
+                path = self._path("archive")
+                with open(f"{path}.tmp", "w") as file:
+                    json.dump(archive[0], file)
+                os.replace(f"{path}.tmp", path)
+                for path, _ in dead:
+                    os.remove(path)
+
+        return merge_families(archive + live)
+
+    def render(self) -> str:
+        return render_prometheus(self.collect())
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
@@ -0,0 +1,66 @@
+"""
+Pre-generated OpenAPI schema.
+
+    python -m utils.openapi    # writes settings.OPENAPI_SCHEMA_PATH
+
+Building the schema walks every route and model and takes a noticeable
+time on the first /docs or /openapi.json request of each worker. The app
+serves the file generated at build time instead, as long as its route
+fingerprint still matches the running app.
+"""
+import hashlib
+import json
+import os
+
+from fastapi import FastAPI
+from fastapi.routing import APIRoute
+
+from config.settings import settings
+
+FINGERPRINT_KEY = "x-routes-fingerprint"
+
+
+def routes_fingerprint(app: FastAPI) -> str:
+    routes = sorted(
+        f"{','.join(sorted(route.methods))} {route.path} {route.response_model}"
+        for route in app.routes if isinstance(route, APIRoute)
+    )
+    return hashlib.sha1("\n".join(routes).encode()).hexdigest()
+
+
+def load_schema(app: FastAPI, path: str) -> dict | None:
+    try:
+        with open(path, encoding="utf-8") as file:
+            schema = json.load(file)
+    except (OSError, ValueError):
+        return None
+    if schema.get(FINGERPRINT_KEY) != routes_fingerprint(app):
+        return None
+    return schema
+
+
+def install_schema(app: FastAPI, path: str = settings.OPENAPI_SCHEMA_PATH) -> None:
+    """Serve the pre-generated schema when present and current, else generate it"""
+    generate = app.openapi
+
+    def openapi() -> dict:
+        if app.openapi_schema is None:
+            app.openapi_schema = load_schema(app, path) or generate()
+        return app.openapi_schema
+
+    app.openapi = openapi
+
+
+def write_schema(app: FastAPI, path: str = settings.OPENAPI_SCHEMA_PATH) -> None:
+    schema = {**app.openapi(), FINGERPRINT_KEY: routes_fingerprint(app)}
+    temporary = f"{path}.tmp"
+    with open(temporary, "w", encoding="utf-8") as file:
+        json.dump(schema, file, separators=(",", ":"))
+    os.replace(temporary, path)
+
+
+if __name__ == "__main__":
+    from main import app
+
+    write_schema(app)
+    print(f"Wrote OpenAPI schema to {settings.OPENAPI_SCHEMA_PATH}")
@@ -0,0 +1,148 @@
+"""
+Fast serialization path for ORM-backed responses.
+
+By default FastAPI validates a handler's return value against its
+response_model, dumps it to Python objects and encodes them again with
+json.dumps. Rows loaded from our own database are already trusted, so
+routes can opt in to skipping all of that: construct_from_orm copies the
+rows into the response schema without validation (and without
+model_construct's per-call overhead), and a TypeAdapter compiled once at
+import time encodes them straight to bytes.
+
+The path is off by default; set FAST_SERIALIZATION_ENABLED=true to use it
+once the catalog schemas have been checked against the rows they are fed.
+Responses that are cached as bytes (see services.catalog_cache) are encoded
+by the same adapters either way, after validating the rows when the fast
+path is off.
+"""
+import functools
+import types
+from typing import Any, Iterable, Union, get_args, get_origin
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+from pydantic import BaseModel, TypeAdapter
+from starlette.responses import Response
+
+from config.settings import settings
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_MISSING = object()
+
+
+class JSONBytesResponse(Response):
+    """Response whose body was already encoded to JSON bytes"""
+    media_type = "application/json"
+
+
+# orjson encodes plain dicts and lists several times faster than json.dumps
+default_response_class = ORJSONResponse if orjson is not None else JSONResponse
+
+
+@functools.cache
+def _construct_plan(model: type[BaseModel]) -> tuple[tuple[str, type[BaseModel] | None, bool, Any], ...]:
+    """(field name, nested schema, is list, default) for every field of a schema"""
+    plan = []
+    for name, field in model.model_fields.items():
+        annotation = field.annotation
+        if get_origin(annotation) in (Union, types.UnionType):
+            args = [arg for arg in get_args(annotation) if arg is not type(None)]
+            if len(args) == 1:
+                annotation = args[0]
+        is_list = get_origin(annotation) is list
+        if is_list:
+            annotation = get_args(annotation)[0]
+        nested = annotation if isinstance(annotation, type) and issubclass(annotation, BaseModel) else None
+        plan.append((name, nested, is_list, field.get_default(call_default_factory=True)))
+    return tuple(plan)
+
+
+def construct_from_orm(model: type[BaseModel], obj: Any, memo: dict | None = None) -> BaseModel:
+    """
+    Copy a trusted ORM row into a schema without validating it, like
+    model_construct but without its per-call overhead. Rows shared by
+    several parents (a menu's restaurant, its categories) are copied once
+    per memo. Attributes missing on the row keep the schema default.
+    """
+    if memo is None:
+        memo = {}
+    key = (model, id(obj))
+    instance = memo.get(key)
+    if instance is not None:
+        return instance
+
+    values = {}
+    for name, nested, is_list, default in _construct_plan(model):
+        value = getattr(obj, name, _MISSING)
+        if value is _MISSING:
+            value = list(default) if is_list and default is not None else default
+        elif nested is not None and value is not None:
+            if is_list:
+                value = [construct_from_orm(nested, item, memo) for item in value]
+            else:
+                value = construct_from_orm(nested, value, memo)
+        values[name] = value
+
+    instance = model.__new__(model)
+    object.__setattr__(instance, "__dict__", values)
+    object.__setattr__(instance, "__pydantic_fields_set__", set(values))
+    object.__setattr__(instance, "__pydantic_extra__", None)
+    object.__setattr__(instance, "__pydantic_private__", None)
+    memo[key] = instance
+    return instance
+
+
+class FastSerializer:
+    """Precompiled encoder for one response schema, as a single object or a list"""
+
+    def __init__(self, model: type[BaseModel]):
+        self.model = model
+        self.item_adapter = TypeAdapter(model)
+        self.list_adapter = TypeAdapter(list[model])
+
+    def one(self, row: Any, status_code: int = 200) -> Response:
+        body = self.item_adapter.dump_json(construct_from_orm(self.model, row), warnings=False)
+        return JSONBytesResponse(body, status_code=status_code)
+
+    def many(self, rows: Iterable[Any], status_code: int = 200) -> Response:
+        memo = {}
+        items = [construct_from_orm(self.model, row, memo) for row in rows]
+        return JSONBytesResponse(self.list_adapter.dump_json(items, warnings=False), status_code=status_code)
+
+    def validated_one(self, row: Any, status_code: int = 200) -> Response:
+        """Like one, but validating the row against the schema as FastAPI's default path does"""
+        item = self.item_adapter.validate_python(row, from_attributes=True)
+        return JSONBytesResponse(self.item_adapter.dump_json(item), status_code=status_code)
+
+    def validated_many(self, rows: Iterable[Any], status_code: int = 200) -> Response:
+        items = self.list_adapter.validate_python(list(rows), from_attributes=True)
+        return JSONBytesResponse(self.list_adapter.dump_json(items), status_code=status_code)
+
+
+def serialize_one(serializer: FastSerializer, row: Any) -> Any:
+    """Return the encoded row when the fast path is on, otherwise let FastAPI serialize it"""
+    if settings.FAST_SERIALIZATION_ENABLED:
+        return serializer.one(row)
+    return row
+
+
+def serialize_many(serializer: FastSerializer, rows: Iterable[Any]) -> Any:
+    if settings.FAST_SERIALIZATION_ENABLED:
+        return serializer.many(rows)
+    return rows
+
+
+def encode_one(serializer: FastSerializer, row: Any) -> Response:
+    """The row encoded to JSON bytes, through the fast path when it is on"""
+    if settings.FAST_SERIALIZATION_ENABLED:
+        return serializer.one(row)
+    return serializer.validated_one(row)
+
+
+def encode_many(serializer: FastSerializer, rows: Iterable[Any]) -> Response:
+    if settings.FAST_SERIALIZATION_ENABLED:
+        return serializer.many(rows)
+    return serializer.validated_many(rows)